@@ -0,0 +1,360 @@
+"""
+Weekly posting statistics from vectorized, incremental aggregation.
+
+Same numbers as the "Calculate Weekly Stats" node of fanvue-weekly-digest.json,
+computed differently. Post history is held column-wise in numpy arrays (time,
+caption source, media type, PPV price). Every post is folded exactly once into
+a per-day cube of counts and PPV sums with `np.bincount`. A reporting window is
+then just a sum over its last N days of that cube. Newly synced posts are
+folded on top, so refreshing the stats never re-reads the whole history.
+
+    python analytics.py --days 7
+    python analytics.py --history post_history.csv --catalog media_catalog.csv --json
+"""
+
+import argparse
+import csv
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+CAPTION_SOURCES = ["ai-live", "pre-generated", "social_media_blotato", "other"]
+AI_LIVE, PRE_GENERATED, SOCIAL_MEDIA, OTHER_SOURCE = range(len(CAPTION_SOURCES))
+MEDIA_TYPES = ["image", "video", "other"]
+IMAGE, VIDEO, OTHER_MEDIA = range(len(MEDIA_TYPES))
+# Everything that is not a Blotato social media post counts as a Fanvue post
+FANVUE_SOURCES = [AI_LIVE, PRE_GENERATED, OTHER_SOURCE]
+
+DAY_NAMES = ["Pn", "Wt", "Sr", "Cz", "Pt", "Sb", "Nd"]  # date.weekday() order
+RECENT_POSTS = 5
+LOW_BACKLOG = 10
+SECONDS_PER_DAY = 86400
+
+
+def parse_timestamp(value) -> int:
+    """Unix seconds of an ISO 8601 timestamp; -1 when missing or invalid."""
+    if not value:
+        return -1
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return -1
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return int(parsed.timestamp())
+
+
+def source_code(value) -> int:
+    return CAPTION_SOURCES.index(value) if value in CAPTION_SOURCES else OTHER_SOURCE
+
+
+def media_code(value) -> int:
+    value = value or ""
+    if "video" in value:
+        return VIDEO
+    if "image" in value:
+        return IMAGE
+    return OTHER_MEDIA
+
+
+def local_utc_offset() -> int:
+    return int(datetime.now().astimezone().utcoffset().total_seconds())
+
+
+class HistoryColumns:
+    """Post history as parallel arrays, one element per post.
+
+    Captions and file names are plain lists: they are only read for the few
+    most recent posts.
+    """
+
+    def __init__(self, timestamps, sources, media_types, prices, captions=None, file_names=None):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.sources = np.asarray(sources, dtype=np.uint8)
+        self.media_types = np.asarray(media_types, dtype=np.uint8)
+        self.prices = np.nan_to_num(np.asarray(prices, dtype=np.float64))
+        self.captions = list(captions) if captions is not None else [""] * len(self.timestamps)
+        self.file_names = list(file_names) if file_names is not None else [""] * len(self.timestamps)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> "HistoryColumns":
+        """Rows shaped like the n8n `post_history` table."""
+        return cls(
+            [parse_timestamp(r.get("published_at")) for r in records],
+            [source_code(r.get("caption_source")) for r in records],
+            [media_code(r.get("media_type")) for r in records],
+            [float(r.get("ppv_price") or 0) for r in records],
+            [r.get("caption") or "" for r in records],
+            [r.get("file_name") or "" for r in records]
+        )
+
+    def take(self, indices) -> "HistoryColumns":
+        return HistoryColumns(
+            self.timestamps[indices], self.sources[indices], self.media_types[indices], self.prices[indices],
+            [self.captions[i] for i in indices], [self.file_names[i] for i in indices]
+        )
+
+    @staticmethod
+    def concat(parts: list["HistoryColumns"]) -> "HistoryColumns":
+        return HistoryColumns(
+            np.concatenate([p.timestamps for p in parts]),
+            np.concatenate([p.sources for p in parts]),
+            np.concatenate([p.media_types for p in parts]),
+            np.concatenate([p.prices for p in parts]),
+            [c for p in parts for c in p.captions],
+            [f for p in parts for f in p.file_names]
+        )
+
+
+def empty_history() -> HistoryColumns:
+    return HistoryColumns([], [], [], [])
+
+
+class RollingStats:
+    """Per-day aggregates of the whole post history, updated incrementally.
+
+    `counts[day, source, media]` holds post counts, `ppv_counts[day, source]`
+    and `ppv_revenue[day, source]` the PPV posts and their summed prices. Days
+    are local calendar days, indexed from `first_day` (days since the epoch).
+    """
+
+    def __init__(self, utc_offset: Optional[int] = None):
+        self.utc_offset = local_utc_offset() if utc_offset is None else utc_offset
+        self.first_day = 0
+        self.counts = np.zeros((0, len(CAPTION_SOURCES), len(MEDIA_TYPES)), dtype=np.int64)
+        self.ppv_counts = np.zeros((0, len(CAPTION_SOURCES)), dtype=np.int64)
+        self.ppv_revenue = np.zeros((0, len(CAPTION_SOURCES)), dtype=np.float64)
+        self.recent = {"fanvue": empty_history(), "social": empty_history()}
+        self.rows = 0
+
+    def day_of(self, timestamps: np.ndarray) -> np.ndarray:
+        return (timestamps + self.utc_offset) // SECONDS_PER_DAY
+
+    def _cover(self, low: int, high: int):
+        """Grow the day axis so it spans [low, high]."""
+        if not len(self.counts):
+            self.first_day = low
+        before = max(0, self.first_day - low)
+        after = max(0, high - (self.first_day + len(self.counts) - 1))
+        if before or after:
+            pad = [(before, after)]
+            self.counts = np.pad(self.counts, pad + [(0, 0), (0, 0)])
+            self.ppv_counts = np.pad(self.ppv_counts, pad + [(0, 0)])
+            self.ppv_revenue = np.pad(self.ppv_revenue, pad + [(0, 0)])
+            self.first_day -= before
+
+    def add(self, history: HistoryColumns):
+        """Fold new posts into the cube in one vectorized pass."""
+        valid = np.flatnonzero(history.timestamps >= 0)
+        if not len(valid):
+            return
+        if len(valid) < len(history):
+            history = history.take(valid)
+
+        days = self.day_of(history.timestamps)
+        self._cover(int(days.min()), int(days.max()))
+        n_days = len(self.counts)
+        n_sources, n_media = len(CAPTION_SOURCES), len(MEDIA_TYPES)
+
+        day_source = (days - self.first_day) * n_sources + history.sources
+        self.counts += np.bincount(
+            day_source * n_media + history.media_types, minlength=n_days * n_sources * n_media
+        ).reshape(self.counts.shape)
+        ppv = history.prices > 0
+        self.ppv_counts += np.bincount(day_source[ppv], minlength=n_days * n_sources).reshape(self.ppv_counts.shape)
+        self.ppv_revenue += np.bincount(
+            day_source[ppv], weights=history.prices[ppv], minlength=n_days * n_sources
+        ).reshape(self.ppv_revenue.shape)
+
+        social = history.sources == SOCIAL_MEDIA
+        for channel, mask in (("fanvue", ~social), ("social", social)):
+            self.recent[channel] = self._newest(self.recent[channel], history, np.flatnonzero(mask))
+        self.rows += len(history)
+
+    @staticmethod
+    def _newest(current: HistoryColumns, history: HistoryColumns, indices: np.ndarray) -> HistoryColumns:
+        """Keep the RECENT_POSTS newest posts out of `current` plus `history[indices]`."""
+        if len(indices) > RECENT_POSTS:
+            top = np.argpartition(history.timestamps[indices], -RECENT_POSTS)[-RECENT_POSTS:]
+            indices = indices[top]
+        merged = HistoryColumns.concat([history.take(indices), current])  # newer rows win ties
+        order = np.argsort(-merged.timestamps, kind="stable")[:RECENT_POSTS]
+        return merged.take(order)
+
+    def window(self, days: int, today: Optional[int] = None) -> tuple[int, slice]:
+        """First day number and cube slice of the last `days` calendar days up to `today`."""
+        if today is None:
+            today = int(self.day_of(np.int64(time.time())))
+        start = today - days + 1
+        low = min(max(start - self.first_day, 0), len(self.counts))
+        high = min(max(today - self.first_day + 1, 0), len(self.counts))
+        return start, slice(low, high)
+
+
+def backlog_counts(catalog: list[dict]) -> dict:
+    """Unposted media left in the catalog, per channel (n8n `media_catalog` rows)."""
+    folders = np.array([r.get("source_folder") or "" for r in catalog], dtype=object)
+    on_fanvue = np.array([str(r.get("added_to_fanvue")).lower() in ("true", "1") for r in catalog], dtype=bool)
+    on_social = np.array([str(r.get("added_to_social_media")).lower() in ("true", "1") for r in catalog], dtype=bool)
+    return {
+        "remaining_fanvue": int(np.count_nonzero((folders == "nsfw") & ~on_fanvue)),
+        "remaining_social": int(np.count_nonzero((folders == "socialmedia") & ~on_social)),
+        "total_media": len(catalog)
+    }
+
+
+def day_label(day_number: int) -> str:
+    day = date(1970, 1, 1) + timedelta(days=day_number)
+    return f"{DAY_NAMES[day.weekday()]} {day.day}.{day.month:02d}"
+
+
+def weekly_stats(stats: RollingStats, backlog: Optional[dict] = None, days: int = 7,
+                 today: Optional[int] = None) -> dict:
+    """The digest numbers for the last `days` calendar days (today included).
+
+    Without a `backlog` (no media catalog) the remaining-media figures are 0 and
+    no low-backlog warning is raised.
+    """
+    warn = backlog is not None
+    backlog = backlog or {"remaining_fanvue": 0, "remaining_social": 0, "total_media": 0}
+    start, days_slice = stats.window(days, today)
+    counts = stats.counts[days_slice]
+    fanvue = counts[:, FANVUE_SOURCES]
+    social = counts[:, SOCIAL_MEDIA]
+    fanvue_per_day = fanvue.sum(axis=(1, 2))
+    social_per_day = social.sum(axis=1)
+    first = stats.first_day + (days_slice.start or 0)
+    window_start = (start * SECONDS_PER_DAY) - stats.utc_offset
+
+    total = int(fanvue_per_day.sum())
+    sm_total = int(social_per_day.sum())
+    # Same fallbacks as the n8n node when nothing was posted this week
+    avg_fanvue = total / days if total else 2
+    avg_social = sm_total / days if sm_total else 1
+
+    def recent_rows(history: HistoryColumns) -> list[dict]:
+        return [{
+            "published_at": datetime.fromtimestamp(int(ts), timezone.utc).isoformat(),
+            "file_name": history.file_names[i],
+            "media_type": MEDIA_TYPES[history.media_types[i]],
+            "ppv_price": float(history.prices[i]),
+            "caption": history.captions[i][:80]
+        } for i, ts in enumerate(history.timestamps) if ts >= window_start]
+
+    return {
+        "week_start": (date(1970, 1, 1) + timedelta(days=start)).isoformat(),
+        "week_end": (date(1970, 1, 1) + timedelta(days=start + days - 1)).isoformat(),
+        "total_posts": total,
+        "image_posts": int(fanvue[:, :, IMAGE].sum()),
+        "video_posts": int(fanvue[:, :, VIDEO].sum()),
+        "ppv_count": int(stats.ppv_counts[days_slice][:, FANVUE_SOURCES].sum()),
+        "ppv_revenue_potential": round(float(stats.ppv_revenue[days_slice][:, FANVUE_SOURCES].sum()), 2),
+        "ai_captions": int(counts[:, AI_LIVE].sum()),
+        "pregen_captions": int(counts[:, PRE_GENERATED].sum()),
+        "remaining_fanvue": backlog["remaining_fanvue"],
+        "fanvue_days_until_empty": int(backlog["remaining_fanvue"] // avg_fanvue),
+        "posts_by_day": [(day_label(first + i), int(n)) for i, n in enumerate(fanvue_per_day) if n],
+        "recent_posts": recent_rows(stats.recent["fanvue"]),
+        "sm_total": sm_total,
+        "sm_images": int(social[:, IMAGE].sum()),
+        "sm_videos": int(social[:, VIDEO].sum()),
+        "remaining_social": backlog["remaining_social"],
+        "sm_days_until_empty": int(backlog["remaining_social"] // avg_social),
+        "sm_by_day": [(day_label(first + i), int(n)) for i, n in enumerate(social_per_day) if n],
+        "sm_recent_posts": recent_rows(stats.recent["social"]),
+        "total_media": backlog["total_media"],
+        "low_backlog": [channel for channel, key in (("Fanvue", "remaining_fanvue"), ("Social Media", "remaining_social"))
+                        if warn and backlog[key] < LOW_BACKLOG]
+    }
+
+
+class PostStoreStats:
+    """RollingStats per creator, fed from the local post store by rowid watermark."""
+
+    def __init__(self, store):
+        self.store = store
+        self._stats: dict[str, tuple[RollingStats, int]] = {}
+
+    def refresh(self, creator_uuid: str) -> RollingStats:
+        stats, watermark = self._stats.get(creator_uuid) or (RollingStats(), 0)
+        rows = self.store.rows_since(creator_uuid, watermark)
+        if rows:
+            stats.add(HistoryColumns(
+                [parse_timestamp(r[1]) for r in rows],
+                [source_code(r[2]) for r in rows],
+                [media_code(r[3]) for r in rows],
+                [r[4] or 0 for r in rows],
+                [r[5] or "" for r in rows],
+                [r[6] or "" for r in rows]
+            ))
+            watermark = rows[-1][0]
+        self._stats[creator_uuid] = (stats, watermark)
+        return stats
+
+
+def read_csv(path) -> list[dict]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def format_report(report: dict) -> str:
+    """Plain-text digest in the same layout as the weekly email."""
+    lines = [
+        f"Podsumowanie {report['week_start']} - {report['week_end']}",
+        "",
+        "Fanvue",
+        f"  Posty: {report['total_posts']} (zdjecia {report['image_posts']}, wideo {report['video_posts']})",
+        f"  PPV: {report['ppv_count']}, potencjalny przychod ${report['ppv_revenue_potential']:.2f}",
+        f"  Opisy: AI na zywo {report['ai_captions']}, wczesniej wygenerowane {report['pregen_captions']}",
+        f"  Pozostalo mediow: {report['remaining_fanvue']} (~{report['fanvue_days_until_empty']} dni)",
+    ]
+    lines += [f"    {day}: {count}" for day, count in report["posts_by_day"]]
+    lines += [
+        "",
+        "Social Media",
+        f"  Posty: {report['sm_total']} (zdjecia {report['sm_images']}, wideo {report['sm_videos']})",
+        f"  Pozostalo mediow: {report['remaining_social']} (~{report['sm_days_until_empty']} dni)",
+    ]
+    lines += [f"    {day}: {count}" for day, count in report["sm_by_day"]]
+    for channel in report["low_backlog"]:
+        lines.append(f"\nUWAGA: {channel} - malo contentu, dodaj wiecej plikow!")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statystyki postow z ostatnich dni (jak cotygodniowy digest).")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--history", help="CSV z tabeli post_history (zamiast lokalnej bazy postow)")
+    parser.add_argument("--catalog", help="CSV z tabeli media_catalog (pozostale media)")
+    parser.add_argument("--db", default=str(Path(__file__).parent / ".posts.db"), help="lokalna baza postow")
+    parser.add_argument("--creator", help="creator UUID (domyslnie z .tokens.json)")
+    parser.add_argument("--json", action="store_true", help="wynik jako JSON")
+    args = parser.parse_args()
+
+    stats = RollingStats()
+    if args.history:
+        stats.add(HistoryColumns.from_records(read_csv(args.history)))
+    else:
+        creator = args.creator
+        if not creator:
+            tokens_file = Path(__file__).parent / ".tokens.json"
+            creator = json.loads(tokens_file.read_text()).get("creator_uuid") if tokens_file.exists() else None
+        if not creator:
+            parser.error("podaj --creator albo --history")
+        from post_store import PostStore
+        stats = PostStoreStats(PostStore(Path(args.db))).refresh(creator)
+
+    backlog = backlog_counts(read_csv(args.catalog)) if args.catalog else None
+    report = weekly_stats(stats, backlog, args.days)
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Local HTTP API over the same operations as cli.py, for n8n, cron jobs and other services.
+
+    python api.py                          # http://127.0.0.1:8765
+    python api.py --host 0.0.0.0 --port 8080
+
+Every operation is a POST to /<operation> with a JSON body holding the
+command line options (underscores instead of dashes):
+
+    curl -N localhost:8765/post-dir -H 'Content-Type: application/json' \
+        -d '{"folder": "/media/sesja", "caption": "Nowa sesja"}'
+    curl -N localhost:8765/schedule -H 'Content-Type: application/json' \
+        -d '{"csv_path": "opisy/grudzien.csv", "queued": true}'
+
+The response streams NDJSON progress events as they happen (see
+operations.py), so a long batch reports every file instead of timing out on
+one big answer. Unknown operations or arguments get a 400 before anything
+runs. GET /health shows the login, GET /jobs the job queue and GET /metrics
+the counters and timings of metrics.py in the Prometheus text format.
+
+The server is asyncio; operations run on their own threads over the shared
+pooled Fanvue client, so several batches can stream at once. With
+API_TOKEN set every request needs `Authorization: Bearer <API_TOKEN>`.
+
+Without a token any web page open in a local browser could reach the API,
+so POSTs must be `Content-Type: application/json` (a cross-site form or
+fetch cannot send that without a CORS preflight, which is never answered)
+and requests carrying an Origin other than localhost are refused.
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import re
+import threading
+from typing import Optional
+
+import core
+import metrics
+from operations import check_arguments, run
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", 8765))
+API_TOKEN = os.getenv("API_TOKEN", "")
+API_MAX_BODY = 1024 * 1024
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type"}
+LOCAL_ORIGIN = re.compile(r"https?://(localhost|127\.0\.0\.1|\[::1\])(:\d+)?", re.IGNORECASE)
+
+
+class BadRequest(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> tuple[str, str, dict, bytes]:
+    """(method, path, headers, body) of one HTTP/1.1 request."""
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) != 3:
+        raise BadRequest(400, "Bledne zapytanie HTTP")
+    method, target, _ = request_line
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise BadRequest(400, "Bledny Content-Length")
+    if length < 0:
+        raise BadRequest(400, "Bledny Content-Length")
+    if length > API_MAX_BODY:
+        raise BadRequest(413, "Za duze zapytanie")
+    if length and headers.get("expect", "").lower() == "100-continue":
+        # curl waits for this before sending bodies over 1 KB
+        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        await writer.drain()
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def head(status: int, content_type: str) -> bytes:
+    return (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Cache-Control: no-cache\r\n"
+            f"Connection: close\r\n\r\n").encode()
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: dict):
+    writer.write(head(status, "application/json") + json.dumps(payload, ensure_ascii=False).encode() + b"\n")
+    await writer.drain()
+
+
+async def stream_operation(name: str, kwargs: dict):
+    """Events of an operation running on its own thread, as they are produced.
+
+    If the client goes away the operation is closed at its next event: files
+    already being uploaded finish, nothing new is started.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue[Optional[dict]] = asyncio.Queue()
+    stop = threading.Event()
+
+    def produce():
+        operation = run(name, **kwargs)
+        try:
+            for event in operation:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+                if stop.is_set():
+                    break
+        finally:
+            operation.close()
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    threading.Thread(target=produce, name=f"api-{name}", daemon=True).start()
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        stop.set()
+
+
+def authorized(headers: dict) -> bool:
+    if not API_TOKEN:
+        return True
+    return hmac.compare_digest(headers.get("authorization", ""), f"Bearer {API_TOKEN}")
+
+
+def check_browser(method: str, headers: dict):
+    """Refuse what a web page could send: a foreign Origin, or a POST that is not JSON."""
+    origin = headers.get("origin")
+    if origin is not None and not LOCAL_ORIGIN.fullmatch(origin):
+        raise BadRequest(403, f"Niedozwolony Origin: {origin}")
+    content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    if method == "POST" and content_type != "application/json":
+        raise BadRequest(415, "Wymagany naglowek Content-Type: application/json")
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        try:
+            method, path, headers, body = await read_request(reader, writer)
+            if not authorized(headers):
+                raise BadRequest(401, "Brak lub zly API_TOKEN")
+            check_browser(method, headers)
+            name = path.strip("/")
+
+            if method == "GET" and name == "health":
+                await send_json(writer, 200, {"authenticated": core.state.is_authenticated(),
+                                              "creator": core.state.creator_uuid,
+                                              "token": core.state.tokens.describe()})
+                return
+            if method == "GET" and name == "jobs":
+                await send_json(writer, 200, {"counts": core.job_queue.counts(), "jobs": core.job_queue.recent()})
+                return
+            if method == "GET" and name == "metrics":
+                writer.write(head(200, metrics.CONTENT_TYPE) + metrics.render().encode())
+                await writer.drain()
+                return
+            if method != "POST":
+                raise BadRequest(405 if name in ("health", "jobs", "metrics") else 404, f"Brak {method} {path}")
+
+            try:
+                kwargs = json.loads(body or b"{}")
+            except json.JSONDecodeError as e:
+                raise BadRequest(400, f"Bledny JSON: {e}")
+            if not isinstance(kwargs, dict):
+                raise BadRequest(400, "Body musi byc obiektem JSON")
+            error = check_arguments(name, kwargs)
+            if error:
+                raise BadRequest(404 if error.startswith("Nieznana operacja") else 400, error)
+        except BadRequest as e:
+            await send_json(writer, e.status, {"event": "error", "message": str(e)})
+            return
+
+        writer.write(head(200, "application/x-ndjson"))
+        async for event in stream_operation(name, kwargs):
+            writer.write(json.dumps(event, ensure_ascii=False).encode() + b"\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass  # the client went away
+    finally:
+        writer.close()
+
+
+async def serve(host: str = API_HOST, port: int = API_PORT):
+    server = await asyncio.start_server(handle, host, port)
+    core.state.tokens.start()
+    print(f"API na http://{host}:{port}, Ctrl+C konczy", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP API for Fanvue Post Creator")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,753 +1,649 @@
 """
 Fanvue Post Creator - Gradio Application
 Upload media and create posts on Fanvue with AI-generated captions.
+
+The interface only; the logic lives in core.py, which imports without Gradio.
 """
 
 import gradio as gr
-import httpx
-import base64
-import os
 import json
-import csv
-from datetime import datetime
+import os
 from pathlib import Path
-from typing import Optional
-from dotenv import load_dotenv
-from openai import OpenAI
-
-load_dotenv()
-
-# Configuration
-FANVUE_API_BASE = "https://api.fanvue.com"
-FANVUE_AUTH_URL = "https://auth.fanvue.com/oauth2/auth"
-FANVUE_TOKEN_URL = "https://auth.fanvue.com/oauth2/token"
-API_VERSION = "2025-06-26"
-
-# Content ideas configuration
-SEASONAL_THEMES = {
-    1: ["New Year energy", "Winter cozy vibes", "Fresh start goals"],
-    2: ["Valentine's Day", "Self-love", "Galentine's"],
-    3: ["Spring awakening", "New beginnings", "Women's day"],
-    4: ["Easter vibes", "Spring fashion", "Outdoor shoots"],
-    5: ["Summer teaser", "Fitness motivation", "Beach prep"],
-    6: ["Summer vibes", "Pool day", "Travel content"],
-    7: ["Hot summer", "Vacation mode", "Beach content"],
-    8: ["Late summer", "Golden hour shoots", "Back to routine"],
-    9: ["Fall fashion", "Cozy season starts", "New chapter"],
-    10: ["Halloween", "Costume/cosplay", "Spooky & sexy"],
-    11: ["Thanksgiving", "Gratitude posts", "Black Friday promo"],
-    12: ["Christmas", "Gift guides/wishlists", "New Year countdown"]
-}
-
-POST_TYPES = ["Photo", "Video", "Selfie", "Behind the scenes", "PPV exclusive", "Text/Story", "Poll/Q&A", "Carousel"]
-
-# State
-class AppState:
-    def __init__(self):
-        self.access_token: Optional[str] = None
-        self.refresh_token: Optional[str] = None
-        self.creator_uuid: Optional[str] = None
-        self.openai_client: Optional[OpenAI] = None
-
-    def is_authenticated(self) -> bool:
-        return self.access_token is not None
-
-    def init_openai(self, api_key: str):
-        self.openai_client = OpenAI(api_key=api_key)
-
-state = AppState()
-
-# Load saved tokens if exist
-TOKEN_FILE = Path(__file__).parent / ".tokens.json"
-
-def save_tokens():
-    data = {
-        "access_token": state.access_token,
-        "refresh_token": state.refresh_token,
-        "creator_uuid": state.creator_uuid
-    }
-    TOKEN_FILE.write_text(json.dumps(data))
-
-def load_tokens():
-    if TOKEN_FILE.exists():
-        data = json.loads(TOKEN_FILE.read_text())
-        state.access_token = data.get("access_token")
-        state.refresh_token = data.get("refresh_token")
-        state.creator_uuid = data.get("creator_uuid")
-        return True
-    return False
-
-# Initialize OpenAI from env
-if os.getenv("OPENAI_API_KEY"):
-    state.init_openai(os.getenv("OPENAI_API_KEY"))
-
-
-def get_headers():
-    """Get headers for Fanvue API requests."""
-    return {
-        "Authorization": f"Bearer {state.access_token}",
-        "X-Fanvue-API-Version": API_VERSION,
-        "Content-Type": "application/json"
-    }
-
-
-def authenticate_with_token(access_token: str, refresh_token: str = "") -> str:
-    """Authenticate using existing tokens."""
-    state.access_token = access_token.strip()
-    state.refresh_token = refresh_token.strip() if refresh_token else None
-
-    # Test the token by getting user info
-    try:
-        with httpx.Client() as client:
-            response = client.get(
-                f"{FANVUE_API_BASE}/users/me",
-                headers=get_headers()
-            )
-            if response.status_code == 200:
-                # Get creator UUID
-                creators_resp = client.get(
-                    f"{FANVUE_API_BASE}/agency/creators",
-                    headers=get_headers()
-                )
-                if creators_resp.status_code == 200:
-                    creators = creators_resp.json().get("data", [])
-                    if creators:
-                        state.creator_uuid = creators[0]["uuid"]
-                        save_tokens()
-                        return f"Zalogowano! Creator: {creators[0].get('displayName', state.creator_uuid)}"
-                    return "Zalogowano, ale nie znaleziono creatora."
-                return f"Zalogowano, ale blad pobierania creatorow: {creators_resp.status_code}"
-            else:
-                state.access_token = None
-                return f"Blad autoryzacji: {response.status_code} - {response.text}"
-    except Exception as e:
-        state.access_token = None
-        return f"Blad polaczenia: {str(e)}"
-
-
-def set_openai_key(api_key: str) -> str:
-    """Set OpenAI API key."""
-    if not api_key.strip():
-        return "Podaj klucz API"
-    state.init_openai(api_key.strip())
-    return "Klucz OpenAI ustawiony!"
-
-
-def generate_caption(image_path: str, style: str, custom_prompt: str = "") -> str:
-    """Generate caption using AI."""
-    if not state.openai_client:
-        return "Najpierw ustaw klucz OpenAI API!"
-
-    if not image_path:
-        return "Najpierw wybierz obraz!"
-
-    # Read and encode image
-    with open(image_path, "rb") as f:
-        image_data = base64.b64encode(f.read()).decode()
-
-    # Determine mime type
-    ext = Path(image_path).suffix.lower()
-    mime_map = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".gif": "image/gif", ".webp": "image/webp"}
-    mime_type = mime_map.get(ext, "image/jpeg")
-
-    # Build prompt based on style
-    style_prompts = {
-        "Sexy & Flirty": "Write a flirty, teasing caption for this photo. Be playful and seductive but tasteful. Use 1-2 emojis. Keep under 200 characters. Write in English.",
-        "Casual & Fun": "Write a casual, fun caption for this photo. Be friendly and approachable. Use emojis. Keep under 200 characters. Write in English.",
-        "Mysterious": "Write a mysterious, intriguing caption for this photo. Create curiosity. Use 1 emoji max. Keep under 200 characters. Write in English.",
-        "Promotional": "Write a promotional caption encouraging followers to subscribe for more exclusive content. Mention 'link in bio' or similar. Use emojis. Keep under 250 characters. Write in English.",
-        "Custom": custom_prompt if custom_prompt else "Write an engaging social media caption for this photo. Keep under 200 characters."
-    }
-
-    prompt = style_prompts.get(style, style_prompts["Casual & Fun"])
-
-    try:
-        response = state.openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{mime_type};base64,{image_data}",
-                                "detail": "low"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=300
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Blad generowania: {str(e)}"
-
-
-def generate_video_caption(style: str, custom_prompt: str = "") -> str:
-    """Generate caption for video (without vision)."""
-    if not state.openai_client:
-        return "Najpierw ustaw klucz OpenAI API!"
-
-    style_prompts = {
-        "Sexy & Flirty": "Write a flirty, teasing caption for a video post by a content creator. Be playful and seductive but tasteful. Use 1-2 emojis. Keep under 200 characters. Write in English.",
-        "Casual & Fun": "Write a casual, fun caption for a video post. Be friendly and approachable. Use emojis. Keep under 200 characters. Write in English.",
-        "Mysterious": "Write a mysterious, intriguing caption for a video. Create curiosity about what's in the video. Use 1 emoji max. Keep under 200 characters. Write in English.",
-        "Promotional": "Write a promotional caption for a video encouraging followers to subscribe for more exclusive video content. Use emojis. Keep under 250 characters. Write in English.",
-        "Custom": custom_prompt if custom_prompt else "Write an engaging social media caption for a video post. Keep under 200 characters."
-    }
-
-    prompt = style_prompts.get(style, style_prompts["Casual & Fun"])
-
-    try:
-        response = state.openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=300
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Blad generowania: {str(e)}"
-
-
-def upload_media(file_path: str) -> tuple[Optional[str], str]:
-    """Upload media to Fanvue using multipart upload."""
-    if not state.is_authenticated():
-        return None, "Najpierw zaloguj sie!"
-
-    if not file_path:
-        return None, "Wybierz plik!"
-
-    file_path = Path(file_path)
-    filename = file_path.name
-    file_size = file_path.stat().st_size
-
-    # Determine media type
-    ext = file_path.suffix.lower()
-    if ext in [".mp4", ".mov", ".avi", ".webm"]:
-        media_type = "video"
-    else:
-        media_type = "image"
-
-    try:
-        with httpx.Client(timeout=120.0) as client:
-            # 1. Create upload session
-            create_resp = client.post(
-                f"{FANVUE_API_BASE}/media/upload/multipart/create",
-                headers=get_headers(),
-                json={
-                    "name": filename,
-                    "filename": filename,
-                    "mediaType": media_type
-                }
-            )
 
-            if create_resp.status_code != 200:
-                return None, f"Blad tworzenia sesji: {create_resp.status_code} - {create_resp.text}"
+from analytics import HistoryColumns, RollingStats, backlog_counts, format_report, read_csv, weekly_stats
+from bulk_caption import CAPTION_CONCURRENCY, CAPTION_TOKENS_PER_MINUTE
+from caption_prompts import CAPTION_STYLES
+from core import (
+    BATCH_CONCURRENCY, HISTORY_PAGE_SIZE, authenticate_with_token, bulk_caption_handler, export_ideas_csv,
+    generate_content_ideas, is_video, iter_caption, job_queue, media_catalog, post_stats, post_store,
+    publish_batch, publish_from_catalog, publish_scheduler, queue_view, select_creator, set_openai_key,
+    start_workers, state, submit_post, upload_media, wait_for_media
+)
+import metrics
+from post_store import AUDIENCE_LABELS
+from worker import JOB_WORKERS
+
+
+def full_upload_and_post(file, caption: str, audience: str, allow_similar: bool = False,
+                         progress=gr.Progress()) -> str:
+    """Complete flow: upload media and create post."""
+    if not file:
+        return "Wybierz plik!"
 
-            upload_data = create_resp.json()
-            upload_id = upload_data["uploadId"]
+    progress(0.1, desc="Uploadowanie media...")
+    media_uuid, upload_msg = upload_media(file, allow_similar=allow_similar)
 
-            # 2. Get signed URL for upload
-            sign_resp = client.post(
-                f"{FANVUE_API_BASE}/media/upload/multipart/sign",
-                headers=get_headers(),
-                json={
-                    "uploadId": upload_id,
-                    "partNumber": 1
-                }
-            )
+    if not media_uuid:
+        return upload_msg
+
+    progress(0.6, desc="Przetwarzanie media...")
+    media_error = wait_for_media(media_uuid)
+    if media_error:
+        return f"{upload_msg}\n\n{media_error}"
 
-            if sign_resp.status_code != 200:
-                return None, f"Blad pobierania URL: {sign_resp.status_code} - {sign_resp.text}"
+    progress(0.7, desc="Tworzenie posta...")
+    result = submit_post(caption, media_uuid, audience, file_name=Path(file).name)[1]
 
-            signed_url = sign_resp.json()["url"]
+    progress(1.0, desc="Gotowe!")
+    return f"{upload_msg}\n\n{result}"
 
-            # 3. Upload file to S3
-            with open(file_path, "rb") as f:
-                file_content = f.read()
 
-            upload_resp = client.put(
-                signed_url,
-                content=file_content,
-                headers={"Content-Type": "application/octet-stream"}
+def build_ui() -> gr.Blocks:
+    """Build the Gradio interface."""
+    with gr.Blocks(title="Fanvue Post Creator", theme=gr.themes.Soft()) as ui:
+        gr.Markdown("# Fanvue Post Creator")
+        gr.Markdown("Upload media i tworzenie postow na Fanvue z AI-generowanymi opisami.")
+
+        with gr.Tab("Ustawienia"):
+            gr.Markdown("## Autoryzacja Fanvue")
+            gr.Markdown("""
+            Aby uzyskac token:
+            1. Zaloguj sie na [fanvue.com](https://fanvue.com)
+            2. Otworz DevTools (F12) -> Application -> Cookies
+            3. Skopiuj wartosc `access_token`
+
+            Lub uzyj OAuth2 flow przez developer portal Fanvue.
+            """)
+
+            with gr.Row():
+                access_token_input = gr.Textbox(
+                    label="Access Token",
+                    type="password",
+                    placeholder="Wklej access token z Fanvue..."
+                )
+                refresh_token_input = gr.Textbox(
+                    label="Refresh Token (opcjonalnie)",
+                    type="password",
+                    placeholder="Opcjonalnie..."
+                )
+
+            auth_btn = gr.Button("Zaloguj", variant="primary")
+            auth_status = gr.Textbox(label="Status", interactive=False,
+                                      value=f"Zalogowany! ({state.tokens.describe()})" if state.is_authenticated()
+                                      else "Niezalogowany")
+
+            auth_event = auth_btn.click(
+                authenticate_with_token,
+                inputs=[access_token_input, refresh_token_input],
+                outputs=auth_status
             )
 
-            if upload_resp.status_code not in [200, 201]:
-                return None, f"Blad uploadu S3: {upload_resp.status_code}"
+            active_creator = gr.Dropdown(
+                choices=state.creator_choices(),
+                value=state.creator_uuid,
+                label="Aktywny creator (historia, statystyki, pojedyncze posty)"
+            )
+            active_creator.input(select_creator, inputs=active_creator, outputs=auth_status)
 
-            etag = upload_resp.headers.get("etag", "").strip('"')
+            gr.Markdown("---")
+            gr.Markdown("## OpenAI API")
 
-            # 4. Complete upload
-            complete_resp = client.post(
-                f"{FANVUE_API_BASE}/media/upload/multipart/complete",
-                headers=get_headers(),
-                json={
-                    "uploadId": upload_id,
-                    "parts": [{"partNumber": 1, "eTag": etag}]
-                }
+            openai_key_input = gr.Textbox(
+                label="OpenAI API Key",
+                type="password",
+                placeholder="sk-...",
+                value="" if not os.getenv("OPENAI_API_KEY") else "***ustawiony z .env***"
             )
+            openai_btn = gr.Button("Ustaw klucz OpenAI")
+            openai_status = gr.Textbox(label="Status OpenAI", interactive=False,
+                                        value="Skonfigurowany" if state.openai_api_key else "Nie skonfigurowany")
+
+            openai_btn.click(
+                set_openai_key,
+                inputs=openai_key_input,
+                outputs=openai_status
+            )
+
+        with gr.Tab("Nowy Post"):
+            with gr.Row():
+                with gr.Column(scale=1):
+                    gr.Markdown("### Media")
+                    file_input = gr.File(
+                        label="Wybierz plik (obraz lub wideo)",
+                        file_types=["image", "video"]
+                    )
+                    image_preview = gr.Image(label="Podglad", visible=True)
 
-            if complete_resp.status_code != 200:
-                return None, f"Blad finalizacji: {complete_resp.status_code} - {complete_resp.text}"
+                    gr.Markdown("### Generowanie opisu AI")
+                    style_dropdown = gr.Dropdown(
+                        choices=CAPTION_STYLES,
+                        value="Casual & Fun",
+                        label="Styl opisu"
+                    )
+                    custom_prompt = gr.Textbox(
+                        label="Custom prompt (dla stylu Custom)",
+                        placeholder="Napisz wlasny prompt...",
+                        visible=False
+                    )
+                    force_caption = gr.Checkbox(label="Wymus nowy opis (pomin cache)", value=False)
+                    generate_btn = gr.Button("Generuj opis AI", variant="secondary")
+
+                with gr.Column(scale=1):
+                    gr.Markdown("### Tresc posta")
+                    caption_input = gr.Textbox(
+                        label="Opis / Caption",
+                        lines=5,
+                        placeholder="Wpisz lub wygeneruj opis..."
+                    )
 
-            media_uuid = complete_resp.json()["uuid"]
-            return media_uuid, f"Upload ukonczony! Media UUID: {media_uuid}"
+                    audience_dropdown = gr.Dropdown(
+                        choices=["Wszyscy (publiczny)", "Obserwujacy i subskrybenci", "Tylko subskrybenci"],
+                        value="Obserwujacy i subskrybenci",
+                        label="Odbiorcy"
+                    )
 
-    except Exception as e:
-        return None, f"Blad uploadu: {str(e)}"
+                    # scheduled_input = gr.Textbox(
+                    #     label="Zaplanuj (ISO date, opcjonalnie)",
+                    #     placeholder="2024-12-31T12:00:00Z"
+                    # )
 
+                    allow_similar = gr.Checkbox(
+                        label="Wyslij mimo podobienstwa do juz uploadowanego pliku",
+                        value=False
+                    )
 
-def create_post(caption: str, media_uuid: str, audience: str, scheduled_at: str = "") -> str:
-    """Create a post on Fanvue."""
-    if not state.is_authenticated():
-        return "Najpierw zaloguj sie!"
+                    post_btn = gr.Button("Opublikuj Post", variant="primary", size="lg")
+                    result_output = gr.Textbox(label="Wynik", lines=5, interactive=False)
 
-    if not state.creator_uuid:
-        return "Brak creator UUID!"
+            # Show/hide custom prompt
+            def toggle_custom(style):
+                return gr.update(visible=(style == "Custom"))
 
-    if not caption.strip():
-        return "Podaj tekst posta!"
+            style_dropdown.change(toggle_custom, inputs=style_dropdown, outputs=custom_prompt)
 
-    audience_map = {
-        "Wszyscy (publiczny)": "everyone",
-        "Obserwujacy i subskrybenci": "followers-and-subscribers",
-        "Tylko subskrybenci": "subscribers-only"
-    }
+            # Update preview when file selected
+            def update_preview(file):
+                if file and file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
+                    return gr.update(value=file, visible=True)
+                return gr.update(value=None, visible=False)
 
-    post_data = {
-        "text": caption.strip(),
-        "audience": audience_map.get(audience, "followers-and-subscribers")
-    }
+            file_input.change(update_preview, inputs=file_input, outputs=image_preview)
 
-    if media_uuid:
-        post_data["mediaUuids"] = [media_uuid]
+            # Generate caption, streamed into the textbox token by token
+            def generate_caption_handler(file, style, custom, force):
+                if not state.openai_api_key:
+                    yield "Najpierw ustaw klucz OpenAI API!"
+                    return
+                if not file:
+                    yield "Najpierw wybierz plik!"
+                    return
 
-    if scheduled_at:
-        post_data["scheduledAt"] = scheduled_at
+                yield from iter_caption(file, style, custom, force, video=is_video(file))
 
-    try:
-        with httpx.Client() as client:
-            response = client.post(
-                f"{FANVUE_API_BASE}/creators/{state.creator_uuid}/posts",
-                headers=get_headers(),
-                json=post_data
+            generate_btn.click(
+                generate_caption_handler,
+                inputs=[file_input, style_dropdown, custom_prompt, force_caption],
+                outputs=caption_input
             )
 
-            if response.status_code in [200, 201]:
-                result = response.json()
-                return f"Post utworzony!\nID: {result.get('uuid', 'N/A')}"
-            else:
-                return f"Blad tworzenia posta: {response.status_code} - {response.text}"
+            # Post button
+            post_btn.click(
+                full_upload_and_post,
+                inputs=[file_input, caption_input, audience_dropdown, allow_similar],
+                outputs=result_output
+            )
 
-    except Exception as e:
-        return f"Blad: {str(e)}"
+        with gr.Tab("Wiele postow"):
+            gr.Markdown("### Publikacja wielu plikow naraz")
+            gr.Markdown("Kazdy plik jest uploadowany i publikowany osobno, kilka plikow jednoczesnie.")
 
+            with gr.Row():
+                with gr.Column(scale=1):
+                    batch_files = gr.File(
+                        label="Wybierz pliki (obrazy lub wideo)",
+                        file_types=["image", "video"],
+                        file_count="multiple"
+                    )
+                    batch_folder = gr.Textbox(
+                        label="lub folder z plikami",
+                        placeholder="np. D:\\sesje\\2024-12"
+                    )
+                with gr.Column(scale=1):
+                    batch_caption = gr.Textbox(
+                        label="Opis / Caption (dla wszystkich postow)",
+                        lines=3
+                    )
+                    batch_audience = gr.Dropdown(
+                        choices=["Wszyscy (publiczny)", "Obserwujacy i subskrybenci", "Tylko subskrybenci"],
+                        value="Obserwujacy i subskrybenci",
+                        label="Odbiorcy"
+                    )
+                    batch_concurrency = gr.Slider(
+                        minimum=1, maximum=16, step=1, value=BATCH_CONCURRENCY,
+                        label="Plikow jednoczesnie"
+                    )
+                    batch_creators = gr.CheckboxGroup(
+                        choices=state.creator_choices(),
+                        value=[state.creator_uuid] if state.creator_uuid else [],
+                        label="Creatorzy (kazdy plik trafia do kazdego zaznaczonego)"
+                    )
+                    batch_queued = gr.Checkbox(
+                        label="W tle (kolejka zadan) - publikacja trwa po zamknieciu strony",
+                        value=False
+                    )
+                    batch_style = gr.Dropdown(
+                        choices=CAPTION_STYLES,
+                        value=None,
+                        label="Styl opisu AI dla kazdego pliku (tylko w tle, gdy opis jest pusty)"
+                    )
+                    batch_allow_similar = gr.Checkbox(
+                        label="Wyslij mimo podobienstwa do juz uploadowanych plikow",
+                        value=False
+                    )
+                    batch_btn = gr.Button("Opublikuj wszystkie", variant="primary")
+
+            batch_status = gr.Textbox(label="Status", interactive=False)
+            batch_table = gr.Dataframe(
+                headers=["Plik", "Creator", "Status", "Media UUID", "Wynik", "Czas [s]"],
+                datatype=["str", "str", "str", "str", "str", "str"],
+                label="Postep",
+                interactive=False,
+                wrap=True
+            )
 
-def generate_content_ideas(niche: str, days: int, include_seasonal: bool, include_ppv: bool, progress=gr.Progress()) -> tuple:
-    """Generate content ideas plan using GPT-4o."""
-    if not state.openai_client:
-        return [], "[]", "Najpierw ustaw klucz OpenAI API!"
-
-    if not niche.strip():
-        return [], "[]", "Opisz swoja nisze/styl!"
+            batch_btn.click(
+                publish_batch,
+                inputs=[batch_files, batch_folder, batch_caption, batch_audience, batch_concurrency,
+                        batch_queued, batch_style, batch_creators, batch_allow_similar],
+                outputs=[batch_table, batch_status]
+            )
 
-    progress(0.1, desc="Generowanie pomyslow...")
-
-    current_month = datetime.now().month
-    month_name = datetime.now().strftime("%B")
-
-    seasonal_part = ""
-    if include_seasonal:
-        themes = SEASONAL_THEMES.get(current_month, [])
-        seasonal_part = f"\nCurrent month: {month_name} - incorporate these seasonal themes: {', '.join(themes)}"
-
-    ppv_part = ""
-    if include_ppv:
-        ppv_part = "\nInclude 2-3 PPV exclusive content ideas spread across the plan. PPV posts should be premium, exclusive content that subscribers pay extra for."
-    else:
-        ppv_part = "\nDo NOT include any PPV exclusive posts."
-
-    post_types_str = ", ".join(POST_TYPES)
-
-    prompt = f"""You are a content strategist for an adult content creator on Fanvue.
-
-Niche/style: {niche}
-
-Generate a {days}-day content plan.{seasonal_part}{ppv_part}
-
-Mix these content types throughout the plan: {post_types_str}
-Ensure variety - don't repeat the same type on consecutive days.
-Include at least one series idea (e.g. "7 days of...", "Behind the scenes week").
-
-For each day provide:
-- day: day number (1 to {days})
-- type: one of [{post_types_str}]
-- idea: short description of the content idea (max 80 chars)
-- caption_draft: a ready-to-use caption with emojis (max 200 chars)
-- audience: one of [public, followers, subscribers]
-- best_time: suggested posting time in HH:MM format (consider peak engagement hours)
-- hashtags: 3-5 relevant hashtags as a string
-
-Return ONLY a valid JSON array, no markdown formatting, no code blocks. Example format:
-[{{"day":1,"type":"Photo","idea":"...","caption_draft":"...","audience":"public","best_time":"19:00","hashtags":"#tag1 #tag2 #tag3"}}]"""
-
-    try:
-        response = state.openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=4096,
-            temperature=0.8
-        )
-
-        content = response.choices[0].message.content.strip()
-        # Clean potential markdown code blocks
-        if content.startswith("```"):
-            content = content.split("\n", 1)[1]
-            if content.endswith("```"):
-                content = content[:-3].strip()
-
-        ideas = json.loads(content)
-
-        progress(0.9, desc="Przygotowywanie tabeli...")
-
-        # Build table data
-        table_data = []
-        for idea in ideas:
-            table_data.append([
-                idea.get("day", ""),
-                idea.get("type", ""),
-                idea.get("idea", ""),
-                idea.get("caption_draft", ""),
-                idea.get("audience", ""),
-                idea.get("best_time", ""),
-                idea.get("hashtags", "")
-            ])
-
-        progress(1.0, desc="Gotowe!")
-        return table_data, json.dumps(ideas, ensure_ascii=False), f"Wygenerowano plan na {len(ideas)} dni!"
-
-    except json.JSONDecodeError as e:
-        return [], "[]", f"Blad parsowania odpowiedzi AI: {str(e)}\n\nOdpowiedz:\n{content[:500]}"
-    except Exception as e:
-        return [], "[]", f"Blad generowania: {str(e)}"
-
-
-def export_ideas_csv(ideas_json: str) -> Optional[str]:
-    """Export ideas to CSV file."""
-    if not ideas_json or ideas_json == "[]":
-        return None
-
-    try:
-        ideas = json.loads(ideas_json)
-        if not ideas:
-            return None
-
-        # Ensure pomysly directory exists
-        export_dir = Path(__file__).parent / "pomysly"
-        export_dir.mkdir(exist_ok=True)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filepath = export_dir / f"content_plan_{timestamp}.csv"
-
-        with open(filepath, "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.writer(f)
-            writer.writerow(["Dzien", "Typ", "Pomysl", "Caption", "Odbiorcy", "Godzina", "Hashtagi"])
-            for idea in ideas:
-                writer.writerow([
-                    idea.get("day", ""),
-                    idea.get("type", ""),
-                    idea.get("idea", ""),
-                    idea.get("caption_draft", ""),
-                    idea.get("audience", ""),
-                    idea.get("best_time", ""),
-                    idea.get("hashtags", "")
-                ])
-
-        return str(filepath)
-
-    except Exception:
-        return None
-
-
-def full_upload_and_post(file, caption: str, audience: str, progress=gr.Progress()) -> str:
-    """Complete flow: upload media and create post."""
-    if not file:
-        return "Wybierz plik!"
+            def refresh_creators():
+                choices = state.creator_choices()
+                return (gr.update(choices=choices, value=state.creator_uuid),
+                        gr.update(choices=choices, value=[state.creator_uuid] if state.creator_uuid else []))
+
+            # A login can bring a different list of managed creators
+            auth_event.then(refresh_creators, outputs=[active_creator, batch_creators])
+
+        with gr.Tab("Opisy hurtowo"):
+            gr.Markdown("### Generowanie opisow AI dla wielu plikow")
+            gr.Markdown("Opisy powstaja rownolegle z limitem tokenow na minute. Wyniki trafiaja do CSV w folderze `opisy/`; "
+                        "ponowne uruchomienie z tym samym plikiem CSV pomija pliki, ktore juz maja opis.")
+
+            with gr.Row():
+                with gr.Column(scale=1):
+                    bulk_files = gr.File(
+                        label="Wybierz pliki (obrazy lub wideo)",
+                        file_types=["image", "video"],
+                        file_count="multiple"
+                    )
+                    bulk_folder = gr.Textbox(label="lub folder z plikami")
+                with gr.Column(scale=1):
+                    bulk_style = gr.Dropdown(choices=CAPTION_STYLES, value="Casual & Fun", label="Styl opisu")
+                    bulk_custom_prompt = gr.Textbox(label="Custom prompt (dla stylu Custom)")
+                    bulk_csv = gr.Textbox(label="Plik CSV", value="opisy.csv")
+                    with gr.Row():
+                        bulk_concurrency = gr.Slider(
+                            minimum=1, maximum=32, step=1, value=CAPTION_CONCURRENCY,
+                            label="Zapytan jednoczesnie"
+                        )
+                        bulk_tpm = gr.Number(value=CAPTION_TOKENS_PER_MINUTE, precision=0, label="Limit tokenow / min")
+                    bulk_btn = gr.Button("Generuj opisy", variant="primary")
+
+            bulk_status = gr.Textbox(label="Status", interactive=False)
+            bulk_table = gr.Dataframe(
+                headers=["Plik", "Status", "Opis", "Tokeny"],
+                datatype=["str", "str", "str", "number"],
+                label="Opisy",
+                interactive=False,
+                wrap=True
+            )
 
-    progress(0.1, desc="Uploadowanie media...")
-    media_uuid, upload_msg = upload_media(file)
+            bulk_btn.click(
+                bulk_caption_handler,
+                inputs=[bulk_files, bulk_folder, bulk_style, bulk_custom_prompt, bulk_csv, bulk_concurrency, bulk_tpm],
+                outputs=[bulk_table, bulk_status]
+            )
 
-    if not media_uuid:
-        return upload_msg
+        with gr.Tab("Historia"):
+            gr.Markdown("### Historia postow")
+            gr.Markdown("Posty sa zapisywane lokalnie; **Synchronizuj** pobiera tylko nowe posty, filtry i strony dzialaja bez API.")
 
-    progress(0.7, desc="Tworzenie posta...")
-    result = create_post(caption, media_uuid, audience)
+            with gr.Row():
+                history_audience = gr.Dropdown(
+                    choices=[("Wszystkie", "")] + [(label, value) for value, label in AUDIENCE_LABELS.items()],
+                    value="",
+                    label="Odbiorcy"
+                )
+                history_media_type = gr.Dropdown(
+                    choices=[("Wszystkie", ""), ("Zdjecie", "image"), ("Wideo", "video"), ("Tekst", "text")],
+                    value="",
+                    label="Typ mediow"
+                )
+                history_from = gr.Textbox(label="Od (RRRR-MM-DD)", placeholder="2025-01-01")
+                history_to = gr.Textbox(label="Do (RRRR-MM-DD)", placeholder="2025-12-31")
+                history_page = gr.Number(value=1, precision=0, minimum=1, label="Strona")
+
+            with gr.Row():
+                sync_history_btn = gr.Button("Synchronizuj", variant="primary")
+                full_sync_history_btn = gr.Button("Pelna synchronizacja")
+                show_history_btn = gr.Button("Pokaz")
+
+            history_status = gr.Textbox(label="Status", interactive=False)
+            history_table = gr.Dataframe(
+                headers=["Data", "Odbiorcy", "Typ", "Cena", "Tekst", "Post UUID"],
+                datatype=["str", "str", "str", "number", "str", "str"],
+                label="Posty",
+                interactive=False,
+                wrap=True
+            )
 
-    progress(1.0, desc="Gotowe!")
-    return f"{upload_msg}\n\n{result}"
+            def show_history(audience, media_type, date_from, date_to, page, note=""):
+                if not state.creator_uuid:
+                    return [], "Niezalogowany"
+                page = max(1, int(page or 1))
+                try:
+                    rows, total = post_store.query(
+                        state.creator_uuid, audience or "", media_type or "",
+                        (date_from or "").strip(), (date_to or "").strip(), page, HISTORY_PAGE_SIZE
+                    )
+                except ValueError:
+                    return [], "Nieprawidlowa data, uzyj formatu RRRR-MM-DD"
+                pages = max(1, -(-total // HISTORY_PAGE_SIZE))
+                table = [[created, AUDIENCE_LABELS.get(aud, aud), media, price, text, uuid]
+                         for created, aud, media, price, text, uuid in rows]
+                return table, f"{note}Strona {page}/{pages} - {total} postow"
+
+            def sync_history(audience, media_type, date_from, date_to, page, full=False):
+                if not state.is_authenticated():
+                    return [], "Niezalogowany"
+                try:
+                    new_posts = post_store.sync(state.api, state.creator_uuid, full=full)
+                    note = f"Zsynchronizowano, nowych postow: {new_posts}. "
+                except Exception as e:
+                    note = f"Blad synchronizacji: {str(e)}. "
+                return show_history(audience, media_type, date_from, date_to, page, note)
+
+            history_inputs = [history_audience, history_media_type, history_from, history_to, history_page]
+            sync_history_btn.click(sync_history, inputs=history_inputs, outputs=[history_table, history_status])
+            full_sync_history_btn.click(
+                lambda *args: sync_history(*args, full=True),
+                inputs=history_inputs,
+                outputs=[history_table, history_status]
+            )
+            show_history_btn.click(show_history, inputs=history_inputs, outputs=[history_table, history_status])
+            for control in [history_audience, history_media_type, history_page]:
+                control.change(show_history, inputs=history_inputs, outputs=[history_table, history_status])
+
+        with gr.Tab("Statystyki"):
+            gr.Markdown("### Statystyki postow")
+            gr.Markdown(
+                "Te same liczby co cotygodniowy digest: posty dziennie, zdjecia/wideo, PPV, zrodla opisow "
+                "i pozostale media. Domyslnie z lokalnej historii postow (zsynchronizuj ja w zakladce Historia)."
+            )
 
+            with gr.Row():
+                stats_days = gr.Slider(minimum=1, maximum=90, step=1, value=7, label="Ostatnie dni")
+                stats_history_file = gr.File(label="CSV post_history (opcjonalnie)", file_types=[".csv"])
+                stats_catalog_file = gr.File(label="CSV media_catalog (opcjonalnie, zamiast zakladki Katalog)", file_types=[".csv"])
+            stats_btn = gr.Button("Oblicz", variant="primary")
+            stats_report = gr.Textbox(label="Podsumowanie", lines=20, interactive=False)
+            stats_json = gr.JSON(label="Szczegoly")
+
+            def show_stats(days, history_file, catalog_file):
+                try:
+                    if history_file:
+                        stats = RollingStats()
+                        stats.add(HistoryColumns.from_records(read_csv(history_file)))
+                    elif state.creator_uuid:
+                        stats = post_stats.refresh(state.creator_uuid)
+                    else:
+                        return "Zaloguj sie albo wczytaj CSV z historia postow", {}
+                    if catalog_file:
+                        backlog = backlog_counts(read_csv(catalog_file))
+                    else:
+                        # Fall back to the local media catalog when it has anything in it
+                        backlog = media_catalog.backlog()
+                        if not backlog["total_media"]:
+                            backlog = None
+                    report = weekly_stats(stats, backlog, int(days))
+                    return format_report(report), report
+                except Exception as e:
+                    return f"Blad: {str(e)}", {}
+
+            stats_btn.click(
+                show_stats,
+                inputs=[stats_days, stats_history_file, stats_catalog_file],
+                outputs=[stats_report, stats_json]
+            )
 
-# Load tokens on startup
-load_tokens()
+        with gr.Tab("Katalog"):
+            gr.Markdown("### Katalog mediow do publikacji")
+            gr.Markdown(
+                "Pliki czekajace na publikacje. **Losuj i opublikuj** wybiera losowy nieopublikowany plik "
+                "(wideo jako PPV z cena zalezna od dnia i godziny), uploaduje go i tworzy post."
+            )
 
+            with gr.Row():
+                with gr.Column():
+                    catalog_folder = gr.Textbox(label="Folder z mediami", placeholder="D:\\media\\nsfw")
+                    catalog_channel = gr.Radio(
+                        choices=[("Fanvue", "fanvue"), ("Social media", "social")],
+                        value="fanvue",
+                        label="Kanal"
+                    )
+                    catalog_add_btn = gr.Button("Dodaj folder")
+                    catalog_import = gr.File(label="Import CSV media_catalog z n8n", file_types=[".csv"])
+                with gr.Column():
+                    catalog_style = gr.Dropdown(choices=CAPTION_STYLES, value="Sexy & Flirty", label="Styl opisu AI")
+                    catalog_use_ai = gr.Checkbox(
+                        value=True,
+                        label="Opis AI na zywo (bez klucza OpenAI lub przy odmowie: opis z katalogu)"
+                    )
+                    catalog_publish_btn = gr.Button("Losuj i opublikuj", variant="primary")
 
-# Build Gradio Interface
-with gr.Blocks(title="Fanvue Post Creator", theme=gr.themes.Soft()) as app:
-    gr.Markdown("# Fanvue Post Creator")
-    gr.Markdown("Upload media i tworzenie postow na Fanvue z AI-generowanymi opisami.")
+            catalog_status = gr.Textbox(label="Status", lines=4, interactive=False)
 
-    with gr.Tab("Ustawienia"):
-        gr.Markdown("## Autoryzacja Fanvue")
-        gr.Markdown("""
-        Aby uzyskac token:
-        1. Zaloguj sie na [fanvue.com](https://fanvue.com)
-        2. Otworz DevTools (F12) -> Application -> Cookies
-        3. Skopiuj wartosc `access_token`
+            gr.Markdown("#### Automatyczna publikacja")
+            gr.Markdown(
+                "Codziennie 2-4 losowe godziny miedzy 9 a 21. Plik jest uploadowany z wyprzedzeniem "
+                "i publikowany przez Fanvue dokladnie o zaplanowanej godzinie (`scheduledAt`)."
+            )
+            with gr.Row():
+                scheduler_start_btn = gr.Button("Wlacz harmonogram", variant="primary")
+                scheduler_stop_btn = gr.Button("Wylacz harmonogram")
+                scheduler_refresh_btn = gr.Button("Odswiez")
+            scheduler_state = gr.Textbox(label="Harmonogram", interactive=False)
+            scheduler_table = gr.Dataframe(
+                headers=["Slot", "Status", "Wynik"],
+                datatype=["str", "str", "str"],
+                label="Plan publikacji",
+                interactive=False,
+                wrap=True
+            )
 
-        Lub uzyj OAuth2 flow przez developer portal Fanvue.
-        """)
+            def catalog_summary() -> str:
+                fanvue = media_catalog.available("fanvue")
+                social = media_catalog.available("social")
+                return (f"Do publikacji - Fanvue: {fanvue.get('image', 0)} zdjec, {fanvue.get('video', 0)} wideo; "
+                        f"social media: {social.get('image', 0)} zdjec, {social.get('video', 0)} wideo")
+
+            def add_catalog_folder(folder, channel):
+                if not folder or not Path(folder.strip()).expanduser().is_dir():
+                    return "Podaj istniejacy folder!"
+                added = media_catalog.add_folder(folder.strip(), channel)
+                return f"Dodano {added} nowych plikow.\n{catalog_summary()}"
+
+            def import_catalog(csv_file):
+                if not csv_file:
+                    return catalog_summary()
+                try:
+                    added = media_catalog.import_records(read_csv(csv_file))
+                    return f"Zaimportowano {added} nowych pozycji.\n{catalog_summary()}"
+                except Exception as e:
+                    return f"Blad importu: {str(e)}"
+
+            def publish_catalog_item(style, use_ai):
+                return publish_from_catalog(style, use_ai)[1]
+
+            def scheduler_view():
+                state_text = "wlaczony" if publish_scheduler.enabled else "wylaczony"
+                return f"Harmonogram {state_text}. {catalog_summary()}", publish_scheduler.timetable()
+
+            def start_scheduler():
+                if not state.is_authenticated():
+                    return "Najpierw zaloguj sie!", publish_scheduler.timetable()
+                publish_scheduler.start()
+                return scheduler_view()
+
+            def stop_scheduler():
+                publish_scheduler.stop()
+                return scheduler_view()
+
+            scheduler_start_btn.click(start_scheduler, outputs=[scheduler_state, scheduler_table])
+            scheduler_stop_btn.click(stop_scheduler, outputs=[scheduler_state, scheduler_table])
+            scheduler_refresh_btn.click(scheduler_view, outputs=[scheduler_state, scheduler_table])
+
+            catalog_add_btn.click(add_catalog_folder, inputs=[catalog_folder, catalog_channel], outputs=catalog_status)
+            catalog_import.upload(import_catalog, inputs=catalog_import, outputs=catalog_status)
+            catalog_publish_btn.click(publish_catalog_item, inputs=[catalog_style, catalog_use_ai], outputs=catalog_status)
+
+        with gr.Tab("Pomysly na posty"):
+            gr.Markdown("### Generator pomyslow na posty")
+            gr.Markdown("AI wygeneruje plan tresci na wybrana liczbe dni, z uwzglednieniem sezonowosci i roznorodnosci.")
+
+            with gr.Row():
+                with gr.Column(scale=2):
+                    niche_input = gr.Textbox(
+                        label="Opisz swoja nisze / styl",
+                        placeholder="np. glamour, lingerie, fitness, cosplay...",
+                        lines=2
+                    )
+                with gr.Column(scale=1):
+                    days_slider = gr.Slider(
+                        minimum=7, maximum=30, step=1, value=14,
+                        label="Liczba dni"
+                    )
 
-        with gr.Row():
-            access_token_input = gr.Textbox(
-                label="Access Token",
-                type="password",
-                placeholder="Wklej access token z Fanvue..."
-            )
-            refresh_token_input = gr.Textbox(
-                label="Refresh Token (opcjonalnie)",
-                type="password",
-                placeholder="Opcjonalnie..."
+            with gr.Row():
+                include_seasonal = gr.Checkbox(label="Tematy sezonowe", value=True)
+                include_ppv = gr.Checkbox(label="Dolacz pomysly PPV", value=True)
+                generate_ideas_btn = gr.Button("Generuj plan tresci", variant="primary")
+
+            ideas_status = gr.Textbox(label="Status", interactive=False)
+            ideas_json_state = gr.State("[]")
+
+            ideas_table = gr.Dataframe(
+                headers=["Dzien", "Typ", "Pomysl", "Caption", "Odbiorcy", "Godzina", "Hashtagi"],
+                datatype=["number", "str", "str", "str", "str", "str", "str"],
+                label="Plan tresci",
+                interactive=False,
+                wrap=True
             )
 
-        auth_btn = gr.Button("Zaloguj", variant="primary")
-        auth_status = gr.Textbox(label="Status", interactive=False,
-                                  value="Zalogowany!" if state.is_authenticated() else "Niezalogowany")
-
-        auth_btn.click(
-            authenticate_with_token,
-            inputs=[access_token_input, refresh_token_input],
-            outputs=auth_status
-        )
-
-        gr.Markdown("---")
-        gr.Markdown("## OpenAI API")
-
-        openai_key_input = gr.Textbox(
-            label="OpenAI API Key",
-            type="password",
-            placeholder="sk-...",
-            value="" if not os.getenv("OPENAI_API_KEY") else "***ustawiony z .env***"
-        )
-        openai_btn = gr.Button("Ustaw klucz OpenAI")
-        openai_status = gr.Textbox(label="Status OpenAI", interactive=False,
-                                    value="Skonfigurowany" if state.openai_client else "Nie skonfigurowany")
-
-        openai_btn.click(
-            set_openai_key,
-            inputs=openai_key_input,
-            outputs=openai_status
-        )
-
-    with gr.Tab("Nowy Post"):
-        with gr.Row():
-            with gr.Column(scale=1):
-                gr.Markdown("### Media")
-                file_input = gr.File(
-                    label="Wybierz plik (obraz lub wideo)",
-                    file_types=["image", "video"]
-                )
-                image_preview = gr.Image(label="Podglad", visible=True)
+            with gr.Row():
+                export_csv_btn = gr.Button("Eksportuj do CSV", variant="secondary")
+                export_file = gr.File(label="Pobierz CSV", visible=False)
 
-                gr.Markdown("### Generowanie opisu AI")
-                style_dropdown = gr.Dropdown(
-                    choices=["Sexy & Flirty", "Casual & Fun", "Mysterious", "Promotional", "Custom"],
-                    value="Casual & Fun",
-                    label="Styl opisu"
-                )
-                custom_prompt = gr.Textbox(
-                    label="Custom prompt (dla stylu Custom)",
-                    placeholder="Napisz wlasny prompt...",
-                    visible=False
-                )
-                generate_btn = gr.Button("Generuj opis AI", variant="secondary")
-
-            with gr.Column(scale=1):
-                gr.Markdown("### Tresc posta")
-                caption_input = gr.Textbox(
-                    label="Opis / Caption",
-                    lines=5,
-                    placeholder="Wpisz lub wygeneruj opis..."
-                )
+            gr.Markdown("---")
+            gr.Markdown("### Uzyj pomyslu w nowym poscie")
 
-                audience_dropdown = gr.Dropdown(
-                    choices=["Wszyscy (publiczny)", "Obserwujacy i subskrybenci", "Tylko subskrybenci"],
-                    value="Obserwujacy i subskrybenci",
-                    label="Odbiorcy"
+            with gr.Row():
+                idea_row_number = gr.Number(
+                    label="Numer wiersza (1, 2, 3...)",
+                    value=1, minimum=1, precision=0
                 )
+                use_idea_btn = gr.Button("Uzyj tego pomyslu w Nowym Poscie", variant="secondary")
+                use_idea_status = gr.Textbox(label="", interactive=False)
+
+            # Generate ideas handler
+            generate_ideas_btn.click(
+                generate_content_ideas,
+                inputs=[niche_input, days_slider, include_seasonal, include_ppv],
+                outputs=[ideas_table, ideas_json_state, ideas_status]
+            )
 
-                # scheduled_input = gr.Textbox(
-                #     label="Zaplanuj (ISO date, opcjonalnie)",
-                #     placeholder="2024-12-31T12:00:00Z"
-                # )
-
-                post_btn = gr.Button("Opublikuj Post", variant="primary", size="lg")
-                result_output = gr.Textbox(label="Wynik", lines=5, interactive=False)
-
-        # Show/hide custom prompt
-        def toggle_custom(style):
-            return gr.update(visible=(style == "Custom"))
-
-        style_dropdown.change(toggle_custom, inputs=style_dropdown, outputs=custom_prompt)
-
-        # Update preview when file selected
-        def update_preview(file):
-            if file and file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
-                return gr.update(value=file, visible=True)
-            return gr.update(value=None, visible=False)
-
-        file_input.change(update_preview, inputs=file_input, outputs=image_preview)
-
-        # Generate caption
-        def generate_caption_handler(file, style, custom):
-            if not file:
-                return "Najpierw wybierz plik!"
-
-            ext = Path(file).suffix.lower()
-            if ext in [".mp4", ".mov", ".avi", ".webm"]:
-                return generate_video_caption(style, custom)
-            else:
-                return generate_caption(file, style, custom)
-
-        generate_btn.click(
-            generate_caption_handler,
-            inputs=[file_input, style_dropdown, custom_prompt],
-            outputs=caption_input
-        )
-
-        # Post button
-        post_btn.click(
-            full_upload_and_post,
-            inputs=[file_input, caption_input, audience_dropdown],
-            outputs=result_output
-        )
-
-    with gr.Tab("Historia"):
-        gr.Markdown("### Ostatnie posty")
-        gr.Markdown("_Funkcja w przygotowaniu..._")
-
-        refresh_history_btn = gr.Button("Odswież")
-        history_output = gr.JSON(label="Historia")
-
-        def get_history():
-            if not state.is_authenticated():
-                return {"error": "Niezalogowany"}
-            try:
-                with httpx.Client() as client:
-                    response = client.get(
-                        f"{FANVUE_API_BASE}/creators/{state.creator_uuid}/posts",
-                        headers=get_headers(),
-                        params={"limit": 10}
-                    )
-                    if response.status_code == 200:
-                        return response.json()
-                    return {"error": f"Status {response.status_code}"}
-            except Exception as e:
-                return {"error": str(e)}
-
-        refresh_history_btn.click(get_history, outputs=history_output)
-
-    with gr.Tab("Pomysly na posty"):
-        gr.Markdown("### Generator pomyslow na posty")
-        gr.Markdown("AI wygeneruje plan tresci na wybrana liczbe dni, z uwzglednieniem sezonowosci i roznorodnosci.")
-
-        with gr.Row():
-            with gr.Column(scale=2):
-                niche_input = gr.Textbox(
-                    label="Opisz swoja nisze / styl",
-                    placeholder="np. glamour, lingerie, fitness, cosplay...",
-                    lines=2
-                )
-            with gr.Column(scale=1):
-                days_slider = gr.Slider(
-                    minimum=7, maximum=30, step=1, value=14,
-                    label="Liczba dni"
-                )
+            # Export CSV handler
+            def handle_export_csv(ideas_json):
+                filepath = export_ideas_csv(ideas_json)
+                if filepath:
+                    return gr.update(value=filepath, visible=True)
+                return gr.update(value=None, visible=False)
+
+            export_csv_btn.click(
+                handle_export_csv,
+                inputs=[ideas_json_state],
+                outputs=[export_file]
+            )
 
-        with gr.Row():
-            include_seasonal = gr.Checkbox(label="Tematy sezonowe", value=True)
-            include_ppv = gr.Checkbox(label="Dolacz pomysly PPV", value=True)
-            generate_ideas_btn = gr.Button("Generuj plan tresci", variant="primary")
-
-        ideas_status = gr.Textbox(label="Status", interactive=False)
-        ideas_json_state = gr.State("[]")
-
-        ideas_table = gr.Dataframe(
-            headers=["Dzien", "Typ", "Pomysl", "Caption", "Odbiorcy", "Godzina", "Hashtagi"],
-            datatype=["number", "str", "str", "str", "str", "str", "str"],
-            label="Plan tresci",
-            interactive=False,
-            wrap=True
-        )
-
-        with gr.Row():
-            export_csv_btn = gr.Button("Eksportuj do CSV", variant="secondary")
-            export_file = gr.File(label="Pobierz CSV", visible=False)
-
-        gr.Markdown("---")
-        gr.Markdown("### Uzyj pomyslu w nowym poscie")
-
-        with gr.Row():
-            idea_row_number = gr.Number(
-                label="Numer wiersza (1, 2, 3...)",
-                value=1, minimum=1, precision=0
+            # Use idea handler - copies caption to new post tab
+            def handle_use_idea(ideas_json, row_num):
+                try:
+                    ideas = json.loads(ideas_json)
+                    idx = int(row_num) - 1
+                    if 0 <= idx < len(ideas):
+                        caption = ideas[idx].get("caption_draft", "")
+                        return caption, f"Caption z dnia {int(row_num)} skopiowany do zakladki Nowy Post!"
+                    return "", f"Nie ma wiersza nr {int(row_num)}. Dostepne: 1-{len(ideas)}"
+                except Exception as e:
+                    return "", f"Blad: {str(e)}"
+
+            use_idea_btn.click(
+                handle_use_idea,
+                inputs=[ideas_json_state, idea_row_number],
+                outputs=[caption_input, use_idea_status]
             )
-            use_idea_btn = gr.Button("Uzyj tego pomyslu w Nowym Poscie", variant="secondary")
-            use_idea_status = gr.Textbox(label="", interactive=False)
-
-        # Generate ideas handler
-        generate_ideas_btn.click(
-            generate_content_ideas,
-            inputs=[niche_input, days_slider, include_seasonal, include_ppv],
-            outputs=[ideas_table, ideas_json_state, ideas_status]
-        )
-
-        # Export CSV handler
-        def handle_export_csv(ideas_json):
-            filepath = export_ideas_csv(ideas_json)
-            if filepath:
-                return gr.update(value=filepath, visible=True)
-            return gr.update(value=None, visible=False)
-
-        export_csv_btn.click(
-            handle_export_csv,
-            inputs=[ideas_json_state],
-            outputs=[export_file]
-        )
-
-        # Use idea handler - copies caption to new post tab
-        def handle_use_idea(ideas_json, row_num):
-            try:
-                ideas = json.loads(ideas_json)
-                idx = int(row_num) - 1
-                if 0 <= idx < len(ideas):
-                    caption = ideas[idx].get("caption_draft", "")
-                    return caption, f"Caption z dnia {int(row_num)} skopiowany do zakladki Nowy Post!"
-                return "", f"Nie ma wiersza nr {int(row_num)}. Dostepne: 1-{len(ideas)}"
-            except Exception as e:
-                return "", f"Blad: {str(e)}"
-
-        use_idea_btn.click(
-            handle_use_idea,
-            inputs=[ideas_json_state, idea_row_number],
-            outputs=[caption_input, use_idea_status]
-        )
+
+        with gr.Tab("Kolejka"):
+            gr.Markdown("### Kolejka zadan")
+            gr.Markdown(
+                "Zadania w tle (upload, opis AI, post) sa zapisane w `.jobs.db` i wykonywane przez osobne procesy "
+                "`worker.py`. Przetrwaja restart aplikacji; nieudane proby sa ponawiane automatycznie."
+            )
+            with gr.Row():
+                queue_workers = gr.Slider(minimum=1, maximum=8, step=1, value=JOB_WORKERS, label="Liczba workerow")
+                queue_start_btn = gr.Button("Uruchom workery", variant="primary")
+                queue_refresh_btn = gr.Button("Odswiez")
+                queue_retry_btn = gr.Button("Ponow nieudane")
+            queue_status = gr.Textbox(label="Status", interactive=False)
+            queue_table = gr.Dataframe(
+                headers=["ID", "Typ", "Plik", "Creator", "Stan", "Proby", "Wynik", "Aktualizacja"],
+                datatype=["number", "str", "str", "str", "str", "str", "str", "str"],
+                label="Ostatnie zadania",
+                interactive=False,
+                wrap=True
+            )
+
+            def retry_failed_jobs():
+                retried = job_queue.retry_failed()
+                message, rows = queue_view()
+                return f"Ponowiono {retried} zadan.\n{message}", rows
+
+            queue_start_btn.click(start_workers, inputs=queue_workers, outputs=[queue_status, queue_table])
+            queue_refresh_btn.click(queue_view, outputs=[queue_status, queue_table])
+            queue_retry_btn.click(retry_failed_jobs, outputs=[queue_status, queue_table])
+
+    return ui
 
 
 if __name__ == "__main__":
-    app.launch(
+    state.tokens.start()
+    metrics.serve()
+    # Resume automatic publishing if it was on when the app stopped
+    if publish_scheduler.enabled:
+        publish_scheduler.start()
+    build_ui().launch(
         server_name="0.0.0.0",
         server_port=7860,
         share=False
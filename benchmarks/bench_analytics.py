@@ -0,0 +1,119 @@
+"""
+Weekly stats on a synthetic post history: the n8n node's row-by-row filters
+vs. the vectorized per-day cube in analytics.py, full and incremental.
+
+    python benchmarks/bench_analytics.py --rows 1000000
+
+The baseline is a straight port of "Calculate Weekly Stats": every metric is
+another filter over all rows. The vectorized build folds all rows once; the
+incremental refresh folds one new day of posts and re-reads the window.
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analytics import (  # noqa: E402
+    CAPTION_SOURCES, MEDIA_TYPES, SOCIAL_MEDIA, HistoryColumns, RollingStats, weekly_stats
+)
+
+
+def synthetic_history(rows: int, end: int, span_days: int, seed: int = 1) -> HistoryColumns:
+    rng = np.random.default_rng(seed)
+    timestamps = np.sort(rng.integers(end - span_days * 86400, end, rows))
+    sources = rng.choice(len(CAPTION_SOURCES), rows, p=[0.35, 0.35, 0.25, 0.05]).astype(np.uint8)
+    media_types = rng.choice(2, rows, p=[0.7, 0.3]).astype(np.uint8)
+    prices = np.where(media_types == 1, np.where(rng.random(rows) < 0.3, 6.99, 4.99), 0.0)
+    return HistoryColumns(timestamps, sources, media_types, prices)
+
+
+def as_records(history: HistoryColumns) -> list[dict]:
+    """The same rows the way n8n hands them to the Code node."""
+    return [{
+        "published_at": datetime.fromtimestamp(int(ts), timezone.utc).isoformat(),
+        "caption_source": CAPTION_SOURCES[src],
+        "media_type": MEDIA_TYPES[media],
+        "ppv_price": float(price)
+    } for ts, src, media, price in zip(history.timestamps, history.sources, history.media_types, history.prices)]
+
+
+def rowwise_stats(records: list[dict], now: float) -> dict:
+    """Port of the n8n node: one linear filter per metric."""
+    week_ago = now - 7 * 86400
+    week = [p for p in records if datetime.fromisoformat(p["published_at"]).timestamp() >= week_ago]
+    fanvue = [p for p in week if p["caption_source"] != "social_media_blotato"]
+    ppv = [p for p in fanvue if p["ppv_price"] > 0]
+    social = [p for p in week if p["caption_source"] == "social_media_blotato"]
+    return {
+        "total_posts": len(fanvue),
+        "image_posts": len([p for p in fanvue if p["media_type"] == "image"]),
+        "video_posts": len([p for p in fanvue if p["media_type"] == "video"]),
+        "ppv_count": len(ppv),
+        "ppv_revenue_potential": round(sum(p["ppv_price"] for p in ppv), 2),
+        "ai_captions": len([p for p in fanvue if p["caption_source"] == "ai-live"]),
+        "pregen_captions": len([p for p in fanvue if p["caption_source"] == "pre-generated"]),
+        "sm_total": len(social),
+        "sm_images": len([p for p in social if "image" in p["media_type"]]),
+        "sm_videos": len([p for p in social if "video" in p["media_type"]]),
+    }
+
+
+def timed(fn, runs: int = 1) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--span-days", type=int, default=730)
+    args = parser.parse_args()
+
+    # UTC day boundaries so both implementations see the same 7-day window
+    now = (int(time.time()) // 86400 + 1) * 86400 - 1
+    today = now // 86400
+    history = synthetic_history(args.rows, now - 86400, args.span_days)
+    new_day = synthetic_history(args.rows // args.span_days, now, 1, seed=2)
+
+    records = as_records(history)
+    rowwise_seconds, expected = timed(lambda: rowwise_stats(records, now))
+
+    def full_build():
+        stats = RollingStats(utc_offset=0)
+        stats.add(history)
+        return stats, weekly_stats(stats, days=7, today=int(today))
+
+    full_seconds, (stats, report) = timed(full_build, runs=3)
+
+    def incremental():
+        stats.add(new_day)
+        return weekly_stats(stats, days=7, today=int(today))
+
+    incremental_seconds, _ = timed(incremental)
+    window_seconds, _ = timed(lambda: weekly_stats(stats, days=7, today=int(today)), runs=20)
+
+    # Same numbers as the row-wise port (the window is 7 whole UTC days ending now)
+    for key, value in expected.items():
+        assert report[key] == value, (key, report[key], value)
+    social_rows = int(np.count_nonzero(history.sources == SOCIAL_MEDIA))
+
+    print(f"{args.rows} posts over {args.span_days} days ({social_rows} social media)")
+    print(f"{'method':<34} {'ms':>10}")
+    print(f"{'row-wise filters (n8n port)':<34} {rowwise_seconds * 1000:>10.1f}")
+    print(f"{'vectorized full build + window':<34} {full_seconds * 1000:>10.1f}")
+    print(f"{'incremental: +1 day, new window':<34} {incremental_seconds * 1000:>10.2f}")
+    print(f"{'window only (cached cube)':<34} {window_seconds * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Cost of picking one random unposted file as the catalog grows: the n8n way
+(load every row, filter added_to_fanvue == false, pick one) vs. a claim from
+the MediaCatalog free list.
+
+    python benchmarks/bench_catalog.py --sizes 1000,10000,100000
+"""
+
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from media_catalog import MediaCatalog  # noqa: E402
+
+
+def build(path: Path, size: int) -> MediaCatalog:
+    catalog = MediaCatalog(path)
+    # A realistic backlog: most of the catalog is already posted
+    catalog.import_records([{
+        "file_path": f"/media/nsfw/{i}.{'mp4' if i % 4 == 0 else 'jpg'}",
+        "source_folder": "nsfw",
+        "added_to_fanvue": "true" if i % 10 else "false"
+    } for i in range(size)])
+    return catalog
+
+
+def full_scan_pick(conn: sqlite3.Connection) -> int:
+    rows = conn.execute("SELECT id, file_path, status FROM media").fetchall()
+    available = [row for row in rows if row[2] == "available"]
+    return random.choice(available)[0]
+
+
+def measure(fn, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'catalog':>9} {'unposted':>9} {'scan p50 ms':>12} {'claim p50 ms':>13}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            catalog = build(Path(tmp) / "media.db", size)
+            unposted = sum(catalog.available().values())
+            scan = measure(lambda: full_scan_pick(catalog.conn), args.runs)
+
+            def claim_and_release():
+                item = catalog.claim()
+                catalog.release(item["id"], item["claim_token"])
+
+            claim = measure(claim_and_release, args.runs)
+            print(f"{size:>9} {unposted:>9} {statistics.median(scan):>12.2f} {statistics.median(claim):>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Per-post latency: a fresh httpx.Client per call vs. the shared pooled FanvueClient.
+
+    python benchmarks/bench_client.py --posts 200
+
+Most of the fresh-client cost on localhost is building the client itself
+(SSL context plus CA bundle, ~40 ms) and the TCP connect. The mock server speaks
+plain HTTP, so against api.fanvue.com every fresh client additionally pays a
+TLS handshake and the real saving is larger.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core  # noqa: E402
+from mock_server import MockFanvueServer  # noqa: E402
+
+
+def post_with_fresh_client(base_url: str):
+    with httpx.Client() as client:
+        client.post(
+            f"{base_url}/creators/{core.state.creator_uuid}/posts",
+            headers=core.state.api.headers(),
+            json={"text": "benchmark", "audience": "everyone"}
+        )
+
+
+def post_with_pool():
+    core.create_post("benchmark", "", "Wszyscy (publiczny)")
+
+
+def measure(fn, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=200)
+    args = parser.parse_args()
+
+    with MockFanvueServer() as server:
+        core.state.api.base_url = server.url
+        core.state.access_token = "benchmark"
+        core.state.creator_uuid = "mock-creator"
+
+        results = {
+            "fresh client per call": measure(lambda: post_with_fresh_client(server.url), args.posts),
+            "shared pooled client": measure(post_with_pool, args.posts),
+        }
+
+    print(f"{'mode':<24} {'p50 ms':>8} {'mean ms':>8}")
+    for mode, timings in results.items():
+        print(f"{mode:<24} {statistics.median(timings):>8.2f} {statistics.mean(timings):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
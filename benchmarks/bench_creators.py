@@ -0,0 +1,75 @@
+"""
+Pushing one batch to many creators: one run per creator, one after another
+(what N app instances amount to), vs. a single multi-creator batch that
+uploads every file once and posts to all creators through the fair queue.
+
+    python benchmarks/bench_creators.py --creators 5 --files 10 --size-mb 4 --bandwidth-mb 16
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core  # noqa: E402
+from media_index import MediaIndex  # noqa: E402
+from mock_server import MockFanvueServer  # noqa: E402
+from post_store import PostStore  # noqa: E402
+
+
+def run_batch(paths: list[str], creators: list[str]) -> tuple[float, int]:
+    started = time.perf_counter()
+    ok = sum(update[1] == "ok" for update in core.iter_batch_publish(paths, "benchmark", "Wszyscy (publiczny)",
+                                                                       creators=creators))
+    return time.perf_counter() - started, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--creators", type=int, default=5)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--bandwidth-mb", type=float, default=16, help="per connection, 0 = unlimited")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every request")
+    args = parser.parse_args()
+
+    creators = [f"creator-{i}" for i in range(args.creators)]
+    with tempfile.TemporaryDirectory() as tmp, \
+            MockFanvueServer(latency=args.latency, bandwidth=args.bandwidth_mb * 1024 * 1024) as server:
+        core.post_store = PostStore(Path(tmp) / "posts.db")
+        core.upload_journal.path = Path(tmp) / "uploads.json"
+        core.state.api.base_url = server.url
+        core.state.access_token = "benchmark"
+        core.state.creators = {c: c for c in creators}
+        paths = []
+        for i in range(args.files):
+            path = Path(tmp) / f"{i}.jpg"
+            path.write_bytes(os.urandom(int(args.size_mb * 1024 * 1024)))
+            paths.append(str(path))
+
+        sequential_seconds, sequential_ok = 0.0, 0
+        for creator in creators:
+            # Separate app instances share no media index
+            core.media_index = MediaIndex(Path(tmp) / f"index-{creator}.db")
+            seconds, ok = run_batch(paths, [creator])
+            sequential_seconds += seconds
+            sequential_ok += ok
+        sequential_uploaded = server.bytes_received
+
+        core.media_index = MediaIndex(Path(tmp) / "index-shared.db")
+        shared_seconds, shared_ok = run_batch(paths, creators)
+        shared_uploaded = server.bytes_received - sequential_uploaded
+
+    mb = 1024 * 1024
+    print(f"{args.files} files x {args.creators} creators, {args.size_mb} MB each")
+    print(f"{'mode':<30} {'posts':>6} {'uploaded MB':>12} {'seconds':>8}")
+    print(f"{'one run per creator':<30} {sequential_ok:>6} {sequential_uploaded / mb:>12.1f} {sequential_seconds:>8.2f}")
+    print(f"{'one multi-creator batch':<30} {shared_ok:>6} {shared_uploaded / mb:>12.1f} {shared_seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Near-duplicate lookup: multi-index hash tables vs. comparing against every indexed hash.
+
+    python benchmarks/bench_dedup.py --entries 100000 --queries 200 --radius 8
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from media_index import HammingIndex, hamming  # noqa: E402
+
+
+def flip_bits(value: int, bits: int) -> int:
+    for bit in random.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=int, default=8)
+    args = parser.parse_args()
+
+    random.seed(1)
+    hashes = [random.getrandbits(64) for _ in range(args.entries)]
+    # Half the queries are edited copies of indexed files, half are new
+    queries = [flip_bits(random.choice(hashes), random.randint(0, args.radius)) if i % 2 else random.getrandbits(64)
+               for i in range(args.queries)]
+
+    started = time.perf_counter()
+    index = HammingIndex()
+    for i, value in enumerate(hashes):
+        index.add(value, str(i))
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index_hits = [index.search(q, args.radius) for q in queries]
+    index_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scan_hits = [sorted((d, str(i)) for i, h in enumerate(hashes) if (d := hamming(q, h)) <= args.radius)
+                 for q in queries]
+    scan_seconds = time.perf_counter() - started
+
+    assert index_hits == scan_hits
+    found = sum(bool(hits) for hits in index_hits)
+    print(f"{args.entries} hashes, {args.queries} queries, radius {args.radius}: {found} with a match "
+          f"(index built in {build_seconds:.2f}s)")
+    print(f"{'method':<12} {'ms/query':>10}")
+    print(f"{'linear scan':<12} {scan_seconds / args.queries * 1000:>10.2f}")
+    print(f"{'multi-index':<12} {index_seconds / args.queries * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+History refresh: full download vs. incremental sync into the local post store,
+and filtered page queries served from SQLite.
+
+    python benchmarks/bench_history.py --posts 5000 --new 20 --latency 0.05
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fanvue_client import FanvueClient  # noqa: E402
+from mock_server import MockFanvueServer  # noqa: E402
+from post_store import PostStore  # noqa: E402
+
+CREATOR = "mock-creator"
+
+
+def timed(fn) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--new", type=int, default=20, help="posts published between two refreshes")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per API request")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with MockFanvueServer(latency=args.latency) as server, tempfile.TemporaryDirectory() as tmp:
+        server.seed_posts(args.posts)
+        api = FanvueClient(lambda: "benchmark", server.url, "2025-06-26")
+        store = PostStore(Path(tmp) / "posts.db")
+
+        full_seconds, synced = timed(lambda: store.sync(api, CREATOR, full=True))
+        full_requests = server.requests.get(f"/creators/{CREATOR}/posts", 0)
+
+        server.seed_posts(args.new)
+        incremental_seconds, new_posts = timed(lambda: store.sync(api, CREATOR))
+        incremental_requests = server.requests.get(f"/creators/{CREATOR}/posts", 0) - full_requests
+
+        filters = [
+            {},
+            {"audience": "subscribers-only"},
+            {"media_type": "video"},
+            {"audience": "everyone", "media_type": "image", "page": 10},
+        ]
+        timings = []
+        for i in range(args.queries):
+            seconds, _ = timed(lambda: store.query(CREATOR, **filters[i % len(filters)]))
+            timings.append(seconds * 1000)
+        api.close()
+
+    print(f"{'refresh':<26} {'posts':>7} {'requests':>9} {'seconds':>8}")
+    print(f"{'full download':<26} {synced:>7} {full_requests:>9} {full_seconds:>8.2f}")
+    print(f"{'incremental sync':<26} {new_posts:>7} {incremental_requests:>9} {incremental_seconds:>8.2f}")
+    print(f"local page query: p50 {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
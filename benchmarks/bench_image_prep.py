@@ -0,0 +1,82 @@
+"""
+Vision request payload and latency: original image vs. locally downscaled copy.
+
+    python benchmarks/bench_image_prep.py --bandwidth-mb 2
+
+Creates a synthetic 6000x4000 camera-sized JPEG, then sends a caption request
+to the mock OpenAI endpoint with the raw file (old behaviour) and with the
+512px copy used for "detail": "low".
+"""
+
+import argparse
+import base64
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from openai import OpenAI
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from image_prep import image_data_url  # noqa: E402
+from mock_server import MockFanvueServer  # noqa: E402
+
+
+def make_camera_jpeg(path: Path):
+    noise = Image.effect_noise((6000, 4000), 64).convert("RGB")
+    noise.save(path, "JPEG", quality=95)
+
+
+def caption_request(client: OpenAI, data_url: str) -> float:
+    started = time.perf_counter()
+    client.chat.completions.create(
+        model="gpt-4o",
+        messages=[{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Write a caption."},
+                {"type": "image_url", "image_url": {"url": data_url, "detail": "low"}}
+            ]
+        }],
+        max_tokens=300
+    )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bandwidth-mb", type=float, default=2.0, help="simulated uplink to the API")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = Path(tmp) / "camera.jpg"
+        cache_dir = Path(tmp) / "cache"
+        make_camera_jpeg(image_path)
+
+        with MockFanvueServer(bandwidth=args.bandwidth_mb * 1024 * 1024) as server:
+            client = OpenAI(api_key="benchmark", base_url=f"{server.url}/v1")
+
+            started = time.perf_counter()
+            original_url = f"data:image/jpeg;base64,{base64.b64encode(image_path.read_bytes()).decode()}"
+            original_prep = time.perf_counter() - started
+            original_request = caption_request(client, original_url)
+
+            started = time.perf_counter()
+            small_url = image_data_url(image_path, "low", cache_dir)
+            small_prep = time.perf_counter() - started
+            small_request = caption_request(client, small_url)
+
+            started = time.perf_counter()
+            image_data_url(image_path, "low", cache_dir)
+            cached_prep = time.perf_counter() - started
+
+    print(f"{'payload':<12} {'KB':>10} {'prep ms':>9} {'request ms':>11}")
+    print(f"{'original':<12} {len(original_url) / 1024:>10.0f} {original_prep * 1000:>9.0f} {original_request * 1000:>11.0f}")
+    print(f"{'downscaled':<12} {len(small_url) / 1024:>10.0f} {small_prep * 1000:>9.0f} {small_request * 1000:>11.0f}")
+    print(f"{'cached':<12} {len(small_url) / 1024:>10.0f} {cached_prep * 1000:>9.0f} {'-':>11}")
+
+
+if __name__ == "__main__":
+    main()
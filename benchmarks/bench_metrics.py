@@ -0,0 +1,70 @@
+"""
+Cost of the instrumentation itself: one span and one counter per call, with
+and without the JSON trace log, against an uninstrumented loop.
+
+    python benchmarks/bench_metrics.py --calls 200000 --threads 4
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import metrics  # noqa: E402
+
+
+def plain():
+    pass
+
+
+def instrumented():
+    with metrics.span("bench", part=1):
+        metrics.UPLOAD_BYTES.inc(1024)
+
+
+def per_call(function, calls: int, threads: int) -> float:
+    """Wall time per call in microseconds, with `threads` threads sharing the calls."""
+    def loop():
+        for _ in range(calls // threads):
+            function()
+
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    baseline = per_call(plain, args.calls, args.threads)
+    spans = per_call(instrumented, args.calls, args.threads)
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics.trace_log = metrics.TraceLog(str(Path(tmp) / "trace.jsonl"))
+        traced = per_call(instrumented, args.calls, args.threads)
+        metrics.trace_log = None
+
+    started = time.perf_counter()
+    text = metrics.render()
+    render_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{args.calls} calls on {args.threads} threads")
+    print(f"{'variant':<22} {'us/call':>8}")
+    print(f"{'no instrumentation':<22} {baseline:>8.2f}")
+    print(f"{'span + counter':<22} {spans:>8.2f}")
+    print(f"{'with trace log':<22} {traced:>8.2f}")
+    print(f"render: {len(text.splitlines())} lines in {render_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
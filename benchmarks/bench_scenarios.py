@@ -0,0 +1,283 @@
+"""
+End-to-end scenarios against the local mock Fanvue/S3/OpenAI server, with
+machine-readable results for comparing one run against another.
+
+    python benchmarks/bench_scenarios.py
+    python benchmarks/bench_scenarios.py --scenarios large-video,image-batch --output wyniki.ndjson
+    python benchmarks/bench_scenarios.py --api-error-rate 0.05 --latency 0.1
+    python benchmarks/bench_scenarios.py --baseline wyniki.ndjson --tolerance 0.2   # exit 1 on a slowdown
+
+Scenarios:
+    large-video    one large video: multipart upload, processing, post
+    image-batch    500 images through the batch publisher
+    content-plan   a 30-day content plan streamed in parallel chunks
+    history-sync   full, then incremental post history sync
+
+Every scenario runs in a fresh interpreter, so its peak RSS (app and mock
+server together) is its own. p50/p99 come from the metrics trace log
+(metrics.span) and are over single requests: S3 part PUTs, signed URLs,
+posts, completion streams, history pages. Options left out keep each
+scenario's own defaults (see SCENARIOS).
+
+stdout gets one JSON object per scenario; a short table goes to stderr.
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core  # noqa: E402
+import metrics  # noqa: E402
+from caption_cache import CaptionCache  # noqa: E402
+from content_plan import POST_TYPES, iter_content_plan  # noqa: E402
+from media_index import MediaIndex  # noqa: E402
+from mock_server import MockFanvueServer  # noqa: E402
+from post_store import PostStore  # noqa: E402
+from upload_journal import UploadJournal  # noqa: E402
+
+CREATOR = "mock-creator"
+AUDIENCE = "Wszyscy (publiczny)"
+MB = 1024 * 1024
+
+MOCK_OPTIONS = ["latency", "bandwidth_mb", "error_rate", "api_error_rate", "retry_after", "chat_rate_limit_rate",
+                "processing_time", "chat_tokens_per_second"]
+
+
+def random_file(path: Path, size_mb: float) -> Path:
+    with open(path, "wb") as f:
+        remaining = int(size_mb * MB)
+        while remaining > 0:
+            f.write(os.urandom(min(MB, remaining)))
+            remaining -= MB
+    return path
+
+
+def publish(paths: list[str]) -> tuple[float, list[tuple]]:
+    """Run the batch publisher; returns (seconds, final update of every row)."""
+    started = time.perf_counter()
+    final = {}
+    for update in core.iter_batch_publish(paths, "benchmark", AUDIENCE, allow_similar=True):
+        if update[1] in ("ok", "blad"):
+            final[update[0]] = update
+    return time.perf_counter() - started, list(final.values())
+
+
+def large_video(server: MockFanvueServer, tmp: Path, config: dict) -> dict:
+    path = random_file(tmp / "video.mp4", config["size_mb"])
+    seconds, rows = publish([str(path)])
+    return {"seconds": seconds, "ok": sum(row[1] == "ok" for row in rows), "failed": sum(row[1] != "ok" for row in rows),
+            "throughput": config["size_mb"] / seconds, "unit": "MB/s"}
+
+
+def image_batch(server: MockFanvueServer, tmp: Path, config: dict) -> dict:
+    from PIL import Image
+
+    size = config["image_px"]
+    paths = []
+    for i in range(config["files"]):
+        path = tmp / f"image-{i:04d}.jpg"
+        Image.effect_noise((size, size), 20 + i % 80).convert("RGB").save(path, quality=90)
+        paths.append(str(path))
+    seconds, rows = publish(paths)
+    return {"seconds": seconds, "ok": sum(row[1] == "ok" for row in rows), "failed": sum(row[1] != "ok" for row in rows),
+            "throughput": len(paths) / seconds, "unit": "files/s",
+            "extra_latency": {"file": [row[4] for row in rows]}}
+
+
+def content_plan(server: MockFanvueServer, tmp: Path, config: dict) -> dict:
+    # Every chunk gets a full week back; days past the chunk's range are dropped by the parser
+    server.completion_text = json.dumps({"days": [{
+        "day": day, "type": POST_TYPES[day % len(POST_TYPES)], "idea": f"Idea {day}",
+        "caption_draft": "Benchmark caption with a few words in it", "audience": "subscribers",
+        "best_time": "20:00", "hashtags": "#one #two #three"
+    } for day in range(1, 8)]})
+    started = time.perf_counter()
+    first_rows = None
+    ideas, error = [], ""
+    for ideas, finished, error in iter_content_plan(core.stream_completion, "benchmark", config["days"], True, True):
+        if ideas and first_rows is None:
+            first_rows = time.perf_counter() - started
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "ok": len(ideas), "failed": config["days"] - len(ideas),
+            "throughput": len(ideas) / seconds, "unit": "days/s",
+            "first_rows_seconds": round(first_rows or seconds, 3), "chunk_errors": error or None}
+
+
+def history_sync(server: MockFanvueServer, tmp: Path, config: dict) -> dict:
+    server.seed_posts(config["posts"])
+    started = time.perf_counter()
+    synced = core.post_store.sync(core.state.api, CREATOR, full=True)
+    seconds = time.perf_counter() - started
+
+    server.seed_posts(config["new_posts"])
+    started = time.perf_counter()
+    new_posts = core.post_store.sync(core.state.api, CREATOR)
+    incremental = time.perf_counter() - started
+    return {"seconds": seconds, "ok": synced, "failed": config["posts"] - synced,
+            "throughput": synced / seconds, "unit": "posts/s",
+            "incremental_seconds": round(incremental, 3), "incremental_posts": new_posts}
+
+
+# Defaults per scenario; the mock options missing here are 0 (no latency, no errors, unlimited bandwidth)
+SCENARIOS = {
+    "large-video": (large_video, {"size_mb": 256, "latency": 0.02, "bandwidth_mb": 32, "processing_time": 2.0}),
+    "image-batch": (image_batch, {"files": 500, "image_px": 512, "latency": 0.02, "bandwidth_mb": 16,
+                                  "processing_time": 0.2}),
+    "content-plan": (content_plan, {"days": 30, "latency": 0.3, "chat_tokens_per_second": 400}),
+    "history-sync": (history_sync, {"posts": 5000, "new_posts": 20, "latency": 0.05}),
+}
+
+
+def percentiles(values: list[float]) -> dict:
+    """Count, p50 and p99 (nearest rank) in milliseconds."""
+    values = sorted(values)
+
+    def rank(q: float) -> float:
+        return round(values[max(0, math.ceil(q * len(values)) - 1)] * 1000, 2)
+
+    return {"count": len(values), "p50_ms": rank(0.5), "p99_ms": rank(0.99)}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (MB if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scenario(name: str, config: dict) -> dict:
+    """Run one scenario in this process against a fresh mock server and temporary stores."""
+    scenario, _ = SCENARIOS[name]
+    options = {key: config.get(key, 0) for key in MOCK_OPTIONS}
+    options["bandwidth"] = options.pop("bandwidth_mb") * MB
+    options["retry_after"] = options["retry_after"] or 1.0
+
+    with tempfile.TemporaryDirectory() as tmp, MockFanvueServer(**options) as server:
+        tmp = Path(tmp)
+        os.environ["OPENAI_BASE_URL"] = server.url + "/v1"
+        core.state.api.base_url = server.url
+        core.state.access_token = "benchmark"
+        core.state.creator_uuid = CREATOR
+        core.state.init_openai("sk-benchmark")
+        core.upload_journal = UploadJournal(tmp / "uploads.json")
+        core.media_index = MediaIndex(tmp / "index.db")
+        core.post_store = PostStore(tmp / "posts.db")
+        core.caption_cache = CaptionCache(tmp / "captions.db")
+        metrics.trace_log = metrics.TraceLog(str(tmp / "trace.jsonl"))
+
+        result = scenario(server, tmp, config)
+        metrics.trace_log.close()
+
+        stages: dict[str, list[float]] = result.pop("extra_latency", {})
+        with open(tmp / "trace.jsonl", encoding="utf-8") as f:
+            for record in map(json.loads, f):
+                if record["outcome"] == "ok":
+                    stages.setdefault(record["span"], []).append(record["seconds"])
+        requests = dict(server.requests)
+
+    return {
+        "scenario": name,
+        **{key: round(value, 3) if isinstance(value, float) else value for key, value in result.items()},
+        "latency": {stage: percentiles(values) for stage, values in sorted(stages.items()) if values},
+        "rate_limited": requests.get("429", 0),
+        "peak_rss_mb": peak_rss_mb(),
+        "config": config,
+    }
+
+
+def run_isolated(name: str, config: dict) -> dict:
+    """run_scenario in a fresh interpreter; failures become an `error` entry."""
+    job = json.dumps({"scenario": name, "config": config})
+    result = subprocess.run([sys.executable, __file__, "--child", job], capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"scenario": name, "error": (result.stderr.strip().splitlines() or ["no output"])[-1], "config": config}
+    return json.loads(lines[-1])
+
+
+def regressions(results: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {entry["scenario"]: entry for entry in map(json.loads, f) if "throughput" in entry}
+    found = []
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if not before or "throughput" not in result:
+            continue
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            found.append(f"{result['scenario']}: {result['throughput']} {result['unit']} "
+                         f"(baseline {before['throughput']})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--output", help="also write the results (NDJSON) to this file")
+    parser.add_argument("--baseline", help="earlier --output to compare throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop vs. the baseline")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    knobs = parser.add_argument_group("scenario options (default: per scenario)")
+    knobs.add_argument("--size-mb", type=float, help="large-video: file size")
+    knobs.add_argument("--files", type=int, help="image-batch: number of images")
+    knobs.add_argument("--image-px", type=int, help="image-batch: image width and height")
+    knobs.add_argument("--days", type=int, help="content-plan: plan length")
+    knobs.add_argument("--posts", type=int, help="history-sync: posts on the server")
+    knobs.add_argument("--new-posts", type=int, help="history-sync: posts added before the incremental sync")
+    knobs.add_argument("--latency", type=float, help="seconds added to every request")
+    knobs.add_argument("--bandwidth-mb", type=float, help="per-connection upload bandwidth, 0 = unlimited")
+    knobs.add_argument("--error-rate", type=float, help="share of S3 PUTs answered with 503")
+    knobs.add_argument("--api-error-rate", type=float, help="share of Fanvue API calls answered with 429")
+    knobs.add_argument("--retry-after", type=float, help="Retry-After seconds of those 429s")
+    knobs.add_argument("--chat-rate-limit-rate", type=float, help="share of chat completions answered with 429")
+    knobs.add_argument("--processing-time", type=float, help="seconds until uploaded media is ready")
+    knobs.add_argument("--chat-tokens-per-second", type=float, help="streamed completion pace, 0 = instant")
+    args = parser.parse_args()
+
+    if args.child:
+        job = json.loads(args.child)
+        print(json.dumps(run_scenario(job["scenario"], job["config"])))
+        return
+
+    overrides = {action.dest: getattr(args, action.dest) for action in knobs._group_actions
+                 if getattr(args, action.dest) is not None}
+    results = []
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name}, choose from {', '.join(SCENARIOS)}")
+        defaults = SCENARIOS[name][1]
+        # Size options only reach their own scenario, mock options reach every one
+        config = {**defaults, **{key: value for key, value in overrides.items()
+                                 if key in defaults or key in MOCK_OPTIONS}}
+        result = run_isolated(name, config)
+        results.append(result)
+        print(json.dumps(result), flush=True)
+        if "error" in result:
+            print(f"{name:<14} error: {result['error']}", file=sys.stderr)
+        else:
+            print(f"{name:<14} {result['seconds']:>8.2f}s {result['throughput']:>10.2f} {result['unit']:<8} "
+                  f"ok {result['ok']} failed {result['failed']} peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(result) + "\n" for result in results)
+    if args.baseline:
+        found = regressions(results, args.baseline, args.tolerance)
+        if found:
+            raise SystemExit("slower than the baseline:\n" + "\n".join(found))
+    if any("error" in result for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
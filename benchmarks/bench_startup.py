@@ -0,0 +1,61 @@
+"""
+Cold import time of the headless core vs. the Gradio app, measured with
+`python -X importtime` in fresh interpreters.
+
+    python benchmarks/bench_startup.py --runs 5 --top 10
+    python benchmarks/bench_startup.py --budget 1.0   # exit 1 when core.py takes longer
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def import_times(module: str) -> tuple[float, dict[str, float]]:
+    """Cumulative import time of `module` in seconds, and of each module it imports directly."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        seconds = int(cumulative) / 1_000_000
+        # Entries come children first, each level indented by two more spaces
+        if depth == 1:
+            children[name.strip()] = seconds
+        elif depth == 0:
+            if name.strip() == module:
+                return seconds, children
+            children = {}
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", default="core,app")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="slowest imports listed per module")
+    parser.add_argument("--budget", type=float, default=0, help="max seconds for core, 0 = no check")
+    args = parser.parse_args()
+
+    medians = {}
+    for module in args.modules.split(","):
+        runs = [import_times(module) for _ in range(args.runs)]
+        medians[module] = statistics.median(total for total, _ in runs)
+        print(f"{module}: {medians[module]:.3f}s (median of {args.runs})")
+        slowest = sorted(runs[-1][1].items(), key=lambda item: item[1], reverse=True)
+        for name, seconds in slowest[:args.top]:
+            print(f"    {name:<30} {seconds:.3f}s")
+
+    if args.budget and medians.get("core", 0) > args.budget:
+        raise SystemExit(f"core import {medians['core']:.3f}s exceeds the {args.budget}s budget")
+
+
+if __name__ == "__main__":
+    main()
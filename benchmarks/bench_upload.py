@@ -0,0 +1,58 @@
+"""
+Multipart upload throughput vs. worker count against the local mock server.
+
+    python benchmarks/bench_upload.py --size-mb 64 --bandwidth-mb 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core  # noqa: E402
+from media_index import MediaIndex  # noqa: E402
+from mock_server import MockFanvueServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--part-mb", type=int, default=5)
+    parser.add_argument("--bandwidth-mb", type=float, default=8.0, help="per-connection S3 bandwidth")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", default="1,2,4,8")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+        for _ in range(args.size_mb):
+            f.write(os.urandom(1024 * 1024))
+        file_path = f.name
+
+    try:
+        with MockFanvueServer(latency=args.latency, bandwidth=args.bandwidth_mb * 1024 * 1024) as server:
+            core.state.api.base_url = server.url
+            core.state.access_token = "benchmark"
+            core.upload_journal.path = Path(file_path + ".uploads.json")
+            core.media_index = MediaIndex(Path(file_path + ".index.db"))
+
+            print(f"{'workers':>8} {'seconds':>8} {'MB/s':>8}")
+            for workers in [int(w) for w in args.workers.split(",")]:
+                started = time.perf_counter()
+                media_uuid, message = core.upload_media(file_path, args.part_mb * 1024 * 1024, workers)
+                elapsed = time.perf_counter() - started
+                if not media_uuid:
+                    raise SystemExit(message)
+                # Measure a fresh upload every time instead of reusing the first one
+                core.media_index.forget_media(media_uuid)
+                print(f"{workers:>8} {elapsed:>8.2f} {args.size_mb / elapsed:>8.1f}")
+    finally:
+        for path in Path(file_path).parent.glob(Path(file_path).name + "*"):
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
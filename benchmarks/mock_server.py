@@ -0,0 +1,325 @@
+"""
+Local stand-in for the Fanvue API, the S3 bucket behind its signed URLs and
+the OpenAI chat completions endpoint.
+Used by the benchmarks so they never touch production services.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment, otherwise Nagle plus delayed ACKs
+    # add ~40 ms to every keep-alive response
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self) -> "MockFanvueServer":
+        return self.server.mock
+
+    def send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self) -> bool:
+        """With `token_ttl` set, API calls need a live token from `issue_tokens` or /oauth2/token."""
+        if not self.mock.token_ttl:
+            return True
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        expires_at = self.mock.access_tokens.get(token)
+        if expires_at is not None and time.time() < expires_at:
+            return True
+        self.mock.count("401")
+        self.send_json(401, {"error": "token expired"})
+        return False
+
+    def rate_limited(self) -> bool:
+        """Answer a share (`api_error_rate`) of Fanvue API calls with 429 and Retry-After."""
+        if random.random() >= self.mock.api_error_rate:
+            return False
+        self.mock.count("429")
+        body = json.dumps({"error": "rate limit exceeded"}).encode()
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Retry-After", str(self.mock.retry_after))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def token_grant(self):
+        """OAuth refresh_token grant; refresh tokens are single use (rotated)."""
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        self.mock.count(self.path)
+        refresh_token = form.get("refresh_token", [""])[0]
+        with self.mock._lock:
+            valid = form.get("grant_type", [""])[0] == "refresh_token" and refresh_token in self.mock.refresh_tokens
+            if valid:
+                self.mock.refresh_tokens.discard(refresh_token)
+        if not valid:
+            return self.send_json(400, {"error": "invalid_grant"})
+        access_token, new_refresh = self.mock.issue_tokens()
+        self.send_json(200, {"access_token": access_token, "refresh_token": new_refresh,
+                             "expires_in": self.mock.token_ttl, "token_type": "bearer"})
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def read_throttled(self, length: int, sink: list = None) -> str:
+        """Drain a request body at the configured per-connection bandwidth, returning its md5.
+
+        The chunks are also appended to `sink` when one is given.
+        """
+        digest = hashlib.md5()
+        remaining = length
+        started = time.perf_counter()
+        while remaining > 0:
+            chunk = self.rfile.read(min(64 * 1024, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            digest.update(chunk)
+            if sink is not None:
+                sink.append(chunk)
+            if self.mock.bandwidth:
+                expected = (length - remaining) / self.mock.bandwidth
+                lag = expected - (time.perf_counter() - started)
+                if lag > 0:
+                    time.sleep(lag)
+        return digest.hexdigest()
+
+    def do_POST(self):
+        time.sleep(self.mock.latency)
+        if self.path == "/v1/chat/completions":
+            return self.chat_completion()
+        if self.path == "/oauth2/token":
+            return self.token_grant()
+        body = self.read_json()
+        if not self.authorized() or self.rate_limited():
+            return
+        self.mock.count(self.path)
+
+        if self.path == "/media/upload/multipart/create":
+            return self.send_json(200, {"uploadId": uuid.uuid4().hex})
+        if self.path == "/media/upload/multipart/sign":
+            url = f"{self.mock.url}/s3/{body['uploadId']}/{body['partNumber']}"
+            return self.send_json(200, {"url": url})
+        if self.path == "/media/upload/multipart/complete":
+            self.mock.completed.append(body)
+            media_uuid = uuid.uuid4().hex
+            self.mock.media_ready_at[media_uuid] = time.monotonic() + self.mock.processing_time
+            return self.send_json(200, {"uuid": media_uuid})
+        if self.path.startswith("/creators/") and self.path.endswith("/posts"):
+            post = {"uuid": uuid.uuid4().hex, "createdAt": self.mock.now(), **body}
+            self.mock.posts.insert(0, post)
+            return self.send_json(201, {"uuid": post["uuid"]})
+        self.send_json(404, {"error": "not found"})
+
+    def chat_completion(self):
+        """OpenAI-compatible completion; the request body is read at the throttled bandwidth."""
+        self.mock.count(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        chunks = []
+        self.read_throttled(length, chunks)
+        request = json.loads(b"".join(chunks) or b"{}")
+        if random.random() < self.mock.chat_rate_limit_rate:
+            body = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode()
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", "0.2")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.mock.chat_bytes_received += length
+        if request.get("stream"):
+            return self.stream_completion(request)
+        self.send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4o",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.mock.completion_text},
+                "finish_reason": "stop"
+            }],
+            # Images are billed per tile, not per byte, so usage does not follow the payload size
+            "usage": {"prompt_tokens": 150, "completion_tokens": 20, "total_tokens": 170}
+        })
+
+    def stream_completion(self, request: dict):
+        """The same completion as server-sent events, one word per chunk, usage last when asked for.
+
+        With `chat_tokens_per_second` set the words are paced like a model
+        generating that many tokens (one word each) per second.
+        """
+        base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": "gpt-4o"}
+        words = self.mock.completion_text.split(" ")
+        events = [{**base, "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                                        "finish_reason": None}]}
+                  for i, word in enumerate(words)]
+        events.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if request.get("stream_options", {}).get("include_usage"):
+            events.append({**base, "choices": [],
+                           "usage": {"prompt_tokens": 150, "completion_tokens": 20, "total_tokens": 170}})
+        chunks = [f"data: {json.dumps(event)}\n\n".encode() for event in events] + [b"data: [DONE]\n\n"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(sum(len(chunk) for chunk in chunks)))
+        self.end_headers()
+        if not self.mock.chat_tokens_per_second:
+            self.wfile.write(b"".join(chunks))
+            return
+        for chunk in chunks:
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            time.sleep(1 / self.mock.chat_tokens_per_second)
+
+    def list_posts(self, query: dict):
+        """Newest-first post listing with cursor pagination (the cursor is an offset)."""
+        limit = int(query.get("limit", ["20"])[0])
+        offset = int(query.get("cursor", ["0"])[0])
+        page = self.mock.posts[offset:offset + limit]
+        more = offset + limit < len(self.mock.posts)
+        self.send_json(200, {
+            "data": page,
+            "pagination": {"nextCursor": str(offset + limit) if more else None, "hasMore": more}
+        })
+
+    def do_GET(self):
+        time.sleep(self.mock.latency)
+        path, _, query = self.path.partition("?")
+        self.mock.count(path)
+        if not self.authorized() or self.rate_limited():
+            return
+        if path.startswith("/creators/") and path.endswith("/posts"):
+            return self.list_posts(parse_qs(query))
+        if path.startswith("/media/"):
+            ready_at = self.mock.media_ready_at.get(path.rsplit("/", 1)[1])
+            if ready_at is None:
+                return self.send_json(404, {"error": "not found"})
+            status = "ready" if time.monotonic() >= ready_at else "processing"
+            return self.send_json(200, {"uuid": path.rsplit("/", 1)[1], "status": status})
+        if self.path == "/users/me":
+            return self.send_json(200, {"uuid": "mock-user"})
+        if self.path == "/agency/creators":
+            return self.send_json(200, {"data": [{"uuid": "mock-creator", "displayName": "Mock"}]})
+        self.send_json(404, {"error": "not found"})
+
+    def do_PUT(self):
+        time.sleep(self.mock.latency)
+        self.mock.count("/s3")
+        length = int(self.headers.get("Content-Length", 0))
+        etag = self.read_throttled(length)
+        if random.random() < self.mock.error_rate:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.mock.bytes_received += length
+        self.send_response(200)
+        self.send_header("ETag", f'"{etag}"')
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class MockFanvueServer:
+    """Threaded mock server; use as a context manager and point the Fanvue client at `url`.
+
+    The same server answers OpenAI chat completions under `url + "/v1"`.
+    """
+
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0, error_rate: float = 0.0,
+                 chat_rate_limit_rate: float = 0.0, processing_time: float = 0.0, token_ttl: float = 0.0,
+                 api_error_rate: float = 0.0, retry_after: float = 1.0, chat_tokens_per_second: float = 0.0):
+        self.latency = latency  # seconds added to every request
+        self.bandwidth = bandwidth  # bytes/s per connection for uploads, 0 = unlimited
+        self.error_rate = error_rate  # fraction of S3 PUTs answered with 503
+        self.chat_rate_limit_rate = chat_rate_limit_rate  # fraction of chat completions answered with 429
+        self.processing_time = processing_time  # seconds until uploaded media reports status "ready"
+        self.token_ttl = token_ttl  # seconds an access token is valid, 0 = no auth check
+        self.api_error_rate = api_error_rate  # fraction of Fanvue API calls answered with 429
+        self.retry_after = retry_after  # Retry-After seconds sent with those 429s
+        self.chat_tokens_per_second = chat_tokens_per_second  # streamed completion pace, 0 = all at once
+        self.access_tokens: dict[str, float] = {}  # token -> expiry
+        self.refresh_tokens: set[str] = set()
+        self.media_ready_at: dict[str, float] = {}
+        self.bytes_received = 0
+        self.chat_bytes_received = 0
+        self.completion_text = "Mock caption \u2728"
+        self.completed: list[dict] = []
+        self.posts: list[dict] = []  # newest first
+        self.requests: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    @staticmethod
+    def now() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+    def seed_posts(self, count: int):
+        """Prepend `count` posts, one hour apart, the newest one hour ago."""
+        start = datetime.now(timezone.utc) - timedelta(hours=count)
+        audiences = ["everyone", "followers-and-subscribers", "subscribers-only"]
+        seeded = [{
+            "uuid": uuid.uuid4().hex,
+            "createdAt": (start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "text": f"Post {i}",
+            "audience": audiences[i % 3],
+            "media": [{"mediaType": "video" if i % 4 == 0 else "image"}],
+            "price": 4.99 if i % 4 == 0 else None
+        } for i in range(count)]
+        self.posts[:0] = seeded[::-1]
+
+    def issue_tokens(self) -> tuple[str, str]:
+        """A new (access token, refresh token) pair; the access token is a JWT with `exp`."""
+        expires_at = time.time() + self.token_ttl
+
+        def b64(data: dict) -> str:
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+        access_token = f"{b64({'alg': 'none'})}.{b64({'exp': expires_at, 'jti': uuid.uuid4().hex})}.mock"
+        refresh_token = uuid.uuid4().hex
+        with self._lock:
+            self.access_tokens[access_token] = expires_at
+            self.refresh_tokens.add(refresh_token)
+        return access_token, refresh_token
+
+    def count(self, path: str):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,233 @@
+"""
+Bulk AI captioning for many media files at once.
+
+Requests run concurrently on AsyncOpenAI, limited both by a concurrency cap and
+by a tokens-per-minute budget for the run, and go through the shared "openai"
+rate governor class (see rate_governor.py) like every other completion. They
+back off on 429s and stream every finished row into a CSV. Rerunning with the
+same CSV skips files that already have a caption, so an interrupted run picks
+up where it stopped.
+"""
+
+import asyncio
+import csv
+import os
+import random
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from caption_cache import CaptionCache, caption_key
+from caption_prompts import api_refusal, caption_messages, caption_prompt, is_refusal
+from image_prep import image_data_url
+from media_hash import file_sha256, is_video
+from metrics import RETRIES, count_tokens, span
+from rate_governor import governor, retry_after
+from video_frames import frame_data_urls
+
+if TYPE_CHECKING:
+    import openai  # imported on first use; it takes most of a second
+
+CAPTION_CONCURRENCY = int(os.getenv("CAPTION_CONCURRENCY", 8))
+CAPTION_TOKENS_PER_MINUTE = int(os.getenv("CAPTION_TOKENS_PER_MINUTE", 30000))
+CAPTION_MAX_RETRIES = 5
+CAPTION_MAX_TOKENS = 300
+IMAGE_LOW_DETAIL_TOKENS = 85  # fixed cost of one "detail": "low" image
+
+CSV_FIELDS = ["file", "sha256", "style", "caption", "status", "tokens"]
+
+
+class TokenBudget:
+    """Token bucket refilled continuously at `tokens_per_minute`.
+
+    Requests reserve their estimated cost up front and settle the difference
+    once the real usage is known; a 429 drains the bucket so every worker
+    pauses, not just the one that was rejected.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, cost: float):
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+    def settle(self, estimated: float, actual: float):
+        # Never owe more than one minute of budget for a single underestimate
+        self.tokens = max(-self.capacity, self.tokens + estimated - actual)
+
+    def pause(self, seconds: float):
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+def estimate_tokens(prompt: str, images: int, max_tokens: int = CAPTION_MAX_TOKENS) -> int:
+    """Rough request cost: ~4 characters per prompt token, fixed per-image cost, full completion."""
+    return len(prompt) // 4 + images * IMAGE_LOW_DETAIL_TOKENS + max_tokens
+
+
+def message_tokens(messages: list[dict], max_tokens: int) -> int:
+    """estimate_tokens for a ready chat message list (text parts and low detail images)."""
+    prompt, images = "", 0
+    for message in messages:
+        content = message["content"]
+        for part in [{"type": "text", "text": content}] if isinstance(content, str) else content:
+            if part.get("type") == "text":
+                prompt += part["text"]
+            else:
+                images += 1
+    return estimate_tokens(prompt, images, max_tokens)
+
+
+def retry_after_seconds(error: "openai.APIStatusError", attempt: int) -> float:
+    """Server-suggested delay if present, otherwise exponential backoff with jitter."""
+    delay = retry_after(error.response.headers) if error.response is not None else None
+    return delay if delay is not None else min(60.0, 2 ** attempt) + random.random()
+
+
+def load_finished(csv_path: Path) -> dict[tuple[str, str], dict]:
+    """Rows of a previous run that already have a caption, keyed by (sha256, style)."""
+    finished = {}
+    if csv_path.exists():
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                if row.get("status") in ("ok", "cache"):
+                    finished[(row["sha256"], row["style"])] = row
+    return finished
+
+
+async def caption_file(client: "openai.AsyncOpenAI", path: str, style: str, custom_prompt: str, model: str,
+                       budget: TokenBudget, cache: Optional[CaptionCache], image_cache_dir: Optional[Path]) -> dict:
+    """Caption one file, retrying rate limits and transient errors."""
+    import openai
+
+    video = is_video(path)
+    sha = await asyncio.to_thread(file_sha256, path)
+    row = {"file": str(path), "sha256": sha, "style": style, "caption": "", "status": "", "tokens": 0}
+
+    # Video prompts depend on whether frames could be extracted, so sample them
+    # before the cache lookup; images are only downscaled on a cache miss
+    image_urls = await asyncio.to_thread(frame_data_urls, path, cache_dir=image_cache_dir) if video else []
+    prompt = caption_prompt(style, custom_prompt, video=video, with_frames=bool(image_urls))
+
+    key = caption_key(sha, style, prompt, model)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None and not is_refusal(cached):
+            return {**row, "caption": cached, "status": "cache"}
+
+    if not video:
+        image_urls = [await asyncio.to_thread(image_data_url, path, "low", image_cache_dir)]
+    messages = caption_messages(prompt, image_urls)
+    estimated = estimate_tokens(prompt, len(image_urls))
+
+    for attempt in range(CAPTION_MAX_RETRIES + 1):
+        with span("caption.budget_wait", estimated=estimated):
+            await budget.acquire(estimated)
+        try:
+            async with governor["openai"].call_async(estimated) as call:
+                try:
+                    with span("openai.caption", file=Path(path).name, attempt=attempt):
+                        response = await client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            max_tokens=CAPTION_MAX_TOKENS
+                        )
+                except openai.RateLimitError as e:
+                    call.limited(retry_after(e.response.headers))
+                    raise
+                call.succeeded(response.usage.total_tokens if response.usage else None)
+        except (openai.RateLimitError, openai.InternalServerError) as e:
+            budget.settle(estimated, 0)
+            if attempt == CAPTION_MAX_RETRIES:
+                return {**row, "status": "blad", "caption": f"Blad generowania: {str(e)}"}
+            RETRIES.inc(operation="openai", reason=str(e.status_code))
+            delay = retry_after_seconds(e, attempt)
+            if isinstance(e, openai.RateLimitError):
+                budget.pause(delay)
+            await asyncio.sleep(delay)
+            continue
+        except (openai.APIConnectionError, openai.APITimeoutError) as e:
+            budget.settle(estimated, 0)
+            if attempt == CAPTION_MAX_RETRIES:
+                return {**row, "status": "blad", "caption": f"Blad polaczenia: {str(e)}"}
+            RETRIES.inc(operation="openai", reason="connection")
+            await asyncio.sleep(min(60.0, 2 ** attempt) + random.random())
+            continue
+        except Exception as e:
+            budget.settle(estimated, 0)
+            return {**row, "status": "blad", "caption": f"Blad generowania: {str(e)}"}
+
+        used = count_tokens("caption", response.usage) or estimated
+        budget.settle(estimated, used)
+        caption = (response.choices[0].message.content or "").strip()
+        refusal = api_refusal(response.choices[0])
+        if refusal or is_refusal(caption):
+            caption = caption or refusal
+            # Neither cached nor counted as finished, so the next run asks again
+            return {**row, "caption": caption, "status": "odmowa", "tokens": used}
+        if cache is not None:
+            cache.put(key, caption)
+        return {**row, "caption": caption, "status": "ok", "tokens": used}
+
+
+async def caption_files(client: "openai.AsyncOpenAI", paths: list[str], style: str, custom_prompt: str = "",
+                        csv_path: Optional[Path] = None, model: str = "gpt-4o",
+                        concurrency: int = CAPTION_CONCURRENCY, tokens_per_minute: int = CAPTION_TOKENS_PER_MINUTE,
+                        cache: Optional[CaptionCache] = None, image_cache_dir: Optional[Path] = None):
+    """Async generator yielding one result row per file, in completion order.
+
+    Files already captioned in `csv_path` with the same style are yielded first
+    with status "wznowione" and not sent again.
+    """
+    finished = load_finished(csv_path) if csv_path else {}
+    budget = TokenBudget(tokens_per_minute)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    pending = []
+    for path in paths:
+        sha = await asyncio.to_thread(file_sha256, path)
+        previous = finished.get((sha, style))
+        if previous:
+            yield {**previous, "file": str(path), "status": "wznowione"}
+        else:
+            pending.append(path)
+
+    async def run(path: str) -> dict:
+        async with semaphore:
+            return await caption_file(client, path, style, custom_prompt, model, budget, cache, image_cache_dir)
+
+    writer_file = None
+    try:
+        if csv_path:
+            csv_path.parent.mkdir(parents=True, exist_ok=True)
+            new_file = not csv_path.exists()
+            writer_file = open(csv_path, "a", newline="", encoding="utf-8-sig")
+            writer = csv.DictWriter(writer_file, fieldnames=CSV_FIELDS)
+            if new_file:
+                writer.writeheader()
+
+        for next_done in asyncio.as_completed([run(p) for p in pending]):
+            row = await next_done
+            if writer_file:
+                writer.writerow(row)
+                writer_file.flush()
+            yield row
+    finally:
+        if writer_file:
+            writer_file.close()
@@ -0,0 +1,82 @@
+"""
+Persistent SQLite cache of AI captions.
+
+Entries are keyed by the media content hash plus everything that shapes the
+answer (style, prompt, model), so re-captioning the same file is free no matter
+which path or filename it arrives under.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+CAPTION_CACHE_TTL = float(os.getenv("CAPTION_CACHE_TTL_DAYS", 30)) * 24 * 3600
+CAPTION_CACHE_MAX_ENTRIES = int(os.getenv("CAPTION_CACHE_MAX_ENTRIES", 5000))
+
+
+def caption_key(content_hash: str, style: str, prompt: str, model: str) -> str:
+    return hashlib.sha256("\0".join([content_hash, style, prompt, model]).encode()).hexdigest()
+
+
+class CaptionCache:
+    """Thread-safe cache with TTL expiry and least-recently-used eviction."""
+
+    def __init__(self, path: Path, ttl: float = CAPTION_CACHE_TTL, max_entries: int = CAPTION_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS captions (
+                    key TEXT PRIMARY KEY,
+                    caption TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS captions_last_used ON captions (last_used)")
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT caption, created FROM captions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM captions WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE captions SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key: str, caption: str):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO captions (key, caption, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, caption, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self.conn.execute("DELETE FROM captions WHERE created < ?", (now - self.ttl,))
+        self.conn.execute("""
+            DELETE FROM captions WHERE key IN (
+                SELECT key FROM captions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM captions")
@@ -0,0 +1,96 @@
+"""
+Caption prompts per style, shared by single and bulk caption generation.
+"""
+
+import re
+
+CAPTION_STYLES = ["Sexy & Flirty", "Casual & Fun", "Mysterious", "Promotional", "Custom"]
+
+IMAGE_STYLE_PROMPTS = {
+    "Sexy & Flirty": "Write a flirty, teasing caption for this photo. Be playful and seductive but tasteful. Use 1-2 emojis. Keep under 200 characters. Write in English.",
+    "Casual & Fun": "Write a casual, fun caption for this photo. Be friendly and approachable. Use emojis. Keep under 200 characters. Write in English.",
+    "Mysterious": "Write a mysterious, intriguing caption for this photo. Create curiosity. Use 1 emoji max. Keep under 200 characters. Write in English.",
+    "Promotional": "Write a promotional caption encouraging followers to subscribe for more exclusive content. Mention 'link in bio' or similar. Use emojis. Keep under 250 characters. Write in English.",
+    "Custom": "Write an engaging social media caption for this photo. Keep under 200 characters."
+}
+
+VIDEO_STYLE_PROMPTS = {
+    "Sexy & Flirty": "Write a flirty, teasing caption for a video post by a content creator. Be playful and seductive but tasteful. Use 1-2 emojis. Keep under 200 characters. Write in English.",
+    "Casual & Fun": "Write a casual, fun caption for a video post. Be friendly and approachable. Use emojis. Keep under 200 characters. Write in English.",
+    "Mysterious": "Write a mysterious, intriguing caption for a video. Create curiosity about what's in the video. Use 1 emoji max. Keep under 200 characters. Write in English.",
+    "Promotional": "Write a promotional caption for a video encouraging followers to subscribe for more exclusive video content. Use emojis. Keep under 250 characters. Write in English.",
+    "Custom": "Write an engaging social media caption for a video post. Keep under 200 characters."
+}
+
+VIDEO_FRAMES_NOTE = " The attached images are frames sampled from the video; base the caption on what they show."
+
+
+def caption_prompt(style: str, custom_prompt: str = "", video: bool = False, with_frames: bool = False) -> str:
+    """Resolve the prompt for a style; the Custom style uses `custom_prompt` when given."""
+    prompts = VIDEO_STYLE_PROMPTS if video else IMAGE_STYLE_PROMPTS
+    if style == "Custom" and custom_prompt:
+        prompt = custom_prompt
+    else:
+        prompt = prompts.get(style, prompts["Casual & Fun"])
+    if video and with_frames:
+        prompt += VIDEO_FRAMES_NOTE
+    return prompt
+
+
+def caption_messages(prompt: str, image_urls: list[str] = (), detail: str = "low") -> list[dict]:
+    """Chat messages for a caption request, with optional images for the vision model."""
+    if not image_urls:
+        return [{"role": "user", "content": prompt}]
+    content = [{"type": "text", "text": prompt}]
+    for url in image_urls:
+        content.append({"type": "image_url", "image_url": {"url": url, "detail": detail}})
+    return [{"role": "user", "content": content}]
+
+
+# Used when neither the model nor the catalog has a usable caption (same list as the n8n auto-post)
+FALLBACK_CAPTIONS = [
+    "Hey loves! How's your day going? Mine just got better seeing you here 💕🔥",
+    "Just thinking about you... wanna keep me company tonight? 💋😏",
+    "Something special just for my favorite subscribers 💕 You deserve it!",
+    "Miss me? Because I definitely miss you 😘💋",
+    "Guess what I've been up to today? 😏🔥 Hint: it involves you...",
+    "Hey baby, this one's just for you 💕 Hope it makes your day better!",
+    "Feeling a little naughty today... care to join me? 😈💋",
+    "You're the reason I smile 💕 Thank you for being here with me!",
+    "What would you do if you were here with me right now? 😏🔥",
+    "Just wanted to share this moment with you 💋 You're special to me!",
+    "Good morning/evening beautiful people! 💕 How's everyone doing?",
+    "Made this just for you baby 🔥 Hope you like it as much as I do!",
+    "Thinking about all my amazing fans right now 💕 You guys are the best!",
+    "Wanna see more? Let me know in the comments 😘💋",
+    "Can't stop thinking about you today 💕 Is that weird? 😏"
+]
+
+# Refusal phrasing only counts at the start of the reply: "I can't wait to show you..." is a caption
+REFUSAL_PATTERN = re.compile(
+    r"^\W*(?:(?:i'?m |i am )?sorry\b[^.!?]{0,20}?\b(?:but|i can'?t|i cannot|i'?m unable|i am unable)"
+    r"|i(?: can'?t| cannot| can not| won'?t|'?m unable to| am unable to|'?m not able to) "
+    r"(?:help|assist|create|provide|write|generate|comply|fulfil|describe|caption)"
+    r"|as an ai\b)",
+    re.IGNORECASE
+)
+
+
+def is_refusal(text: str) -> bool:
+    """True for empty/too short captions and replies that open with a refusal.
+
+    Refusals the API flags itself (`message.refusal`, finish_reason
+    "content_filter") are caught by the callers via `api_refusal`.
+    """
+    if not text or len(text.strip()) < 10:
+        return True
+    return bool(REFUSAL_PATTERN.match(text.replace("\u2019", "'")))
+
+
+def api_refusal(choice) -> str:
+    """Refusal reported by the API for a completion choice (or a streamed one), "" if none."""
+    message = getattr(choice, "message", None) or getattr(choice, "delta", None)
+    refusal = getattr(message, "refusal", None)
+    if refusal:
+        return refusal
+    return "content_filter" if getattr(choice, "finish_reason", None) == "content_filter" else ""
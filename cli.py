@@ -0,0 +1,112 @@
+"""
+Command line for publishing without the Gradio UI (cron, scripts, other services).
+
+    python cli.py login --token ACCESS [--refresh-token REFRESH]
+    python cli.py post zdjecie.jpg --caption "Nowe zdjecie" --audience everyone
+    python cli.py post-dir D:\\sesje\\2024-12 --caption "Nowa sesja" --creators UUID1,UUID2
+    python cli.py caption-dir D:\\sesje\\2024-12 --style Casual --csv grudzien.csv
+    python cli.py schedule opisy/grudzien.csv --queued
+    python cli.py ideas "fitness, gym selfies" --days 14 --export
+
+Progress goes to stdout as NDJSON, one JSON object per line (see
+operations.py). The exit code is 0 when everything went through, 1 when
+something failed along the way and 2 when nothing could start (bad
+arguments, no login, no OpenAI key).
+"""
+
+import argparse
+import json
+import sys
+
+from operations import DEFAULT_AUDIENCE, run
+
+
+def split_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # Defaults are left to operations.py; only options given on the command line are passed on
+    parser = argparse.ArgumentParser(description="Fanvue Post Creator bez interfejsu, postep jako NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def command(name: str, help: str) -> argparse.ArgumentParser:
+        return commands.add_parser(name, help=help, argument_default=argparse.SUPPRESS)
+
+    def publishing(sub: argparse.ArgumentParser, many: bool):
+        sub.add_argument("--audience", help=f"everyone, followers-and-subscribers, subscribers-only "
+                                            f"(domyslnie {DEFAULT_AUDIENCE})")
+        sub.add_argument("--allow-similar", action="store_true", help="wyslij mimo podobienstwa do juz wyslanych")
+        if many:
+            sub.add_argument("--creators", type=split_list, help="UUID creatorow po przecinku (domyslnie aktywny)")
+            sub.add_argument("--concurrency", type=int, help="plikow jednoczesnie")
+            sub.add_argument("--queued", action="store_true", help="oddaj do kolejki zadan (worker.py) i zakoncz")
+
+    sub = command("login", "zaloguj tokenem Fanvue (zapisywany w .tokens.json)")
+    sub.add_argument("--token", required=True)
+    sub.add_argument("--refresh-token")
+
+    sub = command("upload", "wyslij jeden plik")
+    sub.add_argument("file")
+    sub.add_argument("--allow-similar", action="store_true")
+
+    sub = command("caption", "opis AI jednego pliku")
+    sub.add_argument("file")
+    sub.add_argument("--style", required=True)
+    sub.add_argument("--prompt")
+    sub.add_argument("--force", action="store_true", help="pomin cache opisow")
+
+    sub = command("post", "wyslij plik i opublikuj post")
+    sub.add_argument("file", nargs="?")
+    sub.add_argument("--caption")
+    sub.add_argument("--style", help="styl opisu AI, gdy brak --caption")
+    sub.add_argument("--prompt")
+    sub.add_argument("--media-uuid", help="juz wyslane media zamiast pliku")
+    sub.add_argument("--scheduled-at", help="ISO 8601, np. 2024-12-31T12:00:00Z")
+    sub.add_argument("--price", type=float, help="cena PPV")
+    sub.add_argument("--creator")
+    publishing(sub, many=False)
+
+    sub = command("post-dir", "opublikuj kazdy plik z folderu")
+    sub.add_argument("folder")
+    sub.add_argument("--caption")
+    sub.add_argument("--style", help="z --queued: opis AI dla kazdego pliku, gdy brak --caption")
+    sub.add_argument("--prompt")
+    publishing(sub, many=True)
+
+    sub = command("caption-dir", "opisy AI dla calego folderu do CSV w opisy/")
+    sub.add_argument("folder")
+    sub.add_argument("--style", required=True)
+    sub.add_argument("--prompt")
+    sub.add_argument("--csv", dest="csv_name")
+    sub.add_argument("--concurrency", type=int)
+    sub.add_argument("--tokens-per-minute", type=int)
+
+    sub = command("schedule", "opublikuj lub zaplanuj posty z CSV (file, caption, scheduled_at, audience, price)")
+    sub.add_argument("csv_path")
+    publishing(sub, many=True)
+
+    sub = command("ideas", "plan tresci AI")
+    sub.add_argument("niche")
+    sub.add_argument("--days", type=int)
+    sub.add_argument("--no-seasonal", dest="seasonal", action="store_false")
+    sub.add_argument("--no-ppv", dest="ppv", action="store_false")
+    sub.add_argument("--export", action="store_true", help="zapisz plan do CSV w pomysly/")
+
+    return parser
+
+
+def main(argv: list[str] = None) -> int:
+    args = vars(build_parser().parse_args(argv))
+    status = 0
+    for count, event in enumerate(run(args.pop("command"), **args)):
+        print(json.dumps(event, ensure_ascii=False), flush=True)
+        if event["event"] == "error":
+            status = 1 if count else 2
+        elif event["event"] == "done" and event.get("failed"):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
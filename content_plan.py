@@ -0,0 +1,282 @@
+"""
+Content plan generation split into day ranges that are generated in parallel.
+
+Every chunk is a separate schema-constrained (structured output) completion,
+streamed and parsed incrementally. Cross-chunk rules such as "no repeated type
+on consecutive days" are set up front by fixing each chunk's first-day type,
+and anything the model still gets wrong is repaired after the merge. A failed
+chunk is retried on its own.
+"""
+
+import os
+import queue
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+
+from json_stream import JSONArrayStream
+
+PLAN_CHUNK_DAYS = int(os.getenv("PLAN_CHUNK_DAYS", 7))
+PLAN_CONCURRENCY = int(os.getenv("PLAN_CONCURRENCY", 5))
+PLAN_CHUNK_RETRIES = 2
+PLAN_CHUNK_MAX_TOKENS = 2048
+
+SEASONAL_THEMES = {
+    1: ["New Year energy", "Winter cozy vibes", "Fresh start goals"],
+    2: ["Valentine's Day", "Self-love", "Galentine's"],
+    3: ["Spring awakening", "New beginnings", "Women's day"],
+    4: ["Easter vibes", "Spring fashion", "Outdoor shoots"],
+    5: ["Summer teaser", "Fitness motivation", "Beach prep"],
+    6: ["Summer vibes", "Pool day", "Travel content"],
+    7: ["Hot summer", "Vacation mode", "Beach content"],
+    8: ["Late summer", "Golden hour shoots", "Back to routine"],
+    9: ["Fall fashion", "Cozy season starts", "New chapter"],
+    10: ["Halloween", "Costume/cosplay", "Spooky & sexy"],
+    11: ["Thanksgiving", "Gratitude posts", "Black Friday promo"],
+    12: ["Christmas", "Gift guides/wishlists", "New Year countdown"]
+}
+
+POST_TYPES = ["Photo", "Video", "Selfie", "Behind the scenes", "PPV exclusive", "Text/Story", "Poll/Q&A", "Carousel"]
+PPV_TYPE = "PPV exclusive"
+AUDIENCES = ["public", "followers", "subscribers"]
+IDEA_FIELDS = ["day", "type", "idea", "caption_draft", "audience", "best_time", "hashtags"]
+
+
+def plan_schema(post_types: list[str]) -> dict:
+    """`response_format` for structured output: {"days": [idea, ...]}."""
+    idea = {
+        "type": "object",
+        "properties": {
+            "day": {"type": "integer"},
+            "type": {"type": "string", "enum": post_types},
+            "idea": {"type": "string"},
+            "caption_draft": {"type": "string"},
+            "audience": {"type": "string", "enum": AUDIENCES},
+            "best_time": {"type": "string"},
+            "hashtags": {"type": "string"}
+        },
+        "required": IDEA_FIELDS,
+        "additionalProperties": False
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "content_plan",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"days": {"type": "array", "items": idea}},
+                "required": ["days"],
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+def split_days(days: int, chunk_days: int = PLAN_CHUNK_DAYS) -> list[tuple[int, int]]:
+    """Inclusive (start, end) day ranges."""
+    return [(start, min(start + chunk_days - 1, days)) for start in range(1, days + 1, chunk_days)]
+
+
+def spread_ppv_days(days: int, chunk_starts: set[int]) -> list[int]:
+    """2-3 PPV days spread evenly over the plan, never on a chunk's first day or next to each other.
+
+    Short plans get only as many as fit under those rules.
+    """
+    free = [day for day in range(1, days + 1) if day not in chunk_starts]
+    for count in range(min(2 if days <= 14 else 3, len(free)), 0, -1):
+        ppv_days = []
+        for i in range(count):
+            target = round(days * (i + 0.5) / count)
+            options = [d for d in free if all(abs(d - p) >= 2 for p in ppv_days)]
+            if not options:
+                break
+            # The nearest free day, the later one on a tie
+            ppv_days.append(min(options, key=lambda d: (abs(d - target), -d)))
+        else:
+            return sorted(ppv_days)
+    return []
+
+
+def chunk_prompt(niche: str, days: int, start: int, end: int, post_types: list[str], seasonal_part: str,
+                 ppv_part: str, first_type: str, next_first_type: str, include_series: bool) -> str:
+    post_types_str = ", ".join(post_types)
+    rules = [f"Day {start} must be of type \"{first_type}\"."]
+    if next_first_type:
+        rules.append(f"Day {end} must NOT be of type \"{next_first_type}\" (day {end + 1} starts with it).")
+    if include_series:
+        rules.append('Include at least one series idea (e.g. "7 days of...", "Behind the scenes week").')
+
+    return f"""You are a content strategist for an adult content creator on Fanvue.
+
+Niche/style: {niche}
+
+This is part of a {days}-day content plan. Generate ONLY days {start} to {end}.{seasonal_part}{ppv_part}
+
+Mix these content types: {post_types_str}
+Ensure variety - don't repeat the same type on consecutive days.
+{" ".join(rules)}
+
+For each day provide:
+- day: day number ({start} to {end})
+- type: one of [{post_types_str}]
+- idea: short description of the content idea (max 80 chars)
+- caption_draft: a ready-to-use caption with emojis (max 200 chars)
+- audience: one of [{", ".join(AUDIENCES)}]
+- best_time: suggested posting time in HH:MM format (consider peak engagement hours)
+- hashtags: 3-5 relevant hashtags as a string"""
+
+
+def generate_chunk(stream_fn: Callable, prompt: str, start: int, end: int, post_types: list[str], on_rows: Callable) -> list[dict]:
+    """Stream one chunk, reporting parsed rows as they arrive; raises ValueError on an incomplete answer."""
+    parser = JSONArrayStream()
+    ideas = []
+    fed = 0
+    for content in stream_fn([{"role": "user", "content": prompt}], PLAN_CHUNK_MAX_TOKENS,
+                             temperature=0.8, response_format=plan_schema(post_types)):
+        new_ideas = parser.feed(content[fed:])
+        fed = len(content)
+        for idea in new_ideas:
+            if start + len(ideas) > end:
+                break
+            # Number by position so a model that restarts at 1 still lands on the right days
+            idea["day"] = start + len(ideas)
+            ideas.append(idea)
+        if new_ideas:
+            on_rows(list(ideas))
+
+    expected = end - start + 1
+    if len(ideas) < expected:
+        raise ValueError(f"dni {start}-{end}: otrzymano {len(ideas)} z {expected}")
+    return ideas
+
+
+def enforce_type_variety(ideas: list[dict], chunks: Optional[list[tuple[int, int]]] = None) -> list[dict]:
+    """Swap entries (keeping day numbers) so no two consecutive days share a type, where possible.
+
+    Only days next to each other count as consecutive, so a failed chunk's
+    gap does not join its neighbours. PPV days and the first day of every
+    chunk stay where they were planned, and other rows only swap within their
+    chunk.
+    """
+    chunks = chunks or [(1, max((int(idea["day"]) for idea in ideas), default=1))]
+
+    def chunk_of(idea: dict) -> int:
+        return next((k for k, (start, end) in enumerate(chunks) if start <= int(idea["day"]) <= end), -1)
+
+    fixed_days = {start for start, _ in chunks}
+
+    def movable(idea: dict) -> bool:
+        return idea["type"] != PPV_TYPE and int(idea["day"]) not in fixed_days
+
+    def repeats() -> int:
+        return sum(ideas[i]["type"] == ideas[i - 1]["type"] and int(ideas[i]["day"]) == int(ideas[i - 1]["day"]) + 1
+                   for i in range(1, len(ideas)))
+
+    def swap(i: int, j: int):
+        ideas[i]["day"], ideas[j]["day"] = ideas[j]["day"], ideas[i]["day"]
+        ideas[i], ideas[j] = ideas[j], ideas[i]
+
+    current = repeats()
+    improved = True
+    while current and improved:
+        improved = False
+        for i in range(1, len(ideas)):
+            if ideas[i]["type"] != ideas[i - 1]["type"] or int(ideas[i]["day"]) != int(ideas[i - 1]["day"]) + 1:
+                continue
+            # Move whichever of the pair may move
+            m = i if movable(ideas[i]) else i - 1
+            if not movable(ideas[m]):
+                continue
+            for j in range(len(ideas)):
+                if (ideas[j]["type"] == ideas[m]["type"] or not movable(ideas[j])
+                        or chunk_of(ideas[j]) != chunk_of(ideas[m])):
+                    continue
+                swap(m, j)
+                after = repeats()
+                if after < current:
+                    current = after
+                    improved = True
+                    break
+                swap(m, j)
+    return ideas
+
+
+def iter_content_plan(stream_fn: Callable, niche: str, days: int, include_seasonal: bool, include_ppv: bool,
+                      chunk_days: int = PLAN_CHUNK_DAYS, concurrency: int = PLAN_CONCURRENCY):
+    """Yield (ideas so far sorted by day, finished, error) while chunks stream in parallel.
+
+    `stream_fn(messages, max_tokens, **kwargs)` yields the accumulated completion text.
+    The final yield has finished=True and the merged, variety-checked plan.
+    """
+    current_month = datetime.now().month
+    month_name = datetime.now().strftime("%B")
+
+    seasonal_part = ""
+    if include_seasonal:
+        themes = SEASONAL_THEMES.get(current_month, [])
+        seasonal_part = f"\nCurrent month: {month_name} - incorporate these seasonal themes: {', '.join(themes)}"
+
+    post_types = POST_TYPES if include_ppv else [t for t in POST_TYPES if t != PPV_TYPE]
+    chunks = split_days(days, chunk_days)
+    ppv_days = spread_ppv_days(days, {start for start, _ in chunks}) if include_ppv else []
+
+    # Fixing every chunk's first-day type lets chunks avoid repeats across their boundaries
+    # without waiting for each other
+    first_types = random.sample([t for t in post_types if t != PPV_TYPE] * len(chunks), len(chunks))
+    for k in range(1, len(first_types)):
+        while first_types[k] == first_types[k - 1]:
+            first_types[k] = random.choice([t for t in post_types if t != PPV_TYPE])
+
+    prompts = []
+    for k, (start, end) in enumerate(chunks):
+        chunk_ppv = [d for d in ppv_days if start <= d <= end]
+        if chunk_ppv:
+            ppv_part = (f"\nDays {', '.join(map(str, chunk_ppv))} must be of type \"{PPV_TYPE}\": premium, exclusive content "
+                        f"that subscribers pay extra for. No other day in this range is {PPV_TYPE}.")
+        elif include_ppv:
+            ppv_part = f"\nDo NOT use the type \"{PPV_TYPE}\" in this range."
+        else:
+            ppv_part = "\nDo NOT include any PPV exclusive posts."
+        next_first = first_types[k + 1] if k + 1 < len(chunks) else ""
+        prompts.append(chunk_prompt(niche, days, start, end, post_types, seasonal_part, ppv_part,
+                                    first_types[k], next_first, include_series=(k == 0)))
+
+    updates = queue.Queue()
+
+    def run(k: int):
+        start, end = chunks[k]
+        error = None
+        for _ in range(PLAN_CHUNK_RETRIES + 1):
+            try:
+                ideas = generate_chunk(stream_fn, prompts[k], start, end, post_types,
+                                       lambda rows: updates.put(("rows", k, rows)))
+                updates.put(("done", k, ideas))
+                return
+            except Exception as e:
+                error = e
+                # Drop the rows of the failed attempt before retrying this chunk only
+                updates.put(("rows", k, []))
+        updates.put(("failed", k, error))
+
+    chunk_rows = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(chunks)))) as pool:
+        for k in range(len(chunks)):
+            pool.submit(run, k)
+        remaining = len(chunks)
+        while remaining:
+            kind, k, payload = updates.get()
+            if kind == "failed":
+                errors.append(f"dni {chunks[k][0]}-{chunks[k][1]}: {payload}")
+                remaining -= 1
+                continue
+            chunk_rows[k] = payload
+            if kind == "done":
+                remaining -= 1
+            merged = [idea for k in sorted(chunk_rows) for idea in chunk_rows[k]]
+            yield merged, False, None
+
+    merged = [idea for k in sorted(chunk_rows) for idea in chunk_rows[k]]
+    yield enforce_type_variety(merged, chunks), True, "; ".join(errors) or None
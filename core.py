@@ -0,0 +1,1213 @@
+"""
+Fanvue Post Creator - everything but the UI.
+
+Uploading, posting, captioning, the job queue and the stores live here, so
+the worker processes and scripts can import them without Gradio (app.py
+builds the interface on top). Nothing slow happens at import: the OpenAI SDK
+is loaded when the first caption is requested and the HTTP client is created
+on the first Fanvue call.
+"""
+
+import hashlib
+import httpx
+import os
+import json
+import csv
+import time
+import queue
+import random
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+from dotenv import load_dotenv
+
+from analytics import PostStoreStats
+from bulk_caption import CAPTION_CONCURRENCY, CAPTION_TOKENS_PER_MINUTE, caption_files, message_tokens
+from caption_cache import CaptionCache, caption_key
+from caption_prompts import FALLBACK_CAPTIONS, api_refusal, caption_messages, caption_prompt, is_refusal
+from content_plan import iter_content_plan
+from fair_queue import FairQueue
+from fanvue_client import FanvueClient
+from image_prep import image_data_url
+from job_queue import JobQueue
+from media_catalog import MediaCatalog
+from media_hash import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, file_sha256, is_video
+from media_index import MediaIndex, MediaMatch
+from metrics import (MEDIA_REUSED, QUEUE_DEPTH, RETRIES, UPLOAD_BYTES, UPLOAD_PART_THROUGHPUT, Gauge, count_tokens,
+                     register, span)
+from post_store import PostStore
+from rate_governor import RATE_LIMIT_RETRIES, governor, retry_after
+from scheduler import PublishScheduler, schedule_or_now
+from token_manager import TokenManager
+from upload_journal import UploadJournal, file_fingerprint
+from video_frames import frame_data_urls
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+load_dotenv()
+
+# Configuration
+FANVUE_API_BASE = "https://api.fanvue.com"
+FANVUE_AUTH_URL = "https://auth.fanvue.com/oauth2/auth"
+FANVUE_TOKEN_URL = "https://auth.fanvue.com/oauth2/token"
+API_VERSION = "2025-06-26"
+
+# Batch publishing: how many files are uploaded and posted at the same time
+BATCH_CONCURRENCY = int(os.getenv("FANVUE_BATCH_CONCURRENCY", 4))
+# Posts in flight per creator when a batch goes to several creators
+CREATOR_CONCURRENCY = int(os.getenv("FANVUE_CREATOR_CONCURRENCY", 2))
+MAX_POST_THREADS = 16
+
+# Multipart upload configuration (sizes in bytes)
+UPLOAD_PART_SIZE = int(os.getenv("FANVUE_UPLOAD_PART_SIZE", 16 * 1024 * 1024))
+UPLOAD_MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+UPLOAD_MAX_PARTS = 10000  # S3 limit
+UPLOAD_READ_CHUNK = 1024 * 1024  # read buffer used while streaming a part
+UPLOAD_CONCURRENCY = int(os.getenv("FANVUE_UPLOAD_CONCURRENCY", 4))
+UPLOAD_PART_RETRIES = 3
+UPLOAD_RETRY_BACKOFF = 1.0  # seconds, doubled after every failed attempt
+UPLOAD_SESSION_GONE = {400, 404, 410}  # statuses meaning a journaled uploadId is no longer valid
+
+OPENAI_MODEL = "gpt-4o"
+CAPTION_IMAGE_DETAIL = "low"
+
+
+# State
+class AppState:
+    def __init__(self):
+        # OAuth tokens, renewed before they expire and after a 401
+        self.tokens = TokenManager(FANVUE_TOKEN_URL, lambda: self.api.client)
+        # Active creator (history, stats, single posts) and every creator the account manages
+        self.creator_uuid: Optional[str] = None
+        self.creators: dict[str, str] = {}  # uuid -> display name
+        self.openai_api_key: Optional[str] = None
+        self._openai_client: Optional["OpenAI"] = None
+        # Shared pooled client for every Fanvue API call
+        self.api = FanvueClient(self.tokens.token, FANVUE_API_BASE, API_VERSION,
+                                on_unauthorized=self.tokens.refresh)
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.tokens.access_token
+
+    @access_token.setter
+    def access_token(self, value: Optional[str]):
+        self.tokens.set(value, self.tokens.refresh_token)
+
+    @property
+    def refresh_token(self) -> Optional[str]:
+        return self.tokens.refresh_token
+
+    @refresh_token.setter
+    def refresh_token(self, value: Optional[str]):
+        self.tokens.set(self.tokens.access_token, value)
+
+    def is_authenticated(self) -> bool:
+        return self.access_token is not None
+
+    def creator_choices(self) -> list[tuple[str, str]]:
+        return [(name, uuid) for uuid, name in self.creators.items()]
+
+    def init_openai(self, api_key: str):
+        self.openai_api_key = api_key
+        self._openai_client = None
+
+    @property
+    def openai_client(self) -> Optional["OpenAI"]:
+        """Client for the configured key, built on first use (importing the SDK takes most of a second)."""
+        if self._openai_client is None and self.openai_api_key:
+            from openai import OpenAI
+            self._openai_client = OpenAI(api_key=self.openai_api_key, max_retries=0)
+        return self._openai_client
+
+state = AppState()
+
+# Load saved tokens if exist
+TOKEN_FILE = Path(__file__).parent / ".tokens.json"
+
+def save_tokens():
+    data = {
+        "access_token": state.access_token,
+        "refresh_token": state.refresh_token,
+        "expires_at": state.tokens.expires_at,
+        "creator_uuid": state.creator_uuid,
+        "creators": state.creators
+    }
+    # Worker processes refresh and save too; never leave a half-written file
+    tmp_path = TOKEN_FILE.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, TOKEN_FILE)
+
+def read_token_file() -> Optional[dict]:
+    try:
+        return json.loads(TOKEN_FILE.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def load_tokens():
+    data = read_token_file()
+    if data:
+        state.tokens.set(data.get("access_token"), data.get("refresh_token"), data.get("expires_at"))
+        state.creator_uuid = data.get("creator_uuid")
+        state.creators = data.get("creators") or ({state.creator_uuid: state.creator_uuid} if state.creator_uuid else {})
+        return True
+    return False
+
+# A refresh in any process is saved, and a token saved by another process is adopted before refreshing
+state.tokens.load = read_token_file
+state.tokens.save = save_tokens
+
+# Resumable multipart uploads are journaled next to the tokens
+UPLOAD_JOURNAL_FILE = Path(__file__).parent / ".uploads.json"
+upload_journal = UploadJournal(UPLOAD_JOURNAL_FILE)
+
+# Content and perceptual hashes of everything uploaded, mapped to the media UUIDs
+MEDIA_INDEX_FILE = Path(__file__).parent / ".media_index.db"
+media_index = MediaIndex(MEDIA_INDEX_FILE)
+
+# AI captions are cached by media content hash, style, prompt and model
+CAPTION_CACHE_FILE = Path(__file__).parent / ".captions.db"
+caption_cache = CaptionCache(CAPTION_CACHE_FILE)
+
+# Published posts are mirrored locally and synced incrementally
+POST_STORE_FILE = Path(__file__).parent / ".posts.db"
+post_store = PostStore(POST_STORE_FILE)
+HISTORY_PAGE_SIZE = 25
+# Weekly stats fold in only the posts added to the store since the last refresh
+post_stats = PostStoreStats(post_store)
+
+# Files waiting to be posted; random picks come from a free list, not a table scan
+MEDIA_CATALOG_FILE = Path(__file__).parent / ".media.db"
+media_catalog = MediaCatalog(MEDIA_CATALOG_FILE)
+
+# Durable upload/caption/post jobs, drained by worker processes (worker.py)
+JOB_QUEUE_FILE = Path(__file__).parent / ".jobs.db"
+job_queue = JobQueue(JOB_QUEUE_FILE)
+JOB_STATE_LABELS = {"queued": "w kolejce", "running": "w toku", "done": "ok", "failed": "blad", "cancelled": "anulowane"}
+JOB_WATCH_INTERVAL = 1.0  # seconds between status reads while the UI watches queued jobs
+register(Gauge("fanvue_jobs", "Jobs in the job queue by state.", ("state",),
+               function=lambda: {(job_state,): n for job_state, n in job_queue.counts().items()}))
+
+# Downscaled copies of images sent to the vision model
+IMAGE_CACHE_DIR = Path(__file__).parent / ".image_cache"
+
+# Bulk caption runs are written here and resumed from the same CSV
+CAPTIONS_DIR = Path(__file__).parent / "opisy"
+
+# Initialize OpenAI from env
+if os.getenv("OPENAI_API_KEY"):
+    state.init_openai(os.getenv("OPENAI_API_KEY"))
+
+
+def authenticate_with_token(access_token: str, refresh_token: str = "") -> str:
+    """Authenticate using existing tokens."""
+    state.tokens.set(access_token.strip(), refresh_token.strip() if refresh_token else None)
+
+    # Test the token by getting user info
+    try:
+        response = state.api.get("/users/me")
+        if response.status_code == 200:
+            # Get creator UUID
+            creators_resp = state.api.get("/agency/creators")
+            if creators_resp.status_code == 200:
+                creators = creators_resp.json().get("data", [])
+                if creators:
+                    state.creators = {c["uuid"]: c.get("displayName") or c["uuid"] for c in creators}
+                    # Keep the creator picked before a re-login
+                    if state.creator_uuid not in state.creators:
+                        state.creator_uuid = creators[0]["uuid"]
+                    save_tokens()
+                    active = state.creators[state.creator_uuid]
+                    if len(creators) == 1:
+                        return f"Zalogowano! Creator: {active} ({state.tokens.describe()})"
+                    return f"Zalogowano! Creatorow: {len(creators)}, aktywny: {active} ({state.tokens.describe()})"
+                return "Zalogowano, ale nie znaleziono creatora."
+            return f"Zalogowano, ale blad pobierania creatorow: {creators_resp.status_code}"
+        else:
+            state.access_token = None
+            return f"Blad autoryzacji: {response.status_code} - {response.text}"
+    except Exception as e:
+        state.access_token = None
+        return f"Blad polaczenia: {str(e)}"
+
+
+def select_creator(creator_uuid: str) -> str:
+    """Make another managed creator the active one."""
+    if creator_uuid not in state.creators:
+        return "Nieznany creator!"
+    state.creator_uuid = creator_uuid
+    save_tokens()
+    return f"Aktywny creator: {state.creators[creator_uuid]}"
+
+
+def set_openai_key(api_key: str) -> str:
+    """Set OpenAI API key."""
+    if not api_key.strip():
+        return "Podaj klucz API"
+    state.init_openai(api_key.strip())
+    return "Klucz OpenAI ustawiony!"
+
+
+def stream_completion(messages: list[dict], max_tokens: int, **kwargs):
+    """Yield the completion text accumulated so far as tokens arrive.
+
+    The request goes through the shared "openai" rate governor class and waits
+    out up to RATE_LIMIT_RETRIES 429s (the SDK's own retries are off). A
+    refusal flagged by the API raises RuntimeError after the stream ends.
+    """
+    from openai import RateLimitError
+
+    limiter = governor["openai"]
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        with limiter.call(message_tokens(messages, max_tokens)) as call, \
+                span("openai.chat", model=OPENAI_MODEL, attempt=attempt) as trace:
+            try:
+                stream = state.openai_client.chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    # The last chunk then carries the token usage
+                    stream_options={"include_usage": True},
+                    **kwargs
+                )
+            except RateLimitError as e:
+                call.limited(retry_after(e.response.headers))
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                RETRIES.inc(operation="openai_chat", reason="429")
+                trace["outcome"] = "throttled"
+                continue
+            text = refusal = ""
+            for chunk in stream:
+                if chunk.choices:
+                    refusal = api_refusal(chunk.choices[0]) or refusal
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text += chunk.choices[0].delta.content
+                    yield text
+                if getattr(chunk, "usage", None):
+                    trace["tokens"] = count_tokens("chat", chunk.usage)
+            call.succeeded(trace.get("tokens"))
+            if refusal:
+                trace["refusal"] = True
+                raise RuntimeError(f"Model odmowil: {refusal}")
+            return
+
+
+def iter_caption(media_path: str, style: str, custom_prompt: str = "", force: bool = False, video: bool = False):
+    """Yield a caption as it streams in; the last value is the final caption or an error message.
+
+    Cached captions (see caption_cache) are yielded at once unless `force` is set.
+    """
+    # Videos are described from sampled keyframes; without a file or ffmpeg
+    # the caption is written from the text prompt alone
+    frame_urls = frame_data_urls(media_path, cache_dir=IMAGE_CACHE_DIR) if video and media_path else []
+    prompt = caption_prompt(style, custom_prompt, video=video, with_frames=bool(frame_urls))
+
+    cache_key = None
+    if media_path:
+        cache_key = caption_key(file_sha256(media_path), style, prompt, OPENAI_MODEL)
+        if not force:
+            cached = caption_cache.get(cache_key)
+            if cached is None:
+                # A re-saved or resized copy of a captioned file gets that file's caption
+                match = indexed_match(media_path, uploaded_only=False)
+                if match:
+                    cached = caption_cache.get(caption_key(match.sha256, style, prompt, OPENAI_MODEL))
+            if cached is not None:
+                yield cached
+                return
+
+    try:
+        if video:
+            image_urls = frame_urls
+        else:
+            # Downscale to what the requested detail level needs before encoding
+            image_urls = [image_data_url(media_path, CAPTION_IMAGE_DETAIL, IMAGE_CACHE_DIR)]
+
+        caption = ""
+        for caption in stream_completion(caption_messages(prompt, image_urls, CAPTION_IMAGE_DETAIL), 300):
+            yield caption
+        caption = caption.strip()
+        # An empty reply or a refusal is not kept, so the next request asks the model again
+        if cache_key and not is_refusal(caption):
+            caption_cache.put(cache_key, caption)
+            index_file(media_path)
+        yield caption
+    except Exception as e:
+        yield f"Blad generowania: {str(e)}"
+
+
+def generate_caption(image_path: str, style: str, custom_prompt: str = "", force: bool = False) -> str:
+    """Generate caption using AI, reusing a cached one unless `force` is set."""
+    if not state.openai_api_key:
+        return "Najpierw ustaw klucz OpenAI API!"
+
+    if not image_path:
+        return "Najpierw wybierz obraz!"
+
+    caption = ""
+    for caption in iter_caption(image_path, style, custom_prompt, force):
+        pass
+    return caption
+
+
+def generate_video_caption(style: str, custom_prompt: str = "", video_path: str = "", force: bool = False) -> str:
+    """Generate caption for video from sampled keyframes, cached per video file when one is given.
+
+    Without a file or without ffmpeg the caption is written from the text prompt alone.
+    """
+    if not state.openai_api_key:
+        return "Najpierw ustaw klucz OpenAI API!"
+
+    caption = ""
+    for caption in iter_caption(video_path, style, custom_prompt, force, video=True):
+        pass
+    return caption
+
+
+class UploadError(Exception):
+    """Raised by the multipart upload helpers with a ready-to-show message."""
+
+    def __init__(self, message: str, retryable: bool = False, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+
+
+def is_retryable_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def plan_upload_parts(file_size: int, part_size: int = UPLOAD_PART_SIZE) -> list[tuple[int, int, int]]:
+    """Split a file into (part_number, offset, length) tuples for multipart upload."""
+    part_size = max(part_size, UPLOAD_MIN_PART_SIZE)
+    # S3 refuses more than 10 000 parts, so grow the part size for huge files
+    if file_size > part_size * UPLOAD_MAX_PARTS:
+        part_size = -(-file_size // UPLOAD_MAX_PARTS)
+
+    parts = []
+    offset = 0
+    part_number = 1
+    while offset < file_size or part_number == 1:
+        length = min(part_size, file_size - offset)
+        parts.append((part_number, offset, length))
+        offset += length
+        part_number += 1
+    return parts
+
+
+def iter_file_range(file_path: Path, offset: int, length: int, chunk_size: int = UPLOAD_READ_CHUNK):
+    """Stream `length` bytes of a file starting at `offset` in bounded chunks."""
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                raise UploadError(f"Plik skrocil sie podczas uploadu: {file_path.name}")
+            remaining -= len(chunk)
+            yield chunk
+
+
+def upload_part(upload_id: str, file_path: Path, part: tuple[int, int, int]) -> str:
+    """Sign and PUT a single part straight from disk, returning its eTag."""
+    part_number, offset, length = part
+
+    with span("upload.sign", part=part_number) as trace:
+        sign_resp = state.api.post(
+            "/media/upload/multipart/sign",
+            json={
+                "uploadId": upload_id,
+                "partNumber": part_number
+            }
+        )
+        if sign_resp.status_code != 200:
+            trace.update(outcome="error", status=sign_resp.status_code)
+
+    if sign_resp.status_code != 200:
+        raise UploadError(
+            f"Blad pobierania URL (czesc {part_number}): {sign_resp.status_code} - {sign_resp.text}",
+            retryable=is_retryable_status(sign_resp.status_code),
+            status_code=sign_resp.status_code
+        )
+
+    signed_url = sign_resp.json()["url"]
+
+    # Explicit Content-Length keeps httpx from switching to chunked encoding,
+    # which S3 presigned PUTs do not accept
+    started = time.perf_counter()
+    with span("upload.put", part=part_number, bytes=length) as trace:
+        upload_resp = state.api.put_signed(
+            signed_url,
+            content=iter_file_range(file_path, offset, length),
+            headers={
+                "Content-Type": "application/octet-stream",
+                "Content-Length": str(length)
+            }
+        )
+        if upload_resp.status_code not in [200, 201]:
+            trace.update(outcome="error", status=upload_resp.status_code)
+
+    if upload_resp.status_code not in [200, 201]:
+        raise UploadError(
+            f"Blad uploadu S3 (czesc {part_number}): {upload_resp.status_code}",
+            retryable=is_retryable_status(upload_resp.status_code),
+            status_code=upload_resp.status_code
+        )
+
+    UPLOAD_BYTES.inc(length)
+    UPLOAD_PART_THROUGHPUT.observe(length / max(time.perf_counter() - started, 1e-6))
+    return upload_resp.headers.get("etag", "").strip('"')
+
+
+def upload_part_with_retry(upload_id: str, file_path: Path, part: tuple[int, int, int],
+                           retries: int = UPLOAD_PART_RETRIES) -> str:
+    """Upload one part, retrying only that part on transient failures."""
+    delay = UPLOAD_RETRY_BACKOFF
+    for attempt in range(retries + 1):
+        try:
+            return upload_part(upload_id, file_path, part)
+        except UploadError as e:
+            if not e.retryable or attempt == retries:
+                raise
+            reason = str(e.status_code)
+        except httpx.TransportError as e:
+            if attempt == retries:
+                raise UploadError(f"Blad polaczenia (czesc {part[0]}): {str(e)}")
+            reason = "connection"
+        RETRIES.inc(operation="upload_part", reason=reason)
+        time.sleep(delay)
+        delay *= 2
+
+
+def upload_parts(upload_id: str, file_path: Path, parts: list[tuple[int, int, int]],
+                 concurrency: int = UPLOAD_CONCURRENCY, on_part_done=None) -> list[dict]:
+    """Upload parts on a bounded thread pool and return the ordered eTag list.
+
+    `on_part_done(part_number, etag)` is called as soon as each part lands in S3.
+    """
+    def run(part):
+        etag = upload_part_with_retry(upload_id, file_path, part)
+        if on_part_done:
+            on_part_done(part[0], etag)
+        return etag
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        etags = pool.map(run, parts)
+        # map() yields in submission order, so the list is already sorted by partNumber
+        return [{"partNumber": part[0], "eTag": etag} for part, etag in zip(parts, etags)]
+
+
+def create_upload_session(filename: str, media_type: str) -> str:
+    """Open a multipart upload session and return its uploadId."""
+    with span("upload.create", file=filename) as trace:
+        create_resp = state.api.post(
+            "/media/upload/multipart/create",
+            json={
+                "name": filename,
+                "filename": filename,
+                "mediaType": media_type
+            }
+        )
+        if create_resp.status_code != 200:
+            trace.update(outcome="error", status=create_resp.status_code)
+
+    if create_resp.status_code != 200:
+        raise UploadError(f"Blad tworzenia sesji: {create_resp.status_code} - {create_resp.text}",
+                          status_code=create_resp.status_code)
+
+    return create_resp.json()["uploadId"]
+
+
+def complete_upload(upload_id: str, completed_parts: list[dict]) -> str:
+    """Finalize a multipart upload and return the media UUID."""
+    with span("upload.complete", parts=len(completed_parts)) as trace:
+        complete_resp = state.api.post(
+            "/media/upload/multipart/complete",
+            json={
+                "uploadId": upload_id,
+                "parts": completed_parts
+            }
+        )
+        if complete_resp.status_code != 200:
+            trace.update(outcome="error", status=complete_resp.status_code)
+
+    if complete_resp.status_code != 200:
+        raise UploadError(f"Blad finalizacji: {complete_resp.status_code} - {complete_resp.text}",
+                          status_code=complete_resp.status_code)
+
+    return complete_resp.json()["uuid"]
+
+
+NEAR_DUPLICATE_MESSAGE = "Podobny plik byl juz uploadowany"
+
+
+def indexed_match(file_path, uploaded_only: bool = True) -> Optional[MediaMatch]:
+    try:
+        return media_index.find(file_path, uploaded_only)
+    except Exception:
+        return None  # a broken index must not block uploads or captions
+
+
+def index_file(file_path, media_uuid: Optional[str] = None):
+    try:
+        media_index.record(file_path, media_uuid)
+    except Exception:
+        pass  # the upload or caption itself succeeded
+
+
+def known_media(file_path: Path, allow_similar: bool) -> Optional[tuple[Optional[str], str]]:
+    """Result for a file that needs no upload: an already uploaded copy, or a flagged near-duplicate.
+
+    An exact copy reuses its media UUID as long as Fanvue still has it.
+    """
+    match = indexed_match(file_path)
+    if not match:
+        return None
+    if match.kind == "exact":
+        MEDIA_REUSED.inc(match="exact")
+        try:
+            gone = state.api.get(f"/media/{match.media_uuid}").status_code == 404
+        except httpx.HTTPError:
+            gone = False
+        if gone:
+            media_index.forget_media(match.media_uuid)
+            return None
+        return match.media_uuid, (f"Ten plik byl juz uploadowany ({match.file_name}) - "
+                                  f"uzyto istniejacego media: {match.media_uuid}")
+    if allow_similar:
+        return None
+    MEDIA_REUSED.inc(match="near")
+    return None, (f"{NEAR_DUPLICATE_MESSAGE}: {match.file_name} "
+                  f"(roznica {match.distance}/64 bitow, media {match.media_uuid}). "
+                  f"Zaznacz 'Wyslij mimo podobienstwa', aby wyslac go mimo to.")
+
+
+def upload_media(file_path: str, part_size: int = UPLOAD_PART_SIZE,
+                 concurrency: int = UPLOAD_CONCURRENCY, allow_similar: bool = False) -> tuple[Optional[str], str]:
+    """Upload media to Fanvue using multipart upload, streaming parts from disk in parallel.
+
+    Progress is journaled, so calling this again for the same file after a crash or
+    network failure resumes the previous session and uploads only the missing parts.
+    A file uploaded before is not sent again (see media_index): an exact copy
+    returns the existing media UUID, a near-duplicate is refused unless
+    `allow_similar` is set.
+    """
+    if not state.is_authenticated():
+        return None, "Najpierw zaloguj sie!"
+
+    if not file_path:
+        return None, "Wybierz plik!"
+
+    file_path = Path(file_path)
+    known = known_media(file_path, allow_similar)
+    if known:
+        return known
+    filename = file_path.name
+    file_size = file_path.stat().st_size
+
+    # Determine media type
+    ext = file_path.suffix.lower()
+    if ext in VIDEO_EXTENSIONS:
+        media_type = "video"
+    else:
+        media_type = "image"
+
+    with span("upload", file=filename, bytes=file_size, media_type=media_type) as trace:
+        try:
+            fingerprint = file_fingerprint(file_path)
+
+            def record_part(part_number: int, etag: str):
+                upload_journal.record_part(fingerprint, part_number, etag)
+
+            # Resume a journaled session if there is one; the server answers 4xx
+            # once it has expired, in which case we start over
+            entry = upload_journal.get(fingerprint)
+            if entry:
+                parts = plan_upload_parts(file_size, entry["partSize"])
+                done = {int(n): etag for n, etag in entry["parts"].items()}
+                try:
+                    uploaded = upload_parts(entry["uploadId"], file_path,
+                                            [p for p in parts if p[0] not in done], concurrency, record_part)
+                    done.update({p["partNumber"]: p["eTag"] for p in uploaded})
+                    completed_parts = [{"partNumber": n, "eTag": done[n]} for n, _, _ in parts]
+                    media_uuid = complete_upload(entry["uploadId"], completed_parts)
+                    upload_journal.discard(fingerprint)
+                    index_file(file_path, media_uuid)
+                    resumed = trace["resumed_parts"] = len(entry["parts"])
+                    return media_uuid, f"Upload wznowiony ({resumed}/{len(parts)} czesci juz bylo)! Media UUID: {media_uuid}"
+                except UploadError as e:
+                    if e.status_code not in UPLOAD_SESSION_GONE:
+                        raise
+                    upload_journal.discard(fingerprint)
+
+            # 1. Create upload session
+            upload_id = create_upload_session(filename, media_type)
+            upload_journal.start(fingerprint, upload_id, part_size, filename, media_type)
+
+            # 2-3. Sign and upload every part to S3
+            parts = plan_upload_parts(file_size, part_size)
+            completed_parts = upload_parts(upload_id, file_path, parts, concurrency, record_part)
+
+            # 4. Complete upload
+            media_uuid = complete_upload(upload_id, completed_parts)
+            upload_journal.discard(fingerprint)
+            index_file(file_path, media_uuid)
+            return media_uuid, f"Upload ukonczony ({len(parts)} czesci)! Media UUID: {media_uuid}"
+
+        except UploadError as e:
+            trace.update(outcome="error", status=e.status_code)
+            return None, str(e)
+        except Exception as e:
+            trace.update(outcome="error", error=type(e).__name__)
+            return None, f"Blad uploadu: {str(e)}"
+
+
+def wait_for_media(media_uuid: str) -> Optional[str]:
+    """Block until Fanvue has processed an upload; returns an error message, or None when it is ready."""
+    with span("media.wait", media=media_uuid) as trace:
+        ready, status = state.api.wait_media_ready(media_uuid)
+        if not ready:
+            trace.update(outcome="error", status=status)
+    if ready:
+        return None
+    return f"Media {media_uuid} nie jest gotowe do publikacji ({status})"
+
+
+def submit_post(caption: str, media_uuid: str, audience: str, scheduled_at: str = "",
+                caption_source: str = "", file_name: str = "", price: Optional[float] = None,
+                creator_uuid: Optional[str] = None) -> tuple[Optional[str], str]:
+    """Create a post on Fanvue, returning (post UUID or None, status message).
+
+    `price` makes it a PPV post. `caption_source` and `file_name` are only kept
+    in the local post history (for the stats). The post goes to `creator_uuid`,
+    by default the active creator.
+    """
+    if not state.is_authenticated():
+        return None, "Najpierw zaloguj sie!"
+
+    creator_uuid = creator_uuid or state.creator_uuid
+    if not creator_uuid:
+        return None, "Brak creator UUID!"
+
+    if not caption.strip():
+        return None, "Podaj tekst posta!"
+
+    audience_map = {
+        "Wszyscy (publiczny)": "everyone",
+        "Obserwujacy i subskrybenci": "followers-and-subscribers",
+        "Tylko subskrybenci": "subscribers-only"
+    }
+
+    post_data = {
+        "text": caption.strip(),
+        "audience": audience_map.get(audience, "followers-and-subscribers")
+    }
+
+    if media_uuid:
+        post_data["mediaUuids"] = [media_uuid]
+
+    if scheduled_at:
+        post_data["scheduledAt"] = scheduled_at
+
+    if price:
+        post_data["price"] = price
+
+    try:
+        with span("post.create", creator=creator_uuid, scheduled=bool(scheduled_at)) as trace:
+            response = state.api.post(f"/creators/{creator_uuid}/posts", json=post_data)
+            if response.status_code not in [200, 201]:
+                trace.update(outcome="error", status=response.status_code)
+
+        if response.status_code in [200, 201]:
+            post_uuid = response.json().get("uuid", "N/A")
+            # Show the post in the history right away; the next sync refreshes it from the API
+            post_store.upsert(creator_uuid, [{
+                "createdAt": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+                **post_data,
+                **response.json(),
+                "captionSource": caption_source or None,
+                "fileName": file_name or None,
+                "mediaType": ("video" if is_video(file_name) else "image") if file_name and media_uuid else None
+            }])
+            return post_uuid, f"Post utworzony!\nID: {post_uuid}"
+        else:
+            return None, f"Blad tworzenia posta: {response.status_code} - {response.text}"
+
+    except Exception as e:
+        return None, f"Blad: {str(e)}"
+
+
+def create_post(caption: str, media_uuid: str, audience: str, scheduled_at: str = "") -> str:
+    """Create a post on Fanvue."""
+    return submit_post(caption, media_uuid, audience, scheduled_at)[1]
+
+
+def idea_row(idea: dict) -> list:
+    """Table row for one content plan entry."""
+    return [
+        idea.get("day", ""),
+        idea.get("type", ""),
+        idea.get("idea", ""),
+        idea.get("caption_draft", ""),
+        idea.get("audience", ""),
+        idea.get("best_time", ""),
+        idea.get("hashtags", "")
+    ]
+
+
+def generate_content_ideas(niche: str, days: int, include_seasonal: bool, include_ppv: bool):
+    """Generate content ideas plan using GPT-4o.
+
+    Generator yielding (table rows, ideas JSON, status). The plan is split into day
+    ranges generated in parallel (see content_plan); rows are added to the table as
+    soon as each streamed JSON object closes, and failed ranges are retried alone.
+    """
+    if not state.openai_api_key:
+        yield [], "[]", "Najpierw ustaw klucz OpenAI API!"
+        return
+
+    if not niche.strip():
+        yield [], "[]", "Opisz swoja nisze/styl!"
+        return
+
+    yield [], "[]", "Generowanie pomyslow..."
+
+    days = int(days)
+    for ideas, finished, error in iter_content_plan(stream_completion, niche, days, include_seasonal, include_ppv):
+        rows = [idea_row(idea) for idea in ideas]
+        if not finished:
+            yield rows, "[]", f"Generowanie... {len(ideas)}/{days} dni"
+        elif error:
+            yield rows, json.dumps(ideas, ensure_ascii=False), f"Wygenerowano {len(ideas)}/{days} dni. Bledy: {error}"
+        else:
+            yield rows, json.dumps(ideas, ensure_ascii=False), f"Wygenerowano plan na {len(ideas)} dni!"
+
+
+def export_ideas_csv(ideas_json: str) -> Optional[str]:
+    """Export ideas to CSV file."""
+    if not ideas_json or ideas_json == "[]":
+        return None
+
+    try:
+        ideas = json.loads(ideas_json)
+        if not ideas:
+            return None
+
+        # Ensure pomysly directory exists
+        export_dir = Path(__file__).parent / "pomysly"
+        export_dir.mkdir(exist_ok=True)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = export_dir / f"content_plan_{timestamp}.csv"
+
+        with open(filepath, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Dzien", "Typ", "Pomysl", "Caption", "Odbiorcy", "Godzina", "Hashtagi"])
+            for idea in ideas:
+                writer.writerow(idea_row(idea))
+
+        return str(filepath)
+
+    except Exception:
+        return None
+
+
+def catalog_caption(item: dict, style: str, use_ai: bool) -> tuple[str, str]:
+    """(caption, caption source) for a catalog item: live AI, then the catalog description, then a fallback."""
+    if use_ai and state.openai_api_key:
+        caption = ""
+        for caption in iter_caption(item["file_path"], style, video=item["media_type"] == "video"):
+            pass
+        if not caption.startswith("Blad generowania") and not is_refusal(caption):
+            return caption, "ai-live"
+    if not is_refusal(item["description_fanvue"]):
+        return item["description_fanvue"].strip(), "pre-generated"
+    return random.choice(FALLBACK_CAPTIONS), "fallback"
+
+
+def publish_from_catalog(style: str = "Sexy & Flirty", use_ai: bool = True,
+                         scheduled_at: str = "") -> tuple[Optional[str], str]:
+    """Claim a random unposted catalog file, upload and post it; returns (post UUID or None, message).
+
+    Videos go out as PPV to everyone at the dynamic price, images to followers
+    and subscribers. A failed upload or post returns the file to the catalog.
+    """
+    if not state.is_authenticated():
+        return None, "Najpierw zaloguj sie!"
+
+    item = media_catalog.claim()
+    if not item:
+        return None, "Brak nieopublikowanych plikow w katalogu!"
+
+    file_name = Path(item["file_path"]).name
+    if not Path(item["file_path"]).is_file():
+        media_catalog.drop(item["id"], item["claim_token"])
+        return None, f"Plik nie istnieje, usuniety z kolejki: {item['file_path']}"
+
+    try:
+        caption, caption_source = catalog_caption(item, style, use_ai)
+        # The catalog is curated; similar shots in it are meant to go out separately
+        media_uuid, upload_msg = upload_media(item["file_path"], allow_similar=True)
+        if not media_uuid:
+            media_catalog.release(item["id"], item["claim_token"])
+            return None, f"{file_name}: {upload_msg}"
+
+        media_error = wait_for_media(media_uuid)
+        if media_error:
+            media_catalog.release(item["id"], item["claim_token"])
+            return None, f"{file_name}: {media_error}"
+
+        audience = "Wszyscy (publiczny)" if item["is_ppv"] else "Obserwujacy i subskrybenci"
+        # A long upload may have run past the slot; a scheduledAt in the past is dropped
+        scheduled_at = schedule_or_now(scheduled_at)
+        post_uuid, post_msg = submit_post(caption, media_uuid, audience, scheduled_at, caption_source, file_name,
+                                          price=item["ppv_price"] if item["is_ppv"] else None)
+        if not post_uuid:
+            media_catalog.release(item["id"], item["claim_token"])
+            return None, f"{file_name}: {post_msg}"
+    except Exception as e:
+        media_catalog.release(item["id"], item["claim_token"])
+        return None, f"{file_name}: Blad: {str(e)}"
+
+    media_catalog.mark_posted(item["id"], item["claim_token"])
+    ppv = f", PPV ${item['ppv_price']:.2f}" if item["is_ppv"] else ""
+    return post_uuid, (f"{file_name} ({item['media_type']}{ppv}, opis: {caption_source})\n{post_msg}\n"
+                       f"Pozostalo w katalogu: {item['available']}")
+
+
+# Daily random slots for automatic catalog publishing (persisted timetable)
+SCHEDULE_FILE = Path(__file__).parent / ".schedule.json"
+SCHEDULER_CAPTION_STYLE = os.getenv("SCHEDULER_CAPTION_STYLE", "Sexy & Flirty")
+
+
+def scheduled_catalog_post(scheduled_at: str) -> tuple[bool, str]:
+    """Scheduler job: publish one catalog file, timed by Fanvue at `scheduled_at` when given."""
+    post_uuid, message = publish_from_catalog(SCHEDULER_CAPTION_STYLE, True, scheduled_at)
+    return post_uuid is not None, message.replace("\n", " ")
+
+
+publish_scheduler = PublishScheduler(SCHEDULE_FILE, scheduled_catalog_post)
+
+
+def collect_media_files(files=None, folder: str = "") -> list[str]:
+    """Merge a multi-file selection and the media files found in a folder."""
+    paths = [str(f) for f in (files or [])]
+    if folder and folder.strip():
+        folder_path = Path(folder.strip()).expanduser()
+        if folder_path.is_dir():
+            paths += sorted(
+                str(p) for p in folder_path.iterdir()
+                if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS + IMAGE_EXTENSIONS
+            )
+    return paths
+
+
+def iter_batch_publish(paths: list[str], caption: str, audience: str, concurrency: int = BATCH_CONCURRENCY,
+                       creators: Optional[list[str]] = None, allow_similar: bool = False,
+                       posts_fields: Optional[list[dict]] = None):
+    """Upload and post many files concurrently, yielding (index, status, media_uuid, message, seconds).
+
+    Every file is uploaded once on a bounded pool and posted to each creator in
+    `creators` (default: the active one) as soon as its own upload is ready,
+    instead of waiting for the whole batch. Posts wait in a FairQueue, so the
+    creators take turns and each has at most CREATOR_CONCURRENCY posts in
+    flight on the shared connection pool. Row `index` is
+    file_index * len(creators) + creator_index. Updates are yielded from the
+    calling thread as they happen.
+
+    `posts_fields` (one dict per file) overrides the caption or audience of a
+    file's posts, or adds a `scheduled_at` or `price`.
+    """
+    creators = creators or [state.creator_uuid]
+    per_file = len(creators)
+    updates = queue.Queue()
+    posts = FairQueue(CREATOR_CONCURRENCY)
+    started: dict[int, float] = {}
+
+    def elapsed(index: int) -> float:
+        return time.perf_counter() - started[index]
+
+    def file_update(index: int, status: str, media_uuid: str, message: str):
+        for j in range(per_file):
+            updates.put((index * per_file + j, status, media_uuid, message, elapsed(index)))
+
+    def upload(index: int, path: str):
+        QUEUE_DEPTH.dec(queue="upload")
+        started[index] = time.perf_counter()
+        try:
+            file_update(index, "upload", "", "Uploadowanie...")
+            media_uuid, upload_msg = upload_media(path, allow_similar=allow_similar)
+            if not media_uuid:
+                file_update(index, "blad", "", upload_msg)
+                return
+            file_update(index, "przetwarzanie", media_uuid, "Czekam na przetworzenie...")
+            media_error = wait_for_media(media_uuid)
+            if media_error:
+                file_update(index, "blad", media_uuid, media_error)
+                return
+            file_update(index, "post", media_uuid, "Czeka na kolejke creatora...")
+            for j, creator in enumerate(creators):
+                QUEUE_DEPTH.inc(queue="post")
+                posts.put(creator, (index, j, path, media_uuid))
+        except Exception as e:
+            file_update(index, "blad", "", f"Blad: {str(e)}")
+
+    def post_worker():
+        while (entry := posts.get()) is not None:
+            QUEUE_DEPTH.dec(queue="post")
+            creator, (index, j, path, media_uuid) = entry
+            row = index * per_file + j
+            try:
+                fields = {"caption": caption, "audience": audience, **(posts_fields[index] if posts_fields else {})}
+                post_uuid, post_msg = submit_post(media_uuid=media_uuid, file_name=Path(path).name,
+                                                  creator_uuid=creator, **fields)
+                status = "ok" if post_uuid else "blad"
+                updates.put((row, status, media_uuid, post_msg.replace("\n", " "), elapsed(index)))
+            except Exception as e:
+                updates.put((row, "blad", media_uuid, f"Blad: {str(e)}", elapsed(index)))
+            finally:
+                posts.done(creator)
+
+    post_threads = [threading.Thread(target=post_worker, daemon=True)
+                    for _ in range(min(per_file * CREATOR_CONCURRENCY, MAX_POST_THREADS))]
+    for thread in post_threads:
+        thread.start()
+
+    uploads = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    QUEUE_DEPTH.inc(len(paths), queue="upload")
+    for i, path in enumerate(paths):
+        uploads.submit(upload, i, path)
+
+    def close_when_uploaded():
+        uploads.shutdown(wait=True)
+        posts.close()
+
+    threading.Thread(target=close_when_uploaded, daemon=True).start()
+
+    remaining = len(paths) * per_file
+    while remaining:
+        update = updates.get()
+        if update[1] in ("ok", "blad"):
+            remaining -= 1
+        yield update
+
+
+def creator_name(creator_uuid: str) -> str:
+    return state.creators.get(creator_uuid, creator_uuid or "")
+
+
+def batch_upload_and_post(files, folder: str, caption: str, audience: str, concurrency: float = BATCH_CONCURRENCY,
+                          creators: Optional[list[str]] = None, allow_similar: bool = False):
+    """Gradio generator: publish a batch and stream a status table with a row per file and creator."""
+    paths = collect_media_files(files, folder)
+    if not paths:
+        yield [], "Wybierz pliki lub podaj folder!"
+        return
+    if not caption.strip():
+        yield [], "Podaj tekst posta!"
+        return
+
+    creators = creators or [state.creator_uuid]
+    targets = [(p, c) for p in paths for c in creators]
+    started = time.perf_counter()
+    rows = [[Path(p).name, creator_name(c), "w kolejce", "", "", ""] for p, c in targets]
+    yield rows, f"Start: {len(paths)} plikow, {len(creators)} creatorow"
+
+    done = failed = 0
+    for index, status, media_uuid, message, seconds in iter_batch_publish(paths, caption, audience, int(concurrency),
+                                                                          creators, allow_similar):
+        path, creator = targets[index]
+        rows[index] = [Path(path).name, creator_name(creator), status, media_uuid, message, f"{seconds:.1f}"]
+        if status == "ok":
+            done += 1
+        elif status == "blad":
+            failed += 1
+        yield rows, f"Gotowe {done}/{len(targets)}, bledy: {failed}"
+
+    yield rows, f"Zakonczono w {time.perf_counter() - started:.1f}s: {done} opublikowanych, {failed} bledow"
+
+
+def enqueue_upload(path: str, allow_similar: bool = False) -> tuple[int, bool]:
+    """Queue the upload of a file, one job per file content; returns (job id, created).
+
+    Every creator's publish job for the file waits for this job and posts its
+    media UUID, so the file is uploaded once however many creators get it.
+    """
+    path = Path(path).resolve()
+    return job_queue.enqueue("upload", {"file": str(path), "allow_similar": allow_similar},
+                             f"upload:{file_fingerprint(path)}")
+
+
+def enqueue_publish(path: str, caption: str, audience: str, style: str = "", custom_prompt: str = "",
+                    creator_uuid: Optional[str] = None, allow_similar: bool = False,
+                    scheduled_at: str = "", price: Optional[float] = None) -> tuple[int, bool]:
+    """Queue one caption -> post job for a creator (default: the active one); returns (job id, created).
+
+    The file itself is uploaded by the shared job from enqueue_upload, queued
+    here as well so the upload starts while captions are written.
+
+    The idempotency key covers creator, file content, audience, caption (or
+    caption style) and schedule, so queueing the same batch again does not
+    post twice. `allow_similar` is left out on purpose: queueing a job that
+    failed as a near-duplicate again with the override set re-queues that job
+    with the new payload (see JobQueue.enqueue).
+    """
+    creator_uuid = creator_uuid or state.creator_uuid or ""
+    path = Path(path).resolve()
+    enqueue_upload(path, allow_similar)
+    what = caption.strip() or f"{style}\n{custom_prompt}"
+    parts = [creator_uuid, file_fingerprint(path), audience, what] + ([scheduled_at] if scheduled_at else [])
+    key = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+    return job_queue.enqueue("publish", {
+        "file": str(path),
+        "caption": caption.strip(),
+        "style": style,
+        "custom_prompt": custom_prompt,
+        "audience": audience,
+        "allow_similar": allow_similar,
+        "scheduled_at": scheduled_at,
+        "price": price
+    }, f"publish:{key}", creator_uuid)
+
+
+def job_message(job: dict) -> str:
+    if job["state"] == "done":
+        return " ".join(f"{k}: {v}" for k, v in job["result"].items())
+    if job["state"] == "queued" and job["progress"].get("waiting_for"):
+        return f"Czeka na upload (zadanie {job['progress']['waiting_for']})"
+    return job["error"] or ""
+
+
+def job_row(job: dict) -> list:
+    payload = job["payload"]
+    return [
+        job["id"],
+        job["kind"],
+        Path(payload.get("file", "")).name,
+        creator_name(job["creator_uuid"]),
+        JOB_STATE_LABELS.get(job["state"], job["state"]),
+        f"{job['attempts']}/{job['max_attempts']}",
+        job_message(job),
+        datetime.fromtimestamp(job["updated"]).strftime("%Y-%m-%d %H:%M:%S")
+    ]
+
+
+def workers_note() -> str:
+    if job_queue.active_workers():
+        return ""
+    return " Brak aktywnych workerow - uruchom je w zakladce Kolejka lub `python worker.py`."
+
+
+def queue_batch_publish(files, folder: str, caption: str, audience: str, style: str = "",
+                        creators: Optional[list[str]] = None, allow_similar: bool = False):
+    """Gradio generator: queue a batch for the workers, then watch the jobs until they finish.
+
+    Every file gets one upload job and every creator its own post job per
+    file, which reuses the uploaded media; workers take the creators in turn. Closing the page or restarting the UI does not stop the batch; the
+    jobs stay in the queue and show up in the Kolejka tab.
+    """
+    paths = collect_media_files(files, folder)
+    if not paths:
+        yield [], "Wybierz pliki lub podaj folder!"
+        return
+    if not caption.strip() and not style:
+        yield [], "Podaj tekst posta lub wybierz styl opisu AI!"
+        return
+    if not state.is_authenticated():
+        yield [], "Najpierw zaloguj sie!"
+        return
+
+    creators = creators or [state.creator_uuid]
+    queued = [enqueue_publish(p, caption, audience, style, creator_uuid=c, allow_similar=allow_similar)
+              for p in paths for c in creators]
+    job_ids = [job_id for job_id, _ in queued]
+    repeated = sum(not created for _, created in queued)
+    note = f" ({repeated} juz bylo w kolejce)" if repeated else ""
+
+    while True:
+        jobs = job_queue.get(job_ids)
+        rows = [[
+            Path(job["payload"]["file"]).name,
+            creator_name(job["creator_uuid"]),
+            JOB_STATE_LABELS.get(job["state"], job["state"]),
+            job["result"].get("media_uuid") or job["progress"].get("media_uuid", ""),
+            job_message(job),
+            f"{job['updated'] - job['created']:.1f}"
+        ] for job in jobs]
+        done = sum(job["state"] == "done" for job in jobs)
+        failed = sum(job["state"] in ("failed", "cancelled") for job in jobs)
+        if done + failed == len(jobs):
+            yield rows, f"Zakonczono: {done} opublikowanych, {failed} bledow{note}"
+            return
+        yield rows, f"W kolejce: {len(jobs)} zadan{note}. Gotowe {done}, bledy: {failed}.{workers_note()}"
+        time.sleep(JOB_WATCH_INTERVAL)
+
+
+def publish_batch(files, folder: str, caption: str, audience: str, concurrency: float, queued: bool, style: str,
+                  creators: Optional[list[str]] = None, allow_similar: bool = False):
+    """Publish in this process, or hand the batch to the job queue."""
+    if queued:
+        yield from queue_batch_publish(files, folder, caption, audience, style or "", creators, allow_similar)
+    else:
+        yield from batch_upload_and_post(files, folder, caption, audience, concurrency, creators, allow_similar)
+
+
+def queue_view() -> tuple[str, list]:
+    counts = job_queue.counts()
+    summary = ", ".join(f"{JOB_STATE_LABELS[s]}: {counts[s]}" for s in JOB_STATE_LABELS if counts.get(s))
+    workers = len(job_queue.active_workers())
+    return (f"Aktywne workery: {workers}. Zadania - {summary or 'brak'}.{workers_note()}",
+            [job_row(job) for job in job_queue.recent()])
+
+
+def start_workers(processes: float) -> tuple[str, list]:
+    """Start worker processes in their own session, so they outlive the UI."""
+    subprocess.Popen(
+        [sys.executable, str(Path(__file__).parent / "worker.py"), "--processes", str(int(processes))],
+        cwd=Path(__file__).parent,
+        start_new_session=True,
+        stdout=subprocess.DEVNULL
+    )
+    message, rows = queue_view()
+    return f"Uruchamianie {int(processes)} workerow...\n{message}", rows
+
+
+async def bulk_caption_handler(files, folder: str, style: str, custom_prompt: str, csv_name: str,
+                               concurrency: float = CAPTION_CONCURRENCY,
+                               tokens_per_minute: float = CAPTION_TOKENS_PER_MINUTE):
+    """Gradio async generator: caption many files, streaming rows into the table and CSV."""
+    if not state.openai_api_key:
+        yield [], "Najpierw ustaw klucz OpenAI API!"
+        return
+
+    paths = collect_media_files(files, folder)
+    if not paths:
+        yield [], "Wybierz pliki lub podaj folder!"
+        return
+
+    csv_path = CAPTIONS_DIR / (Path(csv_name.strip() or "opisy.csv").stem + ".csv")
+    started = time.perf_counter()
+    rows = []
+    tokens = 0
+    from openai import AsyncOpenAI
+
+    # max_retries=0: backoff is handled per request by bulk_caption
+    async with AsyncOpenAI(api_key=state.openai_api_key, max_retries=0) as client:
+        async for row in caption_files(client, paths, style, custom_prompt, csv_path, OPENAI_MODEL,
+                                       int(concurrency), int(tokens_per_minute), caption_cache, IMAGE_CACHE_DIR):
+            tokens += int(row["tokens"] or 0)
+            rows.append([Path(row["file"]).name, row["status"], row["caption"], row["tokens"]])
+            yield rows, f"{len(rows)}/{len(paths)} plikow, {tokens} tokenow"
+
+    yield rows, f"Zakonczono w {time.perf_counter() - started:.1f}s: {len(rows)} plikow, {tokens} tokenow. CSV: {csv_path}"
+
+
+# Load tokens on startup
+load_tokens()
@@ -0,0 +1,56 @@
+"""
+Round-robin queue over many creators.
+
+Every creator gets its own FIFO; `get()` serves the creators in turn and
+skips any that already have `per_key_limit` items in flight. A creator with
+a 500-file batch therefore cannot starve one with five files, and no single
+creator gets more than its share of the shared connection pool.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Hashable, Optional
+
+
+class FairQueue:
+    """Thread-safe per-key queues served round-robin with a per-key in-flight cap."""
+
+    def __init__(self, per_key_limit: int = 1):
+        self.per_key_limit = max(1, per_key_limit)
+        self._cond = threading.Condition()
+        # Keys in service order; a served key moves to the back
+        self._queues: OrderedDict[Hashable, deque] = OrderedDict()
+        self._in_flight: dict[Hashable, int] = {}
+        self._closed = False
+
+    def put(self, key: Hashable, item: Any):
+        with self._cond:
+            self._queues.setdefault(key, deque()).append(item)
+            self._cond.notify()
+
+    def get(self) -> Optional[tuple[Hashable, Any]]:
+        """Next (key, item) in round-robin order; None once closed and drained.
+
+        Call `done(key)` when the item has been processed.
+        """
+        with self._cond:
+            while True:
+                for key, items in self._queues.items():
+                    if items and self._in_flight.get(key, 0) < self.per_key_limit:
+                        self._queues.move_to_end(key)
+                        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+                        return key, items.popleft()
+                if self._closed and not any(self._queues.values()):
+                    return None
+                self._cond.wait()
+
+    def done(self, key: Hashable):
+        with self._cond:
+            self._in_flight[key] -= 1
+            self._cond.notify_all()
+
+    def close(self):
+        """No more puts; `get()` returns None to every consumer once the queues are empty."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,185 @@
+"""
+Long-lived HTTP client for the Fanvue API.
+
+One keep-alive connection pool (HTTP/2 when `h2` is installed) is shared by
+every call in the app, so repeated requests skip the TCP/TLS handshake.
+A 401 answer is retried once when `on_unauthorized` manages to get a new
+token (see token_manager.py). Every call goes through the shared rate
+governor (see rate_governor.py), and a 429 is waited out and sent again up to
+RATE_LIMIT_RETRIES times instead of being handed back to the caller.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+
+import rate_governor
+from metrics import HTTP_RESPONSES, RETRIES
+from rate_governor import RATE_LIMIT_RETRIES, RateGovernor
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("FANVUE_HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE = int(os.getenv("FANVUE_HTTP_MAX_KEEPALIVE", 10))
+HTTP_TIMEOUT = float(os.getenv("FANVUE_HTTP_TIMEOUT", 120.0))
+HTTP_CONNECT_TIMEOUT = 10.0
+HTTP2_ENABLED = os.getenv("FANVUE_HTTP2", "1") != "0"
+
+# Uploaded media is processed (transcoded, scanned) before it can be attached to a post
+MEDIA_READY_TIMEOUT = float(os.getenv("FANVUE_MEDIA_READY_TIMEOUT", 600))
+MEDIA_POLL_INITIAL = 0.5  # seconds before the second status check, doubled after every check
+MEDIA_POLL_MAX = 10.0
+# How long a 404 from the status endpoint is waited out before the post is sent anyway
+MEDIA_NOT_FOUND_GRACE = float(os.getenv("FANVUE_MEDIA_NOT_FOUND_GRACE", 5))
+MEDIA_READY_STATUSES = {"ready", "processed", "completed", "complete", "available", "active"}
+MEDIA_FAILED_STATUSES = {"failed", "error", "rejected", "invalid"}
+# Only these keep the poll going; any other status (or none) is taken as ready
+MEDIA_PENDING_STATUSES = {"pending", "processing", "queued", "uploading", "uploaded", "transcoding", "encoding",
+                          "in_progress", "created"}
+
+
+def endpoint_class(method: str, path: str) -> str:
+    """Rate governor class of a Fanvue API call."""
+    if path.startswith("/media/upload/"):
+        return "upload"
+    if method == "GET":
+        return "read"
+    return "post"
+
+
+def media_status(payload: dict) -> str:
+    """Lower-cased processing status of a media object, wherever the API puts it."""
+    media = payload.get("data", payload) if isinstance(payload, dict) else {}
+    status = media.get("status") or media.get("processingStatus") or media.get("state") or ""
+    return str(status).lower()
+
+
+class FanvueClient:
+    """Thread-safe wrapper around a lazily created, pooled `httpx.Client`.
+
+    API calls take paths relative to `base_url` and carry the auth headers;
+    `put_signed` sends to absolute presigned S3 URLs without them, since an
+    extra Authorization header would break the S3 signature.
+    """
+
+    def __init__(self, token_getter: Callable[[], Optional[str]], base_url: str, api_version: str,
+                 max_connections: int = HTTP_MAX_CONNECTIONS, max_keepalive: int = HTTP_MAX_KEEPALIVE,
+                 timeout: float = HTTP_TIMEOUT, http2: bool = HTTP2_ENABLED,
+                 on_unauthorized: Optional[Callable[[Optional[str]], bool]] = None,
+                 governor: Optional[RateGovernor] = None):
+        self.token_getter = token_getter
+        # Called with the rejected token; True means a new one is available
+        self.on_unauthorized = on_unauthorized
+        self.base_url = base_url
+        self.api_version = api_version
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT)
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.governor = governor or rate_governor.governor
+        self._client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        return self._client
+
+    def headers(self, token: Optional[str] = None) -> dict:
+        """Get headers for Fanvue API requests."""
+        return {
+            "Authorization": f"Bearer {token or self.token_getter()}",
+            "X-Fanvue-API-Version": self.api_version,
+            "Content-Type": "application/json"
+        }
+
+    def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        extra_headers = kwargs.pop("headers", {})
+        limiter = self.governor[endpoint_class(method, path)]
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            with limiter.call() as call:
+                token = self.token_getter()
+                response = self.client.request(method, f"{self.base_url}{path}",
+                                               headers={**self.headers(token), **extra_headers}, **kwargs)
+                if response.status_code == 401 and self.on_unauthorized and self.on_unauthorized(token):
+                    # Expired mid-job: the same request once more with the renewed token
+                    RETRIES.inc(operation="fanvue_api", reason="401")
+                    response = self.client.request(method, f"{self.base_url}{path}",
+                                                   headers={**self.headers(), **extra_headers}, **kwargs)
+                call.response(response)
+            HTTP_RESPONSES.inc(method=method, status=response.status_code)
+            if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                return response
+            # The governor holds the next attempt back until Retry-After has passed
+            RETRIES.inc(operation="fanvue_api", reason="429")
+
+    def get(self, path: str, **kwargs) -> httpx.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> httpx.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put_signed(self, url: str, **kwargs) -> httpx.Response:
+        """PUT to S3 under the "s3" governor class, paying the body size; retries are up to the caller."""
+        size = float(kwargs.get("headers", {}).get("Content-Length", 0))
+        with self.governor["s3"].call(size or 1.0) as call:
+            response = self.client.put(url, **kwargs)
+            call.response(response)
+        return response
+
+    def wait_media_ready(self, media_uuid: str, timeout: float = MEDIA_READY_TIMEOUT) -> tuple[bool, str]:
+        """Poll `GET /media/{uuid}` with exponential backoff until it is ready; returns (ready, last status).
+
+        Returns as soon as processing finishes, so small images are usually ready
+        on the first or second check while long videos keep waiting until the
+        deadline. Only a known processing status keeps the poll going: a 200
+        without one counts as ready, and a 404 (not visible yet, or no such
+        endpoint) is waited out for MEDIA_NOT_FOUND_GRACE seconds and then
+        counts as ready too, so the post is sent as it was before the check.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        delay = MEDIA_POLL_INITIAL
+        status = "unknown"
+        while True:
+            wait = delay
+            try:
+                response = self.get(f"/media/{media_uuid}")
+                if response.status_code == 200:
+                    status = media_status(response.json()) or "unknown"
+                    if status in MEDIA_FAILED_STATUSES:
+                        return False, status
+                    if status not in MEDIA_PENDING_STATUSES:
+                        return True, status
+                elif response.status_code == 404:
+                    if time.monotonic() - started >= MEDIA_NOT_FOUND_GRACE:
+                        return True, "not found"
+                elif response.status_code == 429:
+                    wait = max(delay, float(response.headers.get("Retry-After", delay)))
+                elif response.status_code != 404 and response.status_code < 500:
+                    return False, f"HTTP {response.status_code}"
+            except httpx.TransportError:
+                pass
+            except ValueError:
+                return True, "unknown"  # a 200 that is not JSON says nothing about processing
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False, f"timeout ({status})"
+            time.sleep(min(wait, remaining))
+            delay = min(delay * 2, MEDIA_POLL_MAX)
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
@@ -0,0 +1,80 @@
+"""
+Shrink images before they are sent to the vision model.
+
+With `"detail": "low"` the model only looks at a 512px version, so sending the
+original 20-40 MB camera file wastes upload time and memory. Prepared JPEGs are
+cached on disk per content hash and detail level.
+"""
+
+import base64
+import io
+import threading
+from pathlib import Path
+
+from media_hash import file_sha256
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Longest side the model actually uses for each detail level
+DETAIL_MAX_SIDE = {"low": 512, "high": 2048, "auto": 2048}
+JPEG_QUALITY = 85
+
+MIME_MAP = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".gif": "image/gif", ".webp": "image/webp"}
+
+
+def _downscale(image_path: Path, max_side: int) -> bytes:
+    with Image.open(image_path) as img:
+        # Lets the JPEG decoder skip straight to a 1/2, 1/4 or 1/8 scale
+        img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        return buffer.getvalue()
+
+
+def prepare_image(image_path, detail: str = "low", cache_dir: Path = None) -> tuple[bytes, str]:
+    """Return (image bytes, mime type) sized for the requested detail level.
+
+    Falls back to the original file when Pillow is missing or cannot decode it.
+    """
+    image_path = Path(image_path)
+    max_side = DETAIL_MAX_SIDE.get(detail, DETAIL_MAX_SIDE["auto"])
+
+    if PIL_AVAILABLE:
+        cached_path = None
+        if cache_dir is not None:
+            cached_path = cache_dir / f"{file_sha256(image_path)}_{max_side}.jpg"
+            if cached_path.exists():
+                return cached_path.read_bytes(), "image/jpeg"
+        try:
+            data = _downscale(image_path, max_side)
+        except Exception:
+            data = None
+        if data is not None:
+            if cached_path is not None:
+                cache_dir.mkdir(exist_ok=True)
+                tmp_path = cached_path.with_suffix(f".{threading.get_ident()}.tmp")
+                tmp_path.write_bytes(data)
+                tmp_path.replace(cached_path)
+            return data, "image/jpeg"
+
+    return image_path.read_bytes(), MIME_MAP.get(image_path.suffix.lower(), "image/jpeg")
+
+
+def image_data_url(image_path, detail: str = "low", cache_dir: Path = None) -> str:
+    """Prepared image as a base64 data URL for the chat completions API."""
+    data, mime_type = prepare_image(image_path, detail, cache_dir)
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
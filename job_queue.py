@@ -0,0 +1,324 @@
+"""
+Durable SQLite job queue for uploads, captions and posts.
+
+The UI only enqueues jobs and reads their state; worker processes (worker.py)
+claim them one at a time under a lease. A claimed job is `running` until the
+worker completes or fails it. If the worker dies, the lease runs out and the
+job goes back to `queued`. Failed attempts are retried with exponential
+backoff up to `max_attempts`. An idempotency key makes enqueueing the same
+work twice return the existing job instead of posting it twice.
+
+A job that needs another job's result first (a post waiting for the shared
+upload of its file) records the job ID as `waiting_for` in its progress and
+is handed back without using an attempt; finishing that job wakes it.
+
+Jobs belong to a creator. A claim serves the creator with the fewest running
+jobs, and among those the one served longest ago, so one creator's big batch
+cannot hold back the others.
+
+States: queued -> running -> done | failed (| cancelled while queued).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+JOB_LEASE_SECONDS = 120  # a running job must heartbeat within this window
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_BACKOFF = 5.0  # seconds, doubled per attempt
+JOB_WAIT_SECONDS = 15.0  # recheck interval of a job waiting for another one, if nothing wakes it earlier
+JOB_STATES = ["queued", "running", "done", "failed", "cancelled"]
+
+
+class JobError(Exception):
+    """Raised by job handlers; `retryable=False` fails the job at once."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class JobWaiting(Exception):
+    """Raised by job handlers waiting for another job; the job is handed back for `delay` seconds."""
+
+    def __init__(self, message: str, delay: float = JOB_WAIT_SECONDS):
+        super().__init__(message)
+        self.delay = delay
+
+
+class JobQueue:
+    """Shared by the UI and any number of worker processes through one SQLite file."""
+
+    def __init__(self, path: Path, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    creator_uuid TEXT,
+                    payload TEXT NOT NULL,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    state TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    idempotency_key TEXT UNIQUE,
+                    worker TEXT,
+                    lease_until REAL,
+                    run_after REAL NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                );
+                DROP INDEX IF EXISTS jobs_queued;
+                CREATE INDEX IF NOT EXISTS jobs_queued_creator ON jobs (creator_uuid, run_after, id)
+                    WHERE state = 'queued';
+                CREATE INDEX IF NOT EXISTS jobs_running ON jobs (lease_until) WHERE state = 'running';
+                CREATE TABLE IF NOT EXISTS creator_turns (
+                    creator_uuid TEXT PRIMARY KEY,
+                    last_claim REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS workers (
+                    name TEXT PRIMARY KEY,
+                    pid INTEGER,
+                    job_id INTEGER,
+                    last_seen REAL NOT NULL
+                );
+            """)
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        for key in ("payload", "progress", "result"):
+            job[key] = json.loads(job[key]) if job[key] else {}
+        return job
+
+    def enqueue(self, kind: str, payload: dict, idempotency_key: Optional[str] = None,
+                creator_uuid: str = "", max_attempts: int = JOB_MAX_ATTEMPTS) -> tuple[int, bool]:
+        """Add a job; returns (job id, created).
+
+        A queued, running or done job with the same key is returned with
+        created=False. A failed or cancelled one is queued again with the new
+        payload and a fresh set of attempts.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            if idempotency_key:
+                row = conn.execute("SELECT id, state FROM jobs WHERE idempotency_key = ?",
+                                   (idempotency_key,)).fetchone()
+                if row and row["state"] not in ("failed", "cancelled"):
+                    return row["id"], False
+                if row:
+                    conn.execute("""
+                        UPDATE jobs SET kind = ?, creator_uuid = ?, payload = ?, progress = '{}', result = NULL,
+                            error = NULL, state = 'queued', attempts = 0, max_attempts = ?, worker = NULL,
+                            lease_until = NULL, run_after = ?, updated = ?
+                        WHERE id = ?
+                    """, (kind, creator_uuid, json.dumps(payload, ensure_ascii=False), max_attempts, now, now,
+                          row["id"]))
+                    return row["id"], True
+            cursor = conn.execute("""
+                INSERT INTO jobs (kind, creator_uuid, payload, max_attempts, idempotency_key, run_after, created, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (kind, creator_uuid, json.dumps(payload, ensure_ascii=False), max_attempts, idempotency_key,
+                  now, now, now))
+            return cursor.lastrowid, True
+
+    def claim(self, worker: str, kinds: Optional[list[str]] = None) -> Optional[dict]:
+        """Lease a due job (optionally of the given kinds) to `worker`, taking creators in turn."""
+        now = time.time()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            where = "state = 'queued' AND run_after <= ?"
+            args = [now]
+            if kinds:
+                where += f" AND kind IN ({','.join('?' * len(kinds))})"
+                args += kinds
+            waiting = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT creator_uuid FROM jobs WHERE {where}", args).fetchall()]
+            if not waiting:
+                return None
+            running = dict(conn.execute(
+                "SELECT creator_uuid, COUNT(*) FROM jobs WHERE state = 'running' GROUP BY creator_uuid").fetchall())
+            turns = dict(conn.execute("SELECT creator_uuid, last_claim FROM creator_turns").fetchall())
+            creator = min(waiting, key=lambda c: (running.get(c, 0), turns.get(c or "", 0)))
+            row = conn.execute(f"SELECT * FROM jobs WHERE {where} AND creator_uuid IS ? ORDER BY run_after, id LIMIT 1",
+                               args + [creator]).fetchone()
+            conn.execute("""
+                INSERT INTO creator_turns (creator_uuid, last_claim) VALUES (?, ?)
+                ON CONFLICT (creator_uuid) DO UPDATE SET last_claim = excluded.last_claim
+            """, (creator or "", now))
+            conn.execute("""
+                UPDATE jobs SET state = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, updated = ?
+                WHERE id = ?
+            """, (worker, now + self.lease_seconds, now, row["id"]))
+            job = self._row(row)
+        job["attempts"] += 1
+        return job
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float):
+        """Jobs whose worker stopped heartbeating count as a failed attempt."""
+        for row in conn.execute("SELECT id, attempts, max_attempts FROM jobs WHERE state = 'running' AND lease_until < ?",
+                                (now,)).fetchall():
+            if row["attempts"] >= row["max_attempts"]:
+                conn.execute("UPDATE jobs SET state = 'failed', error = ?, worker = NULL, updated = ? WHERE id = ?",
+                             ("Worker przestal odpowiadac", now, row["id"]))
+            else:
+                conn.execute("UPDATE jobs SET state = 'queued', worker = NULL, run_after = ?, updated = ? WHERE id = ?",
+                             (now, now, row["id"]))
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Extend the lease; False if the job was taken away from this worker."""
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'running'
+            """, (time.time() + self.lease_seconds, job_id, worker))
+            return bool(cursor.rowcount)
+
+    def save_progress(self, job_id: int, progress: dict):
+        """Checkpoint finished steps (e.g. the media UUID) so a retry can skip them."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET progress = ?, updated = ? WHERE id = ?",
+                         (json.dumps(progress, ensure_ascii=False), time.time(), job_id))
+
+    def complete(self, job_id: int, worker: str, result: dict):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("""
+                UPDATE jobs SET state = 'done', result = ?, error = NULL, worker = NULL, lease_until = NULL, updated = ?
+                WHERE id = ? AND worker = ?
+            """, (json.dumps(result, ensure_ascii=False), now, job_id, worker))
+            self._wake_waiting(conn, job_id, now)
+
+    @staticmethod
+    def _wake_waiting(conn: sqlite3.Connection, job_id: int, now: float):
+        """Make the jobs waiting for `job_id` due now."""
+        conn.execute("""
+            UPDATE jobs SET run_after = ? WHERE state = 'queued' AND run_after > ?
+                AND json_extract(progress, '$.waiting_for') = ?
+        """, (now, now, job_id))
+
+    def fail(self, job_id: int, worker: str, error: str, retryable: bool = True):
+        """Record a failed attempt: requeue with backoff, or fail for good."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ?",
+                               (job_id, worker)).fetchone()
+            if row is None:
+                return
+            if retryable and row["attempts"] < row["max_attempts"]:
+                delay = JOB_RETRY_BACKOFF * 2 ** (row["attempts"] - 1)
+                conn.execute("""
+                    UPDATE jobs SET state = 'queued', error = ?, worker = NULL, lease_until = NULL,
+                                    run_after = ?, updated = ?
+                    WHERE id = ?
+                """, (error, now + delay, now, job_id))
+            else:
+                conn.execute("""
+                    UPDATE jobs SET state = 'failed', error = ?, worker = NULL, lease_until = NULL, updated = ?
+                    WHERE id = ?
+                """, (error, now, job_id))
+                self._wake_waiting(conn, job_id, now)
+
+    def release(self, job_id: int, worker: str, delay: float = 0.0):
+        """Hand a job back untouched (the worker is shutting down, or it waits for another job).
+
+        The attempt does not count; the job is due again after `delay` seconds,
+        or at once if the job it waits for has finished in the meantime.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("""
+                UPDATE jobs SET state = 'queued', attempts = attempts - 1, worker = NULL, lease_until = NULL,
+                                run_after = CASE WHEN EXISTS (
+                                    SELECT 1 FROM jobs AS other WHERE other.state IN ('queued', 'running')
+                                        AND other.id = json_extract(jobs.progress, '$.waiting_for')
+                                ) THEN ? ELSE ? END,
+                                updated = ?
+                WHERE id = ? AND worker = ? AND state = 'running'
+            """, (now + delay, now, now, job_id, worker))
+
+    def retry_failed(self) -> int:
+        """Give every failed job a fresh set of attempts."""
+        now = time.time()
+        with self._transaction() as conn:
+            return conn.execute("""
+                UPDATE jobs SET state = 'queued', attempts = 0, error = NULL, worker = NULL, lease_until = NULL,
+                                run_after = ?, updated = ?
+                WHERE state = 'failed'
+            """, (now, now)).rowcount
+
+    def cancel(self, job_id: int) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            cancelled = bool(conn.execute(
+                "UPDATE jobs SET state = 'cancelled', updated = ? WHERE id = ? AND state = 'queued'", (now, job_id)
+            ).rowcount)
+            if cancelled:
+                self._wake_waiting(conn, job_id, now)
+            return cancelled
+
+    def worker_seen(self, worker: str, pid: int, job_id: Optional[int] = None):
+        with self._transaction() as conn:
+            conn.execute("""
+                INSERT INTO workers (name, pid, job_id, last_seen) VALUES (?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET pid = excluded.pid, job_id = excluded.job_id,
+                                                 last_seen = excluded.last_seen
+            """, (worker, pid, job_id, time.time()))
+
+    def worker_gone(self, worker: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM workers WHERE name = ?", (worker,))
+
+    def active_workers(self, within: float = 30) -> list[dict]:
+        """Workers that polled the queue in the last `within` seconds."""
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM workers WHERE last_seen >= ? ORDER BY name",
+                                     (time.time() - within,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, job_ids: list[int]) -> list[dict]:
+        if not job_ids:
+            return []
+        with self._lock:
+            rows = self.conn.execute(f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(job_ids))})",
+                                     job_ids).fetchall()
+        jobs = {row["id"]: self._row(row) for row in rows}
+        return [jobs[i] for i in job_ids if i in jobs]
+
+    def recent(self, limit: int = 100) -> list[dict]:
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
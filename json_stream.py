@@ -0,0 +1,63 @@
+"""
+Incremental parsing of a JSON array of objects arriving in streamed chunks.
+
+Each top-level object is decoded the moment its closing brace arrives, so a
+streamed content plan can fill the table row by row. Text before the opening
+bracket (e.g. a markdown code fence) is ignored.
+"""
+
+import json
+
+
+class JSONArrayStream:
+    """Feed text chunks, get back the objects that were completed by each chunk."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0  # next character of `buffer` to scan
+        self.in_array = False
+        self.depth = 0  # brace depth inside the array
+        self.in_string = False
+        self.escaped = False
+        self.object_start = None
+        self.closed = False  # the top-level array has ended
+
+    def feed(self, chunk: str) -> list[dict]:
+        self.buffer += chunk
+        objects = []
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer) and not self.closed:
+            char = buffer[i]
+            if not self.in_array:
+                if char == "[":
+                    self.in_array = True
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.object_start = i
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0 and self.object_start is not None:
+                    objects.append(json.loads(buffer[self.object_start:i + 1]))
+                    self.object_start = None
+            elif char == "]" and self.depth == 0:
+                self.closed = True
+            i += 1
+
+        # Drop consumed text so the buffer only holds the object in progress
+        keep_from = self.object_start if self.object_start is not None else i
+        self.buffer = buffer[keep_from:]
+        if self.object_start is not None:
+            self.object_start = 0
+        self.pos = i - keep_from
+        return objects
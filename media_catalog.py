@@ -0,0 +1,263 @@
+"""
+Media catalog in SQLite with constant-time random picks of unposted files.
+
+Every unposted item sits in a dense free list per pool (channel + media type):
+slots 0..size-1 of `free_slots`, with the pool sizes kept in `pools`. A pick
+draws a pool by weight, then a random slot, and reads that one row by primary
+key. Claiming moves the pool's last slot into the hole (swap-with-last), so
+the list stays dense and no step ever scans the catalog. Claims happen in a
+`BEGIN IMMEDIATE` transaction, so two runs (or processes) never get the same
+file; a claim that is neither posted nor released expires after
+CLAIM_TIMEOUT and goes back to the free list.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from media_hash import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, is_video
+
+CHANNELS = ["fanvue", "social"]
+# n8n catalog folders and the channel their files are posted to
+FOLDER_CHANNELS = {"nsfw": "fanvue", "socialmedia": "social"}
+CLAIM_TIMEOUT = 2 * 3600  # seconds
+CATALOG_VIDEO_WEIGHT = float(os.getenv("CATALOG_VIDEO_WEIGHT", 1.0))
+
+PPV_WEEKDAY_PRICE = 4.99
+PPV_WEEKEND_PRICE = 6.99
+PPV_EVENING_BONUS = 1.00
+PPV_EVENING_HOURS = range(18, 22)  # 18:00-21:59
+
+
+def ppv_price(when: Optional[datetime] = None) -> float:
+    """Dynamic PPV price: higher on weekends, +1 in the evening."""
+    when = when or datetime.now()
+    price = PPV_WEEKEND_PRICE if when.weekday() >= 5 else PPV_WEEKDAY_PRICE
+    if when.hour in PPV_EVENING_HOURS:
+        price += PPV_EVENING_BONUS
+    return round(price, 2)
+
+
+def pool_name(channel: str, media_type: str) -> str:
+    return f"{channel}:{media_type}"
+
+
+class MediaCatalog:
+    """SQLite-backed catalog; safe to share between threads and processes."""
+
+    def __init__(self, path: Path, claim_timeout: float = CLAIM_TIMEOUT):
+        self.path = path
+        self.claim_timeout = claim_timeout
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS media (
+                    id INTEGER PRIMARY KEY,
+                    file_path TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    media_type TEXT NOT NULL,
+                    source_folder TEXT,
+                    description_fanvue TEXT,
+                    description_social TEXT,
+                    status TEXT NOT NULL DEFAULT 'available',
+                    claim_token TEXT,
+                    claimed_at REAL,
+                    posted_at REAL,
+                    added REAL NOT NULL,
+                    UNIQUE (file_path, channel)
+                );
+                CREATE INDEX IF NOT EXISTS media_claimed ON media (claimed_at) WHERE status = 'claimed';
+                CREATE TABLE IF NOT EXISTS free_slots (
+                    pool TEXT NOT NULL,
+                    slot INTEGER NOT NULL,
+                    media_id INTEGER NOT NULL UNIQUE,
+                    PRIMARY KEY (pool, slot)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS pools (
+                    pool TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL
+                );
+            """)
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    # Free list primitives; callers hold a transaction
+
+    def _push(self, conn: sqlite3.Connection, pool: str, media_id: int):
+        row = conn.execute("SELECT size FROM pools WHERE pool = ?", (pool,)).fetchone()
+        size = row[0] if row else 0
+        conn.execute("INSERT INTO free_slots (pool, slot, media_id) VALUES (?, ?, ?)", (pool, size, media_id))
+        conn.execute("INSERT INTO pools (pool, size) VALUES (?, 1) ON CONFLICT (pool) DO UPDATE SET size = size + 1",
+                     (pool,))
+
+    def _remove_slot(self, conn: sqlite3.Connection, pool: str, slot: int, size: int):
+        """Fill `slot` with the pool's last entry and shrink the pool by one."""
+        last = size - 1
+        conn.execute("DELETE FROM free_slots WHERE pool = ? AND slot = ?", (pool, slot))
+        if slot != last:
+            conn.execute("UPDATE free_slots SET slot = ? WHERE pool = ? AND slot = ?", (slot, pool, last))
+        conn.execute("UPDATE pools SET size = ? WHERE pool = ?", (last, pool))
+
+    def _insert(self, conn: sqlite3.Connection, file_path: str, channel: str, source_folder: str = "",
+                description_fanvue: str = "", description_social: str = "", posted: bool = False) -> bool:
+        media_type = "video" if is_video(file_path) else "image"
+        cursor = conn.execute("""
+            INSERT INTO media (file_path, channel, media_type, source_folder, description_fanvue,
+                               description_social, status, added)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (file_path, channel) DO NOTHING
+        """, (str(file_path), channel, media_type, source_folder, description_fanvue, description_social,
+              "posted" if posted else "available", time.time()))
+        if not cursor.rowcount:
+            return False
+        if not posted:
+            self._push(conn, pool_name(channel, media_type), cursor.lastrowid)
+        return True
+
+    def add(self, file_path: str, channel: str = "fanvue", source_folder: str = "", description_fanvue: str = "",
+            description_social: str = "", posted: bool = False) -> bool:
+        """Add one file; returns False when it is already in the catalog for this channel."""
+        with self._transaction() as conn:
+            return self._insert(conn, file_path, channel, source_folder, description_fanvue, description_social, posted)
+
+    def add_folder(self, folder, channel: str = "fanvue") -> int:
+        """Add every media file of a folder (not recursive); returns how many were new."""
+        folder = Path(folder).expanduser()
+        paths = [str(p) for p in sorted(folder.iterdir())
+                 if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS + IMAGE_EXTENSIONS]
+        with self._transaction() as conn:
+            return sum(self._insert(conn, path, channel, folder.name) for path in paths)
+
+    def import_records(self, records: list[dict]) -> int:
+        """Import rows exported from the n8n `media_catalog` table; returns how many were new."""
+        def flag(value) -> bool:
+            return str(value).lower() in ("true", "1")
+
+        added = 0
+        with self._transaction() as conn:
+            for record in records:
+                channel = FOLDER_CHANNELS.get(record.get("source_folder") or "", "fanvue")
+                posted_key = "added_to_social_media" if channel == "social" else "added_to_fanvue"
+                added += self._insert(conn, record["file_path"], channel, record.get("source_folder") or "",
+                                      record.get("description_fanvue") or "", record.get("description_social") or "",
+                                      posted=flag(record.get(posted_key)))
+        return added
+
+    def available(self, channel: str = "fanvue") -> dict[str, int]:
+        """Unposted items per media type, read from the pool sizes."""
+        rows = self.conn.execute("SELECT pool, size FROM pools WHERE pool LIKE ?", (f"{channel}:%",)).fetchall()
+        return {pool.split(":", 1)[1]: size for pool, size in rows}
+
+    def backlog(self) -> dict:
+        """Remaining media in the shape analytics.weekly_stats expects."""
+        # Rows are never deleted, so the largest rowid is the row count without a scan
+        total = self.conn.execute("SELECT MAX(id) FROM media").fetchone()[0] or 0
+        return {
+            "remaining_fanvue": sum(self.available("fanvue").values()),
+            "remaining_social": sum(self.available("social").values()),
+            "total_media": total
+        }
+
+    def claim(self, channel: str = "fanvue", weights: Optional[dict[str, float]] = None,
+              rng: random.Random = random) -> Optional[dict]:
+        """Atomically take one random unposted item, or None when the channel has none left.
+
+        `weights` scale the per-item chance by media type, e.g. {"video": 2}
+        makes every video (the PPV posts) twice as likely as an image. The
+        returned dict carries `claim_token`, `is_ppv` and `ppv_price`.
+        """
+        if weights is None:
+            weights = {"video": CATALOG_VIDEO_WEIGHT}
+        self.release_expired()
+        with self._transaction() as conn:
+            pools = conn.execute("SELECT pool, size FROM pools WHERE pool LIKE ? AND size > 0",
+                                 (f"{channel}:%",)).fetchall()
+            if not pools:
+                return None
+            # P(pool) is proportional to weight x size, so items within a pool stay uniform
+            pool_weights = [weights.get(pool.split(":", 1)[1], 1.0) * size for pool, size in pools]
+            if not any(pool_weights):
+                pool_weights = [size for _, size in pools]
+            pool, size = rng.choices(pools, weights=pool_weights)[0]
+            slot = rng.randrange(size)
+            media_id = conn.execute("SELECT media_id FROM free_slots WHERE pool = ? AND slot = ?",
+                                    (pool, slot)).fetchone()[0]
+            self._remove_slot(conn, pool, slot, size)
+            token = uuid.uuid4().hex
+            conn.execute("UPDATE media SET status = 'claimed', claim_token = ?, claimed_at = ? WHERE id = ?",
+                         (token, time.time(), media_id))
+            row = conn.execute("""SELECT id, file_path, channel, media_type, source_folder, description_fanvue,
+                                         description_social FROM media WHERE id = ?""", (media_id,)).fetchone()
+
+        item = dict(zip(["id", "file_path", "channel", "media_type", "source_folder", "description_fanvue",
+                         "description_social"], row))
+        item["claim_token"] = token
+        item["is_ppv"] = item["media_type"] == "video"
+        item["ppv_price"] = ppv_price() if item["is_ppv"] else 0
+        item["available"] = size - 1 + sum(s for p, s in pools if p != pool)
+        return item
+
+    def mark_posted(self, media_id: int, claim_token: str) -> bool:
+        """Finish a claim; False if the claim expired and the item went back to the pool."""
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE media SET status = 'posted', posted_at = ?, claim_token = NULL, claimed_at = NULL
+                WHERE id = ? AND status = 'claimed' AND claim_token = ?
+            """, (time.time(), media_id, claim_token))
+            return bool(cursor.rowcount)
+
+    def drop(self, media_id: int, claim_token: str) -> bool:
+        """Retire a claimed item that cannot be posted (e.g. the file is gone) without returning it."""
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE media SET status = 'missing', claim_token = NULL, claimed_at = NULL
+                WHERE id = ? AND status = 'claimed' AND claim_token = ?
+            """, (media_id, claim_token))
+            return bool(cursor.rowcount)
+
+    def release(self, media_id: int, claim_token: str) -> bool:
+        """Give a claimed item back (e.g. after a failed upload)."""
+        with self._transaction() as conn:
+            return self._release(conn, media_id, claim_token)
+
+    def _release(self, conn: sqlite3.Connection, media_id: int, claim_token: str) -> bool:
+        row = conn.execute("SELECT channel, media_type FROM media WHERE id = ? AND status = 'claimed' AND claim_token = ?",
+                           (media_id, claim_token)).fetchone()
+        if not row:
+            return False
+        conn.execute("UPDATE media SET status = 'available', claim_token = NULL, claimed_at = NULL WHERE id = ?",
+                     (media_id,))
+        self._push(conn, pool_name(*row), media_id)
+        return True
+
+    def release_expired(self) -> int:
+        """Return claims older than `claim_timeout` to the free list (partial index on claimed rows)."""
+        cutoff = time.time() - self.claim_timeout
+        with self._transaction() as conn:
+            expired = conn.execute("SELECT id, claim_token FROM media WHERE status = 'claimed' AND claimed_at < ?",
+                                   (cutoff,)).fetchall()
+            return sum(self._release(conn, media_id, token) for media_id, token in expired)
@@ -0,0 +1,39 @@
+"""
+Media file helpers: type detection by extension and content hashes memoized
+per (path, size, mtime) so repeated lookups of the same file do not re-read it.
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+
+HASH_CHUNK = 1024 * 1024
+
+VIDEO_EXTENSIONS = [".mp4", ".mov", ".avi", ".webm"]
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".gif", ".webp"]
+
+_memo: dict[tuple, str] = {}
+_memo_lock = threading.Lock()
+
+
+def is_video(file_path) -> bool:
+    return Path(file_path).suffix.lower() in VIDEO_EXTENSIONS
+
+
+def file_sha256(file_path) -> str:
+    """SHA-256 of the file content, streamed in 1 MB chunks."""
+    file_path = Path(file_path)
+    stat = file_path.stat()
+    memo_key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _memo_lock:
+        if memo_key in _memo:
+            return _memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+
+    with _memo_lock:
+        _memo[memo_key] = digest.hexdigest()
+    return _memo[memo_key]
@@ -0,0 +1,217 @@
+"""
+Duplicate detection for media before it is uploaded or captioned.
+
+Every file the app uploads (or captions) is recorded with its SHA-256 and a
+64-bit difference hash (dHash): the image is shrunk to 9x8 grey pixels and
+each bit says whether a pixel is brighter than its right neighbour. Re-saving,
+recompressing or resizing a shot flips only a few bits, so two files whose
+hashes differ in at most NEAR_DUPLICATE_DISTANCE bits show the same picture.
+Videos are hashed from one keyframe in the middle (needs ffmpeg).
+
+Exact matches map straight to the media UUID from the first upload. Near
+matches are found with a multi-index hash table (see HammingIndex), so a
+lookup compares against a few candidates instead of every indexed file.
+"""
+
+import io
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from media_hash import file_sha256, is_video
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("MEDIA_NEAR_DUPLICATE_DISTANCE", 8))  # of 64 bits
+DHASH_SIZE = 8
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def dhash_image(image: "Image.Image") -> int:
+    """64-bit difference hash of a PIL image."""
+    image = ImageOps.exif_transpose(image).convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE), Image.LANCZOS)
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(DHASH_SIZE):
+        for col in range(DHASH_SIZE):
+            left = pixels[row * (DHASH_SIZE + 1) + col]
+            right = pixels[row * (DHASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def perceptual_hash(file_path) -> Optional[int]:
+    """dHash of an image, or of the middle keyframe of a video; None when it cannot be computed."""
+    if not PIL_AVAILABLE:
+        return None
+    file_path = Path(file_path)
+    try:
+        if is_video(file_path):
+            from video_frames import extract_frame, ffmpeg_available, probe_duration
+            if not ffmpeg_available():
+                return None
+            duration = probe_duration(file_path)
+            frame = extract_frame(file_path, (duration or 0) / 2, size=64)
+            if not frame:
+                return None
+            with Image.open(io.BytesIO(frame)) as image:
+                return dhash_image(image)
+        with Image.open(file_path) as image:
+            # The JPEG decoder can skip straight to 1/8 scale; 9x8 pixels need no more
+            image.draft("RGB", (64, 64))
+            return dhash_image(image)
+    except Exception:
+        return None
+
+
+class HammingIndex:
+    """Multi-index hashing over 64-bit hashes, split into BLOCKS 16-bit blocks.
+
+    Two hashes at most `radius` bits apart differ in at most radius // BLOCKS
+    bits of at least one block (pigeonhole), so a search looks up only the
+    entries whose block is that close to the query's, in each block's table.
+    """
+
+    BLOCKS = 4
+    BLOCK_BITS = 16
+
+    def __init__(self):
+        self.tables: list[dict[int, list[tuple[int, str]]]] = [{} for _ in range(self.BLOCKS)]
+        self.size = 0
+        self._flips: dict[int, list[int]] = {}
+
+    def _blocks(self, value: int):
+        mask = (1 << self.BLOCK_BITS) - 1
+        return ((value >> (i * self.BLOCK_BITS)) & mask for i in range(self.BLOCKS))
+
+    def _flip_masks(self, bits: int) -> list[int]:
+        """Every block mask with at most `bits` bits set."""
+        if bits not in self._flips:
+            self._flips[bits] = [m for m in range(1 << self.BLOCK_BITS) if bin(m).count("1") <= bits]
+        return self._flips[bits]
+
+    def add(self, value: int, key: str):
+        self.size += 1
+        for table, block in zip(self.tables, self._blocks(value)):
+            table.setdefault(block, []).append((value, key))
+
+    def search(self, value: int, radius: int) -> list[tuple[int, str]]:
+        """(distance, key) of every entry within `radius` bits, nearest first."""
+        flips = self._flip_masks(radius // self.BLOCKS)
+        seen, found = set(), []
+        for table, block in zip(self.tables, self._blocks(value)):
+            for flip in flips:
+                for other, key in table.get(block ^ flip, ()):
+                    if key not in seen:
+                        seen.add(key)
+                        distance = hamming(value, other)
+                        if distance <= radius:
+                            found.append((distance, key))
+        return sorted(found)
+
+
+@dataclass
+class MediaMatch:
+    kind: str  # "exact" or "near"
+    sha256: str
+    media_uuid: Optional[str]
+    file_name: str
+    distance: int = 0
+
+
+class MediaIndex:
+    """SQLite-backed hash index shared by the UI and the worker processes.
+
+    The hash tables live in memory and are topped up from rows other processes
+    added since the last lookup (rowid watermark), so it is never rebuilt.
+    """
+
+    def __init__(self, path: Path, radius: int = NEAR_DUPLICATE_DISTANCE):
+        self.path = path
+        self.radius = radius
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._near = HammingIndex()
+        self._watermark = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS media_index (
+                    sha256 TEXT PRIMARY KEY,
+                    phash INTEGER,
+                    media_uuid TEXT,
+                    file_name TEXT,
+                    created REAL NOT NULL
+                )
+            """)
+        return self._conn
+
+    def _sync_near(self):
+        """Add rows inserted since the last sync; caller holds the lock."""
+        rows = self.conn.execute("SELECT rowid, sha256, phash FROM media_index WHERE rowid > ? ORDER BY rowid",
+                                 (self._watermark,)).fetchall()
+        for rowid, sha256, phash in rows:
+            if phash is not None:
+                # SQLite integers are signed 64-bit
+                self._near.add(phash & 0xFFFFFFFFFFFFFFFF, sha256)
+            self._watermark = rowid
+
+    def _row(self, sha256: str) -> Optional[tuple]:
+        return self.conn.execute("SELECT media_uuid, file_name FROM media_index WHERE sha256 = ?",
+                                 (sha256,)).fetchone()
+
+    def hashes(self, file_path) -> tuple[str, Optional[int]]:
+        return file_sha256(file_path), perceptual_hash(file_path)
+
+    def find(self, file_path, uploaded_only: bool = True) -> Optional[MediaMatch]:
+        """Closest indexed file: the exact same content first, else the nearest similar one.
+
+        With `uploaded_only` only files that have a media UUID count.
+        """
+        sha256 = file_sha256(file_path)
+        with self._lock:
+            row = self._row(sha256)
+            if row and (row[0] or not uploaded_only):
+                return MediaMatch("exact", sha256, row[0], row[1] or "")
+            phash = perceptual_hash(file_path)
+            if phash is None:
+                return None
+            self._sync_near()
+            for distance, other in self._near.search(phash, self.radius):
+                if other == sha256:
+                    continue
+                other_row = self._row(other)
+                if other_row and (other_row[0] or not uploaded_only):
+                    return MediaMatch("near", other, other_row[0], other_row[1] or "", distance)
+        return None
+
+    def record(self, file_path, media_uuid: Optional[str] = None):
+        """Index a file, optionally with the media UUID it was uploaded as."""
+        sha256, phash = self.hashes(file_path)
+        signed = None if phash is None else phash - (1 << 64) if phash >= 1 << 63 else phash
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO media_index (sha256, phash, media_uuid, file_name, created) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (sha256) DO UPDATE SET media_uuid = COALESCE(excluded.media_uuid, media_uuid),
+                                                   file_name = excluded.file_name
+            """, (sha256, signed, media_uuid, Path(file_path).name, time.time()))
+
+    def forget_media(self, media_uuid: str):
+        """Drop a media UUID that no longer exists on Fanvue; the hashes stay indexed."""
+        with self._lock:
+            self.conn.execute("UPDATE media_index SET media_uuid = NULL WHERE media_uuid = ?", (media_uuid,))
@@ -0,0 +1,287 @@
+"""
+In-process metrics for the hot paths: uploads, captions and posts.
+
+Counters, gauges and histograms live in one registry and are rendered in the
+Prometheus text format (`render()`), served at GET /metrics by api.py and,
+with METRICS_PORT set, by the Gradio app and every worker process.
+
+`span(stage)` times one step of the pipeline into the `fanvue_stage_seconds`
+histogram. With METRICS_TRACE_FILE set every span is also appended to that
+file as one JSON line, for following a single slow upload part by part.
+
+Recording a span costs a few microseconds against the milliseconds of the
+request it times, cheap enough to leave on in production (see
+benchmarks/bench_metrics.py).
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+# Local only by default, like api.py; 0.0.0.0 lets a Prometheus on another machine scrape it
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_TRACE_FILE = os.getenv("METRICS_TRACE_FILE", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+THROUGHPUT_BUCKETS = tuple(2.0 ** n for n in range(16, 31))  # 64 KiB/s .. 1 GiB/s
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: dict[str, "Metric"] = {}
+_registry_lock = threading.Lock()
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """One metric family; every combination of label values is its own series."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if not self.labels:
+            return ()
+        return tuple([str(labels[name]) for name in self.labels])
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        """(suffix, label text, value) of every series."""
+        with self._lock:
+            return [("", label_text(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{suffix}{labels} {format_value(value)}" for suffix, labels, value in self.samples()]
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down; with `function` it is read at scrape time instead.
+
+    `function()` returns the value, or a dict of label values tuple -> value.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), function: Optional[Callable] = None):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        if self.function is None:
+            return super().samples()
+        try:
+            value = self.function()
+        except Exception:
+            return []  # a failing source must not break the whole scrape
+        if not isinstance(value, dict):
+            return [("", "", value)]
+        return [("", label_text(self.labels, key), v) for key, v in sorted(value.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (made cumulative when rendered), then sum and count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._values.items())]
+        samples = []
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                samples.append(("_bucket", label_text(self.labels, key, f'le="{format_value(bound)}"'), cumulative))
+            samples.append(("_sum", label_text(self.labels, key), total))
+            samples.append(("_count", label_text(self.labels, key), count))
+        return samples
+
+
+def register(metric: Metric) -> Metric:
+    """Add a metric to the registry; registering a name twice returns the first one."""
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = register(Histogram(
+    "fanvue_stage_seconds", "Duration of one pipeline step (see metrics.span).", ("stage", "outcome")))
+UPLOAD_BYTES = register(Counter(
+    "fanvue_upload_bytes_total", "Bytes of media PUT to S3 in successful parts."))
+UPLOAD_PART_THROUGHPUT = register(Histogram(
+    "fanvue_upload_part_bytes_per_second", "Throughput of each S3 part PUT.", buckets=THROUGHPUT_BUCKETS))
+RETRIES = register(Counter(
+    "fanvue_retries_total", "Requests sent again after a failure.", ("operation", "reason")))
+HTTP_RESPONSES = register(Counter(
+    "fanvue_http_responses_total", "Fanvue API responses by status code.", ("method", "status")))
+MEDIA_REUSED = register(Counter(
+    "fanvue_media_dedup_total", "Uploads skipped because the file was sent before.", ("match",)))
+TOKEN_REFRESHES = register(Counter(
+    "fanvue_token_refresh_total", "OAuth token renewals.", ("result",)))
+OPENAI_TOKENS = register(Counter(
+    "openai_tokens_total", "Tokens billed by OpenAI.", ("operation", "kind")))
+QUEUE_DEPTH = register(Gauge(
+    "fanvue_queue_depth", "Items waiting in the in-process batch queues.", ("queue",)))
+
+
+def count_tokens(operation: str, usage) -> int:
+    """Record an OpenAI `usage` object (or None) and return its total."""
+    if usage is None:
+        return 0
+    OPENAI_TOKENS.inc(usage.prompt_tokens, operation=operation, kind="prompt")
+    OPENAI_TOKENS.inc(usage.completion_tokens, operation=operation, kind="completion")
+    return usage.total_tokens
+
+
+class TraceLog:
+    """Append-only JSON lines file, one line per finished span."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+trace_log = TraceLog(METRICS_TRACE_FILE) if METRICS_TRACE_FILE else None
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """Time the block into fanvue_stage_seconds{stage, outcome}.
+
+    Yields `attrs`, so the block can add details (bytes, status) for the trace
+    log. An exception marks the span as failed and is re-raised; a block that
+    handles its own failure can set `attrs["outcome"]` instead.
+    """
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        # A generator closed early (a stream the caller stopped reading) was cancelled, not failed
+        attrs.setdefault("outcome", "cancelled" if isinstance(e, GeneratorExit) else "error")
+        attrs.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        outcome = attrs.pop("outcome", "ok")
+        STAGE_SECONDS.observe(seconds, stage=stage, outcome=outcome)
+        if trace_log is not None:
+            trace_log.write({"ts": round(time.time() - seconds, 6), "span": stage, "seconds": round(seconds, 6),
+                             "outcome": outcome, "pid": os.getpid(), "thread": threading.current_thread().name,
+                             **attrs})
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """Serve GET /metrics on a background thread; nothing happens with port 0."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        # A second app or worker set on the same ports still runs, just without its own endpoint
+        print(f"Metryki niedostepne na porcie {port}: {e}", flush=True)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
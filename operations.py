@@ -0,0 +1,316 @@
+"""
+Operations shared by the command line (cli.py) and the HTTP API (api.py).
+
+Every operation is a generator of progress events: plain dicts with an
+"event" key ("start", "file", "progress", "queued", "done" or "error") that
+both front ends write out as NDJSON, one JSON object per line. The last
+event is always "done" or "error"; "done" carries `failed`, the number of
+files or posts that did not go through.
+
+Arguments mirror the Gradio tabs: audience accepts the API value
+(`everyone`, `followers-and-subscribers`, `subscribers-only`) or the UI
+label, creators are UUIDs (default: the active creator).
+"""
+
+import asyncio
+import csv
+import inspect
+import json
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import core
+from bulk_caption import CAPTION_CONCURRENCY, CAPTION_TOKENS_PER_MINUTE, caption_files
+from post_store import AUDIENCE_LABELS
+
+DEFAULT_AUDIENCE = "followers-and-subscribers"
+
+
+class OperationError(Exception):
+    """Invalid arguments or missing setup; reported before any work starts."""
+
+
+def audience_label(audience: str) -> str:
+    """The UI label submit_post expects, from an API value or a label."""
+    audience = (audience or DEFAULT_AUDIENCE).strip()
+    if audience in AUDIENCE_LABELS:
+        return AUDIENCE_LABELS[audience]
+    if audience in AUDIENCE_LABELS.values():
+        return audience
+    raise OperationError(f"Nieznani odbiorcy: {audience} (dozwolone: {', '.join(AUDIENCE_LABELS)})")
+
+
+def require_login():
+    if not core.state.is_authenticated():
+        raise OperationError("Najpierw zaloguj sie (cli.py login)!")
+
+
+def require_openai():
+    if not core.state.openai_api_key:
+        raise OperationError("Brak OPENAI_API_KEY w srodowisku lub w .env")
+
+
+def media_files(folder: str) -> list[str]:
+    if not Path(folder).expanduser().is_dir():
+        raise OperationError(f"Folder nie istnieje: {folder}")
+    paths = core.collect_media_files(folder=folder)
+    if not paths:
+        raise OperationError(f"Brak plikow mediow w folderze: {folder}")
+    return paths
+
+
+def login(token: str, refresh_token: str = "") -> Iterator[dict]:
+    message = core.authenticate_with_token(token, refresh_token)
+    if not core.state.creator_uuid:
+        yield {"event": "error", "message": message}
+        return
+    yield {"event": "done", "failed": 0, "message": message, "creator": core.state.creator_uuid,
+           "creators": core.state.creators}
+
+
+def upload(file: str, allow_similar: bool = False) -> Iterator[dict]:
+    require_login()
+    started = time.perf_counter()
+    media_uuid, message = core.upload_media(file, allow_similar=allow_similar)
+    error = core.wait_for_media(media_uuid) if media_uuid else message
+    yield {"event": "done", "failed": int(error is not None), "file": file, "media_uuid": media_uuid or "",
+           "message": error or message, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def caption_media(file: str, style: str, prompt: str = "", force: bool = False) -> Iterator[dict]:
+    require_openai()
+    text = ""
+    for text in core.iter_caption(file, style, prompt, force, video=core.is_video(file)):
+        pass
+    failed = not text or text.startswith("Blad")
+    yield {"event": "done", "failed": int(failed), "file": file, "caption": text}
+
+
+def post(file: str = "", caption: str = "", style: str = "", prompt: str = "", audience: str = DEFAULT_AUDIENCE,
+         scheduled_at: str = "", price: Optional[float] = None, creator: str = "", media_uuid: str = "",
+         allow_similar: bool = False) -> Iterator[dict]:
+    """One post from a file (uploaded first) or an uploaded `media_uuid`, captioned by AI when `style` is given."""
+    require_login()
+    label = audience_label(audience)
+    caption_source = ""
+    if not caption.strip():
+        if not style or not file:
+            raise OperationError("Podaj caption albo styl opisu AI i plik")
+        require_openai()
+        for event in caption_media(file, style, prompt):
+            if event["failed"]:
+                yield {"event": "error", "message": event["caption"]}
+                return
+            caption, caption_source = event["caption"], "ai-live"
+        yield {"event": "progress", "step": "caption", "caption": caption}
+    if file and not media_uuid:
+        for event in upload(file, allow_similar):
+            if event["failed"]:
+                yield {**event, "event": "error"}
+                return
+            media_uuid = event["media_uuid"]
+            yield {**event, "event": "progress", "step": "upload"}
+    post_uuid, message = core.submit_post(caption, media_uuid, label, scheduled_at,
+                                          caption_source, Path(file).name if file else "",
+                                          price=price, creator_uuid=creator or None)
+    yield {"event": "done", "failed": int(post_uuid is None), "post_uuid": post_uuid or "",
+           "media_uuid": media_uuid, "message": message.replace("\n", " ")}
+
+
+def batch_events(paths: list[str], caption: str, audience: str, concurrency: int, creators: list[str],
+                 allow_similar: bool, posts_fields: Optional[list[dict]] = None) -> Iterator[dict]:
+    """Run iter_batch_publish and turn its updates into "file" events and a final "done"."""
+    started = time.perf_counter()
+    yield {"event": "start", "files": len(paths), "creators": creators}
+    ok = failed = 0
+    for index, status, media_uuid, message, seconds in core.iter_batch_publish(
+            paths, caption, audience, concurrency, creators, allow_similar, posts_fields):
+        if status == "ok":
+            ok += 1
+        elif status == "blad":
+            failed += 1
+        yield {"event": "file", "file": paths[index // len(creators)], "creator": creators[index % len(creators)],
+               "status": status, "media_uuid": media_uuid, "message": message, "seconds": round(seconds, 2)}
+    yield {"event": "done", "ok": ok, "failed": failed, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def queue_events(rows: list[dict], creators: list[str], allow_similar: bool) -> Iterator[dict]:
+    """Hand posts to the job queue instead of publishing them here; returns at once."""
+    jobs = []
+    for row in rows:
+        for creator in creators:
+            job_id, created = core.enqueue_publish(row["file"], row.get("caption", ""), row["audience"],
+                                                   row.get("style", ""), row.get("prompt", ""), creator,
+                                                   allow_similar, row.get("scheduled_at", ""), row.get("price"))
+            jobs.append(job_id)
+            yield {"event": "queued", "file": row["file"], "creator": creator, "job_id": job_id, "created": created}
+    note = core.workers_note().strip()
+    yield {"event": "done", "failed": 0, "jobs": jobs, **({"message": note} if note else {})}
+
+
+def post_dir(folder: str, caption: str = "", style: str = "", prompt: str = "", audience: str = DEFAULT_AUDIENCE,
+             concurrency: int = core.BATCH_CONCURRENCY, creators: Optional[list[str]] = None,
+             allow_similar: bool = False, queued: bool = False) -> Iterator[dict]:
+    """Upload and post every media file in a folder, to one or more creators.
+
+    With `queued` the files go to the job queue (worker.py) and may be
+    captioned there by AI in `style`; otherwise every post gets `caption`.
+    """
+    require_login()
+    label = audience_label(audience)
+    paths = media_files(folder)
+    creators = creators or [core.state.creator_uuid]
+    if queued:
+        if not caption.strip() and not style:
+            raise OperationError("Podaj caption albo styl opisu AI")
+        rows = [{"file": p, "caption": caption, "style": style, "prompt": prompt, "audience": label} for p in paths]
+        yield from queue_events(rows, creators, allow_similar)
+        return
+    if not caption.strip():
+        raise OperationError("Podaj caption (opisy AI dla calego folderu: caption-dir, potem schedule z CSV)")
+    yield from batch_events(paths, caption, label, int(concurrency), creators, allow_similar)
+
+
+async def caption_rows(paths: list[str], style: str, prompt: str, csv_path: Path, concurrency: int,
+                       tokens_per_minute: int):
+    from openai import AsyncOpenAI
+
+    # max_retries=0: backoff is handled per request by bulk_caption
+    async with AsyncOpenAI(api_key=core.state.openai_api_key, max_retries=0) as client:
+        async for row in caption_files(client, paths, style, prompt, csv_path, core.OPENAI_MODEL, concurrency,
+                                       tokens_per_minute, core.caption_cache, core.IMAGE_CACHE_DIR):
+            yield row
+
+
+def caption_dir(folder: str, style: str, prompt: str = "", csv_name: str = "opisy.csv",
+                concurrency: int = CAPTION_CONCURRENCY,
+                tokens_per_minute: int = CAPTION_TOKENS_PER_MINUTE) -> Iterator[dict]:
+    """AI captions for every media file in a folder, written to a CSV in opisy/ that `schedule` reads.
+
+    Rerunning with the same CSV skips files that already have a caption.
+    """
+    require_openai()
+    paths = media_files(folder)
+    csv_path = core.CAPTIONS_DIR / (Path(csv_name.strip() or "opisy.csv").stem + ".csv")
+    started = time.perf_counter()
+    yield {"event": "start", "files": len(paths), "csv": str(csv_path)}
+
+    failed = tokens = 0
+    loop = asyncio.new_event_loop()
+    rows = caption_rows(paths, style, prompt, csv_path, int(concurrency), int(tokens_per_minute))
+    try:
+        while True:
+            try:
+                row = loop.run_until_complete(rows.__anext__())
+            except StopAsyncIteration:
+                break
+            tokens += int(row["tokens"] or 0)
+            failed += row["status"] in ("blad", "odmowa")
+            yield {"event": "file", **row}
+    finally:
+        loop.run_until_complete(rows.aclose())
+        loop.close()
+    yield {"event": "done", "failed": failed, "tokens": tokens, "csv": str(csv_path),
+           "seconds": round(time.perf_counter() - started, 2)}
+
+
+def read_schedule(csv_path: str, audience: str) -> list[dict]:
+    """Rows of a schedule CSV: `file` and `caption`, optionally `scheduled_at`, `audience` and `price`.
+
+    A caption-dir CSV works as is (rows whose caption failed are skipped);
+    relative file paths are resolved against the CSV's folder.
+    """
+    path = Path(csv_path).expanduser()
+    if not path.is_file():
+        raise OperationError(f"Plik CSV nie istnieje: {csv_path}")
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            if row.get("status") in ("blad", "odmowa") or not (row.get("file") or "").strip():
+                continue
+            file = Path(row["file"].strip()).expanduser()
+            if not file.is_absolute():
+                file = path.parent / file
+            if not (row.get("caption") or "").strip():
+                raise OperationError(f"{path.name}:{line}: brak caption dla {file.name}")
+            price = (row.get("price") or "").strip()
+            rows.append({
+                "file": str(file),
+                "caption": row["caption"].strip(),
+                "audience": audience_label(row.get("audience") or audience),
+                "scheduled_at": (row.get("scheduled_at") or "").strip(),
+                **({"price": float(price)} if price else {})
+            })
+    if not rows:
+        raise OperationError(f"Brak wierszy do publikacji w {path.name}")
+    return rows
+
+
+def schedule(csv_path: str, audience: str = DEFAULT_AUDIENCE, concurrency: int = core.BATCH_CONCURRENCY,
+             creators: Optional[list[str]] = None, allow_similar: bool = False,
+             queued: bool = False) -> Iterator[dict]:
+    """Publish (or schedule, via `scheduled_at`) one post per CSV row."""
+    require_login()
+    rows = read_schedule(csv_path, audience)
+    creators = creators or [core.state.creator_uuid]
+    if queued:
+        yield from queue_events(rows, creators, allow_similar)
+        return
+    fields = [{k: v for k, v in row.items() if k != "file"} for row in rows]
+    yield from batch_events([row["file"] for row in rows], "", "", int(concurrency), creators, allow_similar,
+                            fields)
+
+
+def ideas(niche: str, days: int = 7, seasonal: bool = True, ppv: bool = True, export: bool = False) -> Iterator[dict]:
+    """Content plan for `days` days, streamed as the days come in; `export` also writes it to pomysly/."""
+    require_openai()
+    rows, ideas_json, status = [], "[]", ""
+    for rows, ideas_json, status in core.generate_content_ideas(niche, days, seasonal, ppv):
+        yield {"event": "progress", "days": len(rows), "message": status}
+    plan = json.loads(ideas_json)
+    if not plan:
+        yield {"event": "error", "message": status}
+        return
+    done = {"event": "done", "failed": int(days) - len(plan), "message": status, "ideas": plan}
+    if export:
+        done["csv"] = core.export_ideas_csv(ideas_json)
+    yield done
+
+
+OPERATIONS = {
+    "login": login,
+    "upload": upload,
+    "caption": caption_media,
+    "post": post,
+    "post-dir": post_dir,
+    "caption-dir": caption_dir,
+    "schedule": schedule,
+    "ideas": ideas,
+}
+
+
+def check_arguments(name: str, kwargs: dict) -> Optional[str]:
+    """Error message for an unknown operation or arguments it does not take, else None."""
+    operation = OPERATIONS.get(name)
+    if operation is None:
+        return f"Nieznana operacja: {name} (dostepne: {', '.join(OPERATIONS)})"
+    try:
+        inspect.signature(operation).bind(**kwargs)
+    except TypeError as e:
+        return f"Bledne argumenty {name}: {e}"
+    return None
+
+
+def run(name: str, **kwargs) -> Iterator[dict]:
+    """Events of an operation; bad arguments and failures come out as an "error" event."""
+    error = check_arguments(name, kwargs)
+    if error:
+        yield {"event": "error", "message": error}
+        return
+    try:
+        yield from OPERATIONS[name](**kwargs)
+    except OperationError as e:
+        yield {"event": "error", "message": str(e)}
+    except Exception as e:
+        yield {"event": "error", "message": f"Blad: {str(e)}"}
@@ -0,0 +1,234 @@
+"""
+Local SQLite index of published posts.
+
+`sync` walks `/creators/{uuid}/posts` newest-first and stops at the first page
+that reaches posts already stored, so a refresh only transfers what is new.
+The history view then pages and filters from the local indexes.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from metrics import span
+
+SYNC_PAGE_SIZE = 50
+SYNC_MAX_PAGES = 2000  # safety stop for a runaway cursor
+
+AUDIENCE_LABELS = {
+    "everyone": "Wszyscy (publiczny)",
+    "followers-and-subscribers": "Obserwujacy i subskrybenci",
+    "subscribers-only": "Tylko subskrybenci"
+}
+
+
+def post_media_type(post: dict) -> str:
+    """'video', 'image', 'text' or whatever the first attached media reports."""
+    media = post.get("media") or post.get("mediaItems") or []
+    if media and isinstance(media, list) and isinstance(media[0], dict):
+        return media[0].get("mediaType") or media[0].get("type") or "image"
+    if post.get("mediaType"):
+        return post["mediaType"]
+    return "image" if post.get("mediaUuids") else "text"
+
+
+class PostStore:
+    """Thread-safe post index; one SQLite file shared by all creators."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS posts (
+                    uuid TEXT PRIMARY KEY,
+                    creator_uuid TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    audience TEXT,
+                    media_type TEXT,
+                    text TEXT,
+                    price REAL,
+                    raw TEXT,
+                    caption_source TEXT,
+                    file_name TEXT
+                );
+                CREATE INDEX IF NOT EXISTS posts_created ON posts (creator_uuid, created_at);
+                CREATE INDEX IF NOT EXISTS posts_audience ON posts (creator_uuid, audience, created_at);
+                CREATE INDEX IF NOT EXISTS posts_media_type ON posts (creator_uuid, media_type, created_at);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    creator_uuid TEXT PRIMARY KEY,
+                    newest_created_at TEXT,
+                    last_sync REAL
+                );
+            """)
+            # Stores created before posts carried their local-only fields
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(posts)")}
+            for column in ("caption_source", "file_name"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE posts ADD COLUMN {column} TEXT")
+        return self._conn
+
+    def upsert(self, creator_uuid: str, posts: list[dict]) -> int:
+        """Insert or refresh posts as returned by the API; returns how many were new.
+
+        `captionSource` and `fileName` are local-only keys set when the app
+        publishes a post; an API refresh keeps them.
+        """
+        rows = []
+        for post in posts:
+            if not post.get("uuid"):
+                continue
+            rows.append((
+                post["uuid"],
+                creator_uuid,
+                post.get("createdAt") or post.get("publishedAt") or post.get("scheduledAt") or "",
+                post.get("audience"),
+                post_media_type(post),
+                post.get("text"),
+                post.get("price"),
+                json.dumps(post, ensure_ascii=False),
+                post.get("captionSource"),
+                post.get("fileName")
+            ))
+        with self._lock, self.conn:
+            known = {
+                row[0] for row in self.conn.execute(
+                    f"SELECT uuid FROM posts WHERE uuid IN ({','.join('?' * len(rows))})", [r[0] for r in rows]
+                )
+            } if rows else set()
+            self.conn.executemany("""
+                INSERT INTO posts (uuid, creator_uuid, created_at, audience, media_type, text, price, raw,
+                                   caption_source, file_name)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (uuid) DO UPDATE SET
+                    created_at = excluded.created_at, audience = excluded.audience,
+                    media_type = excluded.media_type, text = excluded.text,
+                    price = excluded.price, raw = excluded.raw,
+                    caption_source = COALESCE(excluded.caption_source, posts.caption_source),
+                    file_name = COALESCE(excluded.file_name, posts.file_name)
+            """, rows)
+        return len(rows) - len(known)
+
+    def newest_created_at(self, creator_uuid: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT newest_created_at FROM sync_state WHERE creator_uuid = ?", (creator_uuid,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _mark_synced(self, creator_uuid: str):
+        with self._lock, self.conn:
+            newest = self.conn.execute(
+                "SELECT MAX(created_at) FROM posts WHERE creator_uuid = ?", (creator_uuid,)
+            ).fetchone()[0]
+            self.conn.execute("""
+                INSERT INTO sync_state (creator_uuid, newest_created_at, last_sync) VALUES (?, ?, ?)
+                ON CONFLICT (creator_uuid) DO UPDATE SET
+                    newest_created_at = excluded.newest_created_at, last_sync = excluded.last_sync
+            """, (creator_uuid, newest, time.time()))
+
+    def sync(self, api, creator_uuid: str, full: bool = False, page_size: int = SYNC_PAGE_SIZE) -> int:
+        """Fetch posts newer than the last sync (or everything with `full`); returns new post count.
+
+        Follows `pagination.nextCursor` when the API returns one and falls back to
+        page numbers with `pagination.hasMore` otherwise.
+        """
+        newest = None if full else self.newest_created_at(creator_uuid)
+        params = {"limit": page_size, "size": page_size}
+        page = 1
+        new_posts = 0
+
+        for _ in range(SYNC_MAX_PAGES):
+            with span("history.page", cursor=params.get("cursor"), page=params.get("page")) as trace:
+                response = api.get(f"/creators/{creator_uuid}/posts", params=params)
+                if response.status_code != 200:
+                    trace.update(outcome="error", status=response.status_code)
+            if response.status_code != 200:
+                raise RuntimeError(f"Blad pobierania postow: {response.status_code} - {response.text}")
+            body = response.json()
+            posts = body.get("data", []) if isinstance(body, dict) else body
+            new_posts += self.upsert(creator_uuid, posts)
+
+            # Posts come newest first: once a page reaches the last synced post we are done
+            if newest and any((p.get("createdAt") or "") <= newest for p in posts):
+                break
+
+            pagination = body.get("pagination", {}) if isinstance(body, dict) else {}
+            cursor = pagination.get("nextCursor") or (body.get("nextCursor") if isinstance(body, dict) else None)
+            if cursor:
+                params["cursor"] = cursor
+            elif pagination.get("hasMore") and posts:
+                page = pagination.get("page", page) + 1
+                params["page"] = page
+            else:
+                break
+
+        self._mark_synced(creator_uuid)
+        return new_posts
+
+    def query(self, creator_uuid: str, audience: str = "", media_type: str = "", date_from: str = "",
+              date_to: str = "", page: int = 1, page_size: int = 25) -> tuple[list[tuple], int]:
+        """One page of posts (newest first) matching the filters, plus the total match count."""
+        where = ["creator_uuid = ?"]
+        args = [creator_uuid]
+        if audience:
+            where.append("audience = ?")
+            args.append(audience)
+        if media_type:
+            where.append("media_type = ?")
+            args.append(media_type)
+        if date_from:
+            where.append("created_at >= ?")
+            args.append(date_from)
+        if date_to:
+            # A bare date includes that whole day
+            where.append("created_at < ?" if len(date_to) == 10 else "created_at <= ?")
+            args.append((date.fromisoformat(date_to) + timedelta(days=1)).isoformat() if len(date_to) == 10 else date_to)
+        clause = " AND ".join(where)
+
+        with self._lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM posts WHERE {clause}", args).fetchone()[0]
+            rows = self.conn.execute(
+                f"""SELECT created_at, audience, media_type, price, text, uuid FROM posts
+                    WHERE {clause} ORDER BY created_at DESC LIMIT ? OFFSET ?""",
+                args + [page_size, (max(1, page) - 1) * page_size]
+            ).fetchall()
+        return rows, total
+
+    def rows_since(self, creator_uuid: str, after_rowid: int = 0) -> list[tuple]:
+        """(rowid, created_at, caption_source, media_type, price, text, file_name) of posts added after `after_rowid`.
+
+        Rowids only grow on insert, so the largest one seen is a cheap watermark
+        for incremental readers such as the analytics module.
+        """
+        with self._lock:
+            return self.conn.execute(
+                """SELECT rowid, created_at, caption_source, media_type, price, text, file_name FROM posts
+                   WHERE creator_uuid = ? AND rowid > ? ORDER BY rowid""",
+                (creator_uuid, after_rowid)
+            ).fetchall()
+
+    def find_by_media(self, creator_uuid: str, media_uuid: str, since: str = "") -> Optional[str]:
+        """UUID of a stored post that carries `media_uuid`, created at or after `since` (ISO UTC), if any.
+
+        Used before retrying a post whose previous attempt may have reached
+        the API, so a lost response does not publish the media twice. `since`
+        keeps an older post of the same (reused) media from counting.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT uuid FROM posts WHERE creator_uuid = ? AND raw LIKE ? AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (creator_uuid, f"%{media_uuid}%", since)
+            ).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,252 @@
+"""
+Client-side rate governor shared by every Fanvue, S3 and OpenAI call.
+
+Every endpoint class has a token bucket and an AIMD concurrency limit. A
+request pays its cost into the bucket (one per Fanvue API call, bytes for an
+S3 part, estimated tokens for a completion) and takes a slot. A 429 (or S3's
+503 Slow Down) pauses the class for Retry-After and cuts both the rate and
+the concurrency limit to DECREASE of what was just going through; every
+success then adds a little back. Without a configured rate the bucket stays
+open until the first 429 tells us where the provider's limit is, so a large
+batch settles just under it instead of swinging between bursts and failures.
+
+    with governor["post"].call() as call:
+        response = client.post(...)
+        call.response(response)   # status and Retry-After drive the limits
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from metrics import Counter, Gauge, Histogram, register
+
+FANVUE_RATE_LIMIT = float(os.getenv("FANVUE_RATE_LIMIT", 0))  # requests/s per Fanvue endpoint class, 0 = learned
+FANVUE_S3_RATE_MB = float(os.getenv("FANVUE_S3_RATE_MB", 0))  # MB/s of S3 part uploads, 0 = learned
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", 0))  # 0 = learned
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", 5))  # times a 429 is waited out before it is reported
+
+DECREASE = 0.7  # share of the rate and concurrency kept after a 429
+RATE_INCREASE = 0.02  # share of the highest known limit the rate regains per second of successes
+RATE_FLOOR = 0.05  # the rate never drops below this share of the highest known limit
+RATE_WINDOW = 10.0  # seconds of successful requests used to measure the rate at a 429
+RATE_MIN_SAMPLES = 20  # successes the window needs before its rate is trusted as the provider's limit
+DEFAULT_PAUSE = 1.0  # seconds a class waits after a 429 without Retry-After
+ASYNC_POLL = 0.05  # seconds between checks of a coroutine waiting for a free slot
+
+# Endpoint class -> rate in cost units per second (0 = learned), first and highest concurrency limit
+LIMITS = {
+    "upload": {"rate": FANVUE_RATE_LIMIT, "concurrency": 8, "max_concurrency": 32},
+    "post": {"rate": FANVUE_RATE_LIMIT, "concurrency": 4, "max_concurrency": 16},
+    "read": {"rate": FANVUE_RATE_LIMIT, "concurrency": 8, "max_concurrency": 32},
+    "s3": {"rate": FANVUE_S3_RATE_MB * 1024 * 1024, "concurrency": 16, "max_concurrency": 64,
+           "congestion": (429, 503)},
+    "openai": {"rate": OPENAI_TOKENS_PER_MINUTE / 60, "concurrency": 8, "max_concurrency": 32},
+}
+
+WAIT_SECONDS = register(Histogram(
+    "rate_governor_wait_seconds", "Time a request waited for its endpoint class.", ("endpoint",)))
+THROTTLED = register(Counter(
+    "rate_governor_throttled_total", "429 / Slow Down answers seen per endpoint class.", ("endpoint",)))
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds from a Retry-After (or OpenAI's retry-after-ms) header; None when missing or a date."""
+    for name, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = headers.get(name)
+        if value:
+            try:
+                return max(0.0, float(value) / scale)
+            except ValueError:
+                pass
+    return None
+
+
+class Call:
+    """One governed request; report how it went before its block ends.
+
+    A call nothing is reported for (an exception, a transport error) frees its
+    slot without changing the limits.
+    """
+
+    __slots__ = ("cost", "status", "retry_after", "actual_cost")
+
+    def __init__(self, cost: float):
+        self.cost = cost
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.actual_cost: Optional[float] = None
+
+    def response(self, response):
+        self.status = response.status_code
+        self.retry_after = retry_after(response.headers)
+
+    def limited(self, retry_after: Optional[float] = None):
+        self.status = 429
+        self.retry_after = retry_after
+
+    def succeeded(self, actual_cost: Optional[float] = None):
+        self.status = 200
+        self.actual_cost = actual_cost
+
+
+class EndpointLimiter:
+    """Token bucket plus AIMD concurrency limit for one endpoint class; thread-safe."""
+
+    def __init__(self, name: str, rate: float = 0.0, concurrency: int = 8, max_concurrency: int = 32,
+                 congestion: tuple = (429,)):
+        self.name = name
+        self.max_rate = rate  # configured ceiling, 0 = none
+        self.rate = rate  # current bucket rate, 0 = no bucket (yet)
+        self.known_limit = rate  # rate at the last 429, or the configured one
+        self.tokens = rate
+        self.limit = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.congestion = set(congestion)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = -math.inf
+        self._updated = time.monotonic()
+        self._recent: deque[tuple[float, float]] = deque()  # (time, cost) of recent successes
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.rate, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wait(self, cost: float, now: float) -> float:
+        """Seconds until a request of `cost` may go; 0 = now, inf = when a slot frees up."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.limit):
+            return math.inf
+        self._refill(now)
+        # A request bigger than one second of budget waits for a full bucket and leaves it in debt
+        needed = min(cost, self.rate)
+        if self.rate and self.tokens < needed:
+            return (needed - self.tokens) / self.rate
+        return 0.0
+
+    def _take(self, cost: float):
+        self.in_flight += 1
+        if self.rate:
+            self.tokens -= cost
+
+    def acquire(self, cost: float = 1.0):
+        started = time.monotonic()
+        with self._cond:
+            while (wait := self._wait(cost, time.monotonic())) > 0:
+                self._cond.wait(None if wait == math.inf else wait)
+            self._take(cost)
+        WAIT_SECONDS.observe(time.monotonic() - started, endpoint=self.name)
+
+    async def acquire_async(self, cost: float = 1.0):
+        started = time.monotonic()
+        while True:
+            with self._cond:
+                wait = self._wait(cost, time.monotonic())
+                if wait <= 0:
+                    self._take(cost)
+                    break
+            await asyncio.sleep(ASYNC_POLL if wait == math.inf else wait)
+        WAIT_SECONDS.observe(time.monotonic() - started, endpoint=self.name)
+
+    def release(self, call: Call):
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight -= 1
+            if call.actual_cost is not None and self.rate:
+                # Settle the estimate; never owe more than one second of budget
+                self.tokens = max(-self.rate, self.tokens + call.cost - call.actual_cost)
+            if call.status in self.congestion:
+                THROTTLED.inc(endpoint=self.name)
+                self._decrease(now, call.retry_after)
+            elif call.status is not None and call.status < 400:
+                self._increase(now, call.cost if call.actual_cost is None else call.actual_cost)
+            self._cond.notify_all()
+
+    def _measured_rate(self, now: float) -> float:
+        """Cost per second of the recent successes; 0 while there are too few to tell."""
+        while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+            self._recent.popleft()
+        if len(self._recent) < RATE_MIN_SAMPLES:
+            return 0.0
+        return sum(cost for _, cost in self._recent) / max(1.0, now - self._recent[0][0])
+
+    def _decrease(self, now: float, retry_after: Optional[float]):
+        pause = DEFAULT_PAUSE if retry_after is None else retry_after
+        self.paused_until = max(self.paused_until, now + pause)
+        # The other requests of the burst that hit the limit answer 429 too; that is one event, not many
+        if now - self._last_decrease < max(pause, DEFAULT_PAUSE):
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit * DECREASE)
+        # A few requests say nothing about the provider's limit; until the bucket has a rate
+        # only a window full of successes does
+        current = self.rate or self._measured_rate(now)
+        if current:
+            # The highest rate seen at a 429 stays the reference, so a run of 429s cannot ratchet the
+            # floor and the additive increase down towards zero
+            self.known_limit = max(self.known_limit, current)
+            self.rate = max(current * DECREASE, self.known_limit * RATE_FLOOR)
+            self.tokens = min(self.tokens, 0.0)
+
+    def _increase(self, now: float, cost: float):
+        self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+        if self.rate and self.known_limit:
+            # Additive: about RATE_INCREASE of the known limit per second, whatever the request size
+            self.rate += RATE_INCREASE * self.known_limit * cost / self.rate
+            if self.max_rate:
+                self.rate = min(self.rate, self.max_rate)
+        self._recent.append((now, cost))
+        if len(self._recent) > 1 and self._recent[0][0] < now - RATE_WINDOW:
+            self._recent.popleft()
+
+    @contextmanager
+    def call(self, cost: float = 1.0):
+        """Wait for budget and a slot, yield the Call, free the slot afterwards."""
+        self.acquire(cost)
+        call = Call(cost)
+        try:
+            yield call
+        finally:
+            self.release(call)
+
+    @asynccontextmanager
+    async def call_async(self, cost: float = 1.0):
+        await self.acquire_async(cost)
+        call = Call(cost)
+        try:
+            yield call
+        finally:
+            self.release(call)
+
+
+class RateGovernor:
+    """The limiters of every endpoint class, by name."""
+
+    def __init__(self, limits: dict[str, dict] = LIMITS):
+        self.limiters = {name: EndpointLimiter(name, **options) for name, options in limits.items()}
+
+    def __getitem__(self, name: str) -> EndpointLimiter:
+        return self.limiters[name]
+
+    def state(self) -> dict[tuple, float]:
+        """(endpoint, "rate" | "concurrency" | "in_flight") -> current value, for the metrics."""
+        values = {}
+        for name, limiter in self.limiters.items():
+            values[(name, "rate")] = limiter.rate
+            values[(name, "concurrency")] = limiter.limit
+            values[(name, "in_flight")] = limiter.in_flight
+        return values
+
+
+governor = RateGovernor()
+register(Gauge("rate_governor_limit", "Current rate (0 = open), concurrency limit and requests in flight.",
+               ("endpoint", "kind"), function=governor.state))
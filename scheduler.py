@@ -0,0 +1,185 @@
+"""
+In-process publishing timetable.
+
+Each day gets 2-4 random posting slots between 9:00 and 21:59, planned up
+front (today and tomorrow) and kept in a heap. A single thread sleeps on a
+condition variable until the earliest slot is due, so nothing wakes up just
+to find there is nothing to do. Jobs start `lead` minutes before their slot
+and pass the slot time as `scheduledAt`, so Fanvue publishes the post on the
+minute. An upload that outlasts the lead would send a slot already in the
+past, so the job checks it again with `schedule_or_now` right before posting
+and then publishes at once instead.
+
+The timetable is written to a JSON file after every change; after a restart
+pending slots are re-queued, slots missed by more than MISSED_GRACE are
+skipped and a slot that was running when the app stopped is not repeated.
+"""
+
+import heapq
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+SCHEDULER_POSTS_PER_DAY = (2, 4)
+SCHEDULER_HOURS = (9, 21)  # first and last hour a slot may start in
+SCHEDULER_MAX_MINUTE = 54  # slots start at a random minute of their hour, like the n8n wait
+SCHEDULER_LEAD_MINUTES = float(os.getenv("SCHEDULER_LEAD_MINUTES", 30))
+MISSED_GRACE = 3600  # seconds after a slot during which it is still published (without scheduledAt)
+MIN_SCHEDULE_AHEAD = 60  # seconds; closer than this the post is published right away
+KEEP_DAYS = 7  # finished slots kept in the file for the UI
+
+
+def daily_slots(day: date, rng: Optional[random.Random] = None) -> list[datetime]:
+    """2-4 local posting times on `day`, at distinct hours, sorted."""
+    rng = rng or random.Random()
+    count = rng.randint(*SCHEDULER_POSTS_PER_DAY)
+    hours = sorted(rng.sample(range(SCHEDULER_HOURS[0], SCHEDULER_HOURS[1] + 1), count))
+    return [datetime(day.year, day.month, day.day, hour, rng.randint(0, SCHEDULER_MAX_MINUTE)) for hour in hours]
+
+
+def iso_utc(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def schedule_or_now(scheduled_at: str) -> str:
+    """`scheduled_at` while it is more than MIN_SCHEDULE_AHEAD away, else "" (publish right away)."""
+    if not scheduled_at:
+        return ""
+    at = datetime.fromisoformat(scheduled_at.replace("Z", "+00:00"))
+    return scheduled_at if at.timestamp() - time.time() > MIN_SCHEDULE_AHEAD else ""
+
+
+class PublishScheduler:
+    """Fires `job(scheduled_at)` for every slot; `job` returns (success, message).
+
+    `scheduled_at` is the ISO UTC slot time, or "" when the slot is already
+    (nearly) due and the post should go out immediately.
+    """
+
+    def __init__(self, path: Path, job: Callable[[str], tuple[bool, str]], lead_minutes: float = SCHEDULER_LEAD_MINUTES):
+        self.path = path
+        self.job = job
+        self.lead = lead_minutes * 60
+        self.enabled = False
+        self._cond = threading.Condition()
+        self._slots: dict[str, dict] = {}
+        self._planned_days: set[str] = set()
+        self._heap: list[tuple[float, str]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        self.enabled = data.get("enabled", False)
+        self._planned_days = set(data.get("days", []))
+        self._slots = data.get("slots", {})
+        for slot_id, slot in self._slots.items():
+            if slot["status"] == "w toku":
+                slot.update(status="przerwany", message="Aplikacja zatrzymana w trakcie publikacji")
+            elif slot["status"] == "zaplanowany":
+                heapq.heappush(self._heap, (slot["at"] - self.lead, slot_id))
+
+    def _flush(self):
+        cutoff = (date.today() - timedelta(days=KEEP_DAYS)).isoformat()
+        self._planned_days = {d for d in self._planned_days if d >= cutoff}
+        self._slots = {k: v for k, v in self._slots.items() if v["day"] >= cutoff}
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "enabled": self.enabled,
+            "days": sorted(self._planned_days),
+            "slots": self._slots
+        }))
+        os.replace(tmp_path, self.path)
+
+    def _plan_ahead(self):
+        """Make sure today and tomorrow have their slots; only future slots are queued."""
+        today = date.today()
+        changed = False
+        for day in (today, today + timedelta(days=1)):
+            key = day.isoformat()
+            if key in self._planned_days:
+                continue
+            self._planned_days.add(key)
+            changed = True
+            for when in daily_slots(day):
+                at = when.timestamp()
+                if at <= time.time():
+                    continue
+                slot_id = when.strftime("%Y-%m-%d %H:%M")
+                self._slots[slot_id] = {"day": key, "at": at, "status": "zaplanowany", "message": ""}
+                heapq.heappush(self._heap, (at - self.lead, slot_id))
+        if changed:
+            self._flush()
+
+    def start(self):
+        with self._cond:
+            self.enabled = True
+            self._plan_ahead()
+            self._flush()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="publish-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self.enabled = False
+            self._flush()
+            self._cond.notify()
+
+    def _next_due(self) -> Optional[tuple[str, dict]]:
+        """Block until the earliest slot is due (or the scheduler is stopped)."""
+        with self._cond:
+            while self.enabled:
+                self._plan_ahead()
+                if not self._heap:
+                    # Cannot happen while tomorrow is planned, but never spin
+                    self._cond.wait(timeout=3600)
+                    continue
+                fire_at, slot_id = self._heap[0]
+                delay = fire_at - time.time()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+                heapq.heappop(self._heap)
+                slot = self._slots.get(slot_id)
+                if not slot or slot["status"] != "zaplanowany":
+                    continue
+                if time.time() - slot["at"] > MISSED_GRACE:
+                    slot.update(status="pominiety", message="Aplikacja nie dzialala w czasie slotu")
+                    self._flush()
+                    continue
+                slot["status"] = "w toku"
+                self._flush()
+                return slot_id, slot
+            # Cleared under the lock so a later start() knows to spawn a new thread
+            self._thread = None
+        return None
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            slot_id, slot = due
+            scheduled_at = schedule_or_now(iso_utc(slot["at"]))
+            try:
+                success, message = self.job(scheduled_at)
+            except Exception as e:
+                success, message = False, f"Blad: {str(e)}"
+            with self._cond:
+                slot.update(status="ok" if success else "blad", message=message)
+                self._flush()
+
+    def timetable(self) -> list[list]:
+        """Rows [slot time, status, message], oldest first."""
+        with self._cond:
+            return [[slot_id, slot["status"], slot["message"]] for slot_id, slot in sorted(self._slots.items())]
@@ -0,0 +1,206 @@
+"""
+Fanvue OAuth tokens with proactive renewal.
+
+The expiry comes from the token response (`expires_in`) or from the `exp`
+claim of the access token (a JWT). A background thread renews the token
+REFRESH_AHEAD seconds before it expires; a caller that still finds it about
+to expire refreshes inline. Only one refresh runs at a time: callers that
+arrive meanwhile wait for it and use its result instead of sending their own
+refresh (which would fail anyway once the refresh token has been rotated).
+
+Worker processes share the tokens file. Before refreshing, the manager
+re-reads it, so a token another process already renewed is adopted instead
+of refreshed a second time.
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+
+from metrics import TOKEN_REFRESHES
+
+REFRESH_AHEAD = float(os.getenv("FANVUE_TOKEN_REFRESH_AHEAD", 300))  # seconds before expiry
+REFRESH_INLINE = 30  # seconds before expiry at which a request refreshes instead of waiting for the thread
+REFRESH_RETRY = 60  # seconds before the next background attempt after a failed refresh, doubled per failure
+REFRESH_RETRY_MAX = 1800
+FANVUE_CLIENT_ID = os.getenv("FANVUE_CLIENT_ID", "")
+FANVUE_CLIENT_SECRET = os.getenv("FANVUE_CLIENT_SECRET", "")
+
+
+def jwt_expiry(token: Optional[str]) -> Optional[float]:
+    """The `exp` claim of a JWT, or None for opaque tokens."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenManager:
+    """Current access/refresh token pair; `token()` is safe to call from any thread.
+
+    `load` and `save` connect the manager to persistent storage: `load()`
+    returns the stored dict (or None) and `save()` is called after every
+    successful refresh.
+    """
+
+    def __init__(self, token_url: str, client_getter: Callable[[], httpx.Client],
+                 client_id: str = FANVUE_CLIENT_ID, client_secret: str = FANVUE_CLIENT_SECRET):
+        self.token_url = token_url
+        self.client_getter = client_getter
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.expires_at: Optional[float] = None
+        self.last_error = ""
+        self.load: Optional[Callable[[], Optional[dict]]] = None
+        self.save: Optional[Callable[[], None]] = None
+        self._cond = threading.Condition()
+        self._refresh_lock = threading.Lock()
+        self._retry_at = 0.0
+        self._failures = 0  # failed background refreshes in a row
+        self._thread: Optional[threading.Thread] = None
+
+    def set(self, access_token: Optional[str], refresh_token: Optional[str] = None,
+            expires_at: Optional[float] = None):
+        """Replace the tokens; without `expires_at` the expiry is read from the JWT."""
+        with self._cond:
+            self.access_token = access_token
+            self.refresh_token = refresh_token
+            self.expires_at = expires_at or jwt_expiry(access_token)
+            self._retry_at = 0.0
+            self._failures = 0
+            self._cond.notify()
+
+    def expires_in(self) -> Optional[float]:
+        return None if self.expires_at is None else self.expires_at - time.time()
+
+    def describe(self) -> str:
+        """Short Polish status line for the UI."""
+        remaining = self.expires_in()
+        if remaining is None:
+            return "waznosc tokena nieznana"
+        if self.refresh_token:
+            renewal = "odswiezany automatycznie"
+        else:
+            renewal = "bez refresh tokena - po wygasnieciu zaloguj sie ponownie"
+        if remaining <= 0:
+            return f"token wygasl, {renewal}"
+        return f"token wazny jeszcze {int(remaining // 60)} min, {renewal}"
+
+    def token(self) -> Optional[str]:
+        """The access token, refreshed first if it is about to expire."""
+        current = self.access_token
+        remaining = self.expires_in()
+        if current and self.refresh_token and remaining is not None and remaining < REFRESH_INLINE:
+            self.refresh(current)
+        return self.access_token
+
+    def refresh(self, stale: Optional[str] = None) -> bool:
+        """Renew the access token; True once a token other than `stale` is available.
+
+        Concurrent callers queue on one lock: the first one refreshes, the
+        rest see that the token changed while they waited and return at once.
+        """
+        stale = stale if stale is not None else self.access_token
+        with self._refresh_lock:
+            if self.access_token != stale:
+                return True
+            if self._adopt_stored(stale):
+                TOKEN_REFRESHES.inc(result="adopted")
+                return True
+            if not self.refresh_token:
+                self.last_error = "Brak refresh tokena"
+                return False
+
+            data = {"grant_type": "refresh_token", "refresh_token": self.refresh_token}
+            auth = None
+            if self.client_secret:
+                auth = (self.client_id, self.client_secret)
+            elif self.client_id:
+                data["client_id"] = self.client_id
+            try:
+                response = self.client_getter().post(self.token_url, data=data, auth=auth)
+            except httpx.HTTPError as e:
+                self.last_error = f"Blad odswiezania tokena: {str(e)}"
+                TOKEN_REFRESHES.inc(result="failed")
+                return False
+            if response.status_code != 200:
+                self.last_error = f"Blad odswiezania tokena: {response.status_code} - {response.text}"
+                TOKEN_REFRESHES.inc(result="failed")
+                return False
+
+            payload = response.json()
+            expires_in = payload.get("expires_in")
+            self.set(payload["access_token"], payload.get("refresh_token") or self.refresh_token,
+                     time.time() + float(expires_in) if expires_in else None)
+            self.last_error = ""
+            TOKEN_REFRESHES.inc(result="ok")
+        if self.save:
+            self.save()
+        return True
+
+    def _adopt_stored(self, stale: Optional[str]) -> bool:
+        """Take over a fresher token another process saved; caller holds the refresh lock."""
+        if not self.load:
+            return False
+        stored = self.load()
+        if not stored or not stored.get("access_token") or stored["access_token"] == stale:
+            return False
+        expires_at = stored.get("expires_at") or jwt_expiry(stored["access_token"])
+        # Only a token issued after ours; an older saved login must not replace a newly pasted one
+        if expires_at is None or self.expires_at is None or expires_at <= self.expires_at:
+            return False
+        if expires_at - time.time() < REFRESH_INLINE:
+            return False
+        self.set(stored["access_token"], stored.get("refresh_token"), expires_at)
+        return True
+
+    def _refresh_due(self) -> Optional[float]:
+        if not self.refresh_token or self.expires_at is None:
+            return None
+        return max(self.expires_at - REFRESH_AHEAD, self._retry_at)
+
+    def start(self):
+        """Renew tokens in the background from now on."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="token-refresh", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    due = self._refresh_due()
+                    if due is None:
+                        # Nothing to renew until set() brings a refresh token and an expiry
+                        self._cond.wait()
+                        continue
+                    wait = due - time.time()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(timeout=wait)
+                stale = self.access_token
+            try:
+                refreshed = self.refresh(stale)
+            except Exception as e:
+                # An unexpected answer must not end the thread, or renewals stop for good
+                self.last_error = f"Blad odswiezania tokena: {type(e).__name__}: {e}"
+                print(self.last_error, flush=True)
+                TOKEN_REFRESHES.inc(result="failed")
+                refreshed = False
+            with self._cond:
+                if refreshed:
+                    self._failures = 0
+                else:
+                    self._failures += 1
+                    delay = min(REFRESH_RETRY * 2 ** (self._failures - 1), REFRESH_RETRY_MAX)
+                    self._retry_at = time.time() + delay
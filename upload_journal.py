@@ -0,0 +1,102 @@
+"""
+On-disk journal of in-flight multipart uploads.
+
+Each entry is keyed by a content fingerprint of the file and remembers the
+Fanvue uploadId, the part size and the eTags of parts already stored in S3,
+so an interrupted upload can be resumed by sending only the missing parts.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from media_hash import file_sha256
+
+JOURNAL_MAX_AGE = 6 * 24 * 3600  # seconds; older sessions are assumed expired on the server
+
+
+def file_fingerprint(file_path: Path) -> str:
+    """Content fingerprint: SHA-256 of the whole file (memoized per size and mtime by media_hash).
+
+    Any edit changes it, so a resumed upload never mixes parts of two versions.
+    """
+    return file_sha256(file_path)
+
+
+class UploadJournal:
+    """Thread-safe JSON journal; every change is flushed to disk atomically.
+
+    Worker processes share the file, so it is re-read whenever another
+    process has replaced it since our last read or write.
+    """
+
+    def __init__(self, path: Path, max_age: float = JOURNAL_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: Optional[dict] = None
+        self._mtime: Optional[int] = None
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> dict:
+        mtime = self._file_mtime()
+        if self._entries is None or mtime != self._mtime:
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._entries = {}
+            self._mtime = mtime
+        return self._entries
+
+    def _flush(self):
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self._entries))
+        os.replace(tmp_path, self.path)
+        self._mtime = self._file_mtime()
+
+    def get(self, fingerprint: str) -> Optional[dict]:
+        """Return a copy of a resumable entry, dropping it if it is too old."""
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(fingerprint)
+            if entry is None:
+                return None
+            if time.time() - entry["updatedAt"] > self.max_age:
+                del entries[fingerprint]
+                self._flush()
+                return None
+            return json.loads(json.dumps(entry))
+
+    def start(self, fingerprint: str, upload_id: str, part_size: int, filename: str, media_type: str):
+        with self._lock:
+            self._load()[fingerprint] = {
+                "uploadId": upload_id,
+                "partSize": part_size,
+                "filename": filename,
+                "mediaType": media_type,
+                "parts": {},
+                "updatedAt": time.time()
+            }
+            self._flush()
+
+    def record_part(self, fingerprint: str, part_number: int, etag: str):
+        with self._lock:
+            entry = self._load().get(fingerprint)
+            if entry is None:
+                return
+            entry["parts"][str(part_number)] = etag
+            entry["updatedAt"] = time.time()
+            self._flush()
+
+    def discard(self, fingerprint: str):
+        with self._lock:
+            if self._load().pop(fingerprint, None) is not None:
+                self._flush()
@@ -0,0 +1,97 @@
+"""
+Sample a few keyframes from a video for the vision model.
+
+ffmpeg seeks on the input (`-ss` before `-i`) and decodes keyframes only, so
+each frame costs one short decode near its timestamp no matter how large the
+file is; frames come back as small JPEGs on stdout and are cached on disk per
+content hash. Without ffmpeg/ffprobe on PATH no frames are returned and callers
+fall back to a text-only prompt.
+"""
+
+import base64
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from media_hash import file_sha256
+
+VIDEO_FRAME_COUNT = int(os.getenv("VIDEO_FRAME_COUNT", 4))
+VIDEO_FRAME_SIZE = 512  # longest side, matches "detail": "low"
+FFMPEG_TIMEOUT = 30  # seconds per ffmpeg/ffprobe call
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def probe_duration(video_path: Path) -> Optional[float]:
+    """Container duration in seconds, read from the header without decoding."""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(video_path)],
+        capture_output=True, text=True, timeout=FFMPEG_TIMEOUT
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def extract_frame(video_path: Path, timestamp: float, size: int = VIDEO_FRAME_SIZE) -> Optional[bytes]:
+    """Nearest keyframe at `timestamp`, scaled to fit `size` and encoded as JPEG."""
+    result = subprocess.run(
+        [
+            "ffmpeg", "-v", "error",
+            "-skip_frame", "nokey",
+            "-ss", f"{timestamp:.3f}",
+            "-i", str(video_path),
+            "-frames:v", "1",
+            "-vf", f"scale={size}:{size}:force_original_aspect_ratio=decrease",
+            "-f", "image2pipe", "-vcodec", "mjpeg", "-q:v", "4",
+            "-"
+        ],
+        capture_output=True, timeout=FFMPEG_TIMEOUT
+    )
+    return result.stdout or None
+
+
+def sample_frames(video_path, count: int = VIDEO_FRAME_COUNT, cache_dir: Path = None) -> list[bytes]:
+    """Up to `count` JPEG frames spread evenly over the video (middle of each segment)."""
+    video_path = Path(video_path)
+    if count <= 0 or not ffmpeg_available():
+        return []
+
+    cache_paths = None
+    if cache_dir is not None:
+        sha = file_sha256(video_path)
+        cache_paths = [cache_dir / f"{sha}_frame{i}of{count}_{VIDEO_FRAME_SIZE}.jpg" for i in range(count)]
+        if all(p.exists() for p in cache_paths):
+            return [p.read_bytes() for p in cache_paths]
+
+    try:
+        duration = probe_duration(video_path)
+        if not duration:
+            return []
+        timestamps = [duration * (i + 0.5) / count for i in range(count)]
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            frames = list(pool.map(lambda t: extract_frame(video_path, t), timestamps))
+    except (OSError, subprocess.SubprocessError):
+        return []
+
+    if cache_paths is not None and all(frames):
+        cache_dir.mkdir(exist_ok=True)
+        for frame, cache_path in zip(frames, cache_paths):
+            tmp_path = cache_path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(frame)
+            tmp_path.replace(cache_path)
+
+    return [frame for frame in frames if frame]
+
+
+def frame_data_urls(video_path, count: int = VIDEO_FRAME_COUNT, cache_dir: Path = None) -> list[str]:
+    """Sampled frames as base64 data URLs for the chat completions API."""
+    return [f"data:image/jpeg;base64,{base64.b64encode(frame).decode()}"
+            for frame in sample_frames(video_path, count, cache_dir)]
@@ -0,0 +1,268 @@
+"""
+Worker processes that drain the job queue (see job_queue.py).
+
+    python worker.py                      # JOB_WORKERS processes
+    python worker.py --processes 4
+    python worker.py --kinds caption      # only caption jobs
+
+Every process imports core.py (not the Gradio UI) once and runs one job at a
+time. Saved Fanvue tokens are re-read before each job, so logging in again in
+the UI reaches workers that are already running. AI captions need OPENAI_API_KEY in the
+environment or in .env; a key typed into the UI stays in the UI process.
+
+Job kinds and payloads:
+    upload   {"file", "allow_similar"?}                   -> {"media_uuid"}
+    caption  {"file", "style", "custom_prompt"}           -> {"caption"}
+    post     {"caption", "media_uuid", "audience", ...}   -> {"post_uuid"}
+    publish  {"file", "caption" | "style", "audience",
+              "scheduled_at"?, "price"?}                   -> {"post_uuid", "media_uuid"}
+
+A publish job does not upload its file itself: it waits for the file's shared
+upload job (core.enqueue_upload), handed back to the queue without using an
+attempt, and posts the media UUID that job returns. A batch for many
+creators thus uploads every file once. The caption and media UUID are
+checkpointed, so a retry after a crash or a failed post does not upload the
+file again.
+
+With METRICS_PORT set, worker i serves its own metrics (metrics.py) at
+METRICS_PORT + 1 + i, next to the app on METRICS_PORT.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from pathlib import Path
+
+import metrics
+from job_queue import JobError, JobQueue, JobWaiting
+from scheduler import iso_utc
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_IDLE_SLEEP = (0.2, 5.0)  # seconds between polls of an empty queue, doubled up to the max
+JOB_HEARTBEAT = 10  # seconds between lease renewals of a running job
+POSTING_CLOCK_SLACK = 60  # seconds the API clock may be behind ours when looking for a post of an earlier attempt
+
+
+def make_caption(core, file: str, style: str, custom_prompt: str = "") -> str:
+    if not core.state.openai_api_key:
+        raise JobError("Brak OPENAI_API_KEY w srodowisku workera", retryable=False)
+    caption = ""
+    for caption in core.iter_caption(file, style, custom_prompt, video=core.is_video(file)):
+        pass
+    if not caption or caption.startswith("Blad generowania"):
+        raise JobError(caption or "Pusty opis")
+    if core.is_refusal(caption):
+        raise JobError("Model odmowil opisu")
+    return caption
+
+
+def upload_ready(core, file: str, allow_similar: bool = False) -> str:
+    """Upload a file and wait until Fanvue has processed it; returns the media UUID."""
+    if not Path(file).is_file():
+        raise JobError(f"Brak pliku: {file}", retryable=False)
+    media_uuid, message = core.upload_media(file, allow_similar=allow_similar)
+    if not media_uuid:
+        # A flagged near-duplicate stays one however often it is retried
+        raise JobError(message, retryable=not message.startswith(core.NEAR_DUPLICATE_MESSAGE))
+    error = core.wait_for_media(media_uuid)
+    if error:
+        raise JobError(error)
+    return media_uuid
+
+
+def shared_upload(core, progress: dict, checkpoint, file: str, allow_similar: bool = False) -> str:
+    """Media UUID from the file's upload job; raises JobWaiting until that job has finished."""
+    if not Path(file).is_file():
+        raise JobError(f"Brak pliku: {file}", retryable=False)
+    upload_job = progress.get("waiting_for")
+    jobs = core.job_queue.get([upload_job]) if upload_job else []
+    if not jobs:
+        upload_job, _ = core.enqueue_upload(file, allow_similar)
+        jobs = core.job_queue.get([upload_job])
+        progress["waiting_for"] = upload_job
+        checkpoint(progress)
+    upload = jobs[0]
+    if upload["state"] == "done":
+        progress.pop("waiting_for")
+        return upload["result"]["media_uuid"]
+    if upload["state"] in ("failed", "cancelled"):
+        # The next attempt of this job queues the upload again
+        progress.pop("waiting_for")
+        checkpoint(progress)
+        error = upload["error"] or "Upload anulowany"
+        raise JobError(error, retryable=not error.startswith(core.NEAR_DUPLICATE_MESSAGE))
+    raise JobWaiting(f"Czeka na upload (zadanie {upload_job})")
+
+
+def post_once(core, job: dict, progress: dict, checkpoint, caption: str, media_uuid: str, audience: str,
+              **fields) -> str:
+    """Create the post for the job's creator, first checking whether an earlier attempt already did."""
+    creator = job["creator_uuid"]
+    if progress.get("posting") and media_uuid:
+        # The last attempt may have created the post before failing; look for it. Reused
+        # media may carry an older post too, so only posts since the first attempt count
+        core.post_store.sync(core.state.api, creator)
+        existing = core.post_store.find_by_media(creator, media_uuid, progress.get("posting_since", ""))
+        if existing:
+            return existing
+    if not progress.get("posting"):
+        progress["posting_since"] = iso_utc(time.time() - POSTING_CLOCK_SLACK)
+    progress["posting"] = True
+    checkpoint(progress)
+    post_uuid, message = core.submit_post(caption, media_uuid, audience, creator_uuid=creator, **fields)
+    if not post_uuid:
+        raise JobError(message.replace("\n", " "))
+    return post_uuid
+
+
+def run_upload(core, job: dict, checkpoint) -> dict:
+    payload = job["payload"]
+    return {"media_uuid": upload_ready(core, payload["file"], payload.get("allow_similar", False))}
+
+
+def run_caption(core, job: dict, checkpoint) -> dict:
+    payload = job["payload"]
+    return {"caption": make_caption(core, payload["file"], payload["style"], payload.get("custom_prompt", ""))}
+
+
+def run_post(core, job: dict, checkpoint) -> dict:
+    payload = job["payload"]
+    post_uuid = post_once(core, job, dict(job["progress"]), checkpoint, payload["caption"],
+                          payload.get("media_uuid", ""), payload["audience"],
+                          scheduled_at=payload.get("scheduled_at", ""), price=payload.get("price"),
+                          caption_source=payload.get("caption_source", ""), file_name=payload.get("file_name", ""))
+    return {"post_uuid": post_uuid}
+
+
+def run_publish(core, job: dict, checkpoint) -> dict:
+    payload = job["payload"]
+    progress = dict(job["progress"])
+    file = payload["file"]
+    if "caption" not in progress:
+        if payload.get("caption"):
+            progress.update(caption=payload["caption"], caption_source="")
+        else:
+            progress.update(caption=make_caption(core, file, payload["style"], payload.get("custom_prompt", "")),
+                            caption_source="ai-live")
+        checkpoint(progress)
+    if not progress.get("media_uuid"):
+        progress["media_uuid"] = shared_upload(core, progress, checkpoint, file, payload.get("allow_similar", False))
+        checkpoint(progress)
+    post_uuid = post_once(core, job, progress, checkpoint, progress["caption"], progress["media_uuid"],
+                          payload["audience"], scheduled_at=payload.get("scheduled_at", ""), price=payload.get("price"),
+                          caption_source=progress["caption_source"], file_name=Path(file).name)
+    return {"post_uuid": post_uuid, "media_uuid": progress["media_uuid"]}
+
+
+HANDLERS = {
+    "upload": run_upload,
+    "caption": run_caption,
+    "post": run_post,
+    "publish": run_publish,
+}
+
+
+def run_job(core, jobs: JobQueue, name: str, job: dict):
+    handler = HANDLERS.get(job["kind"])
+    if handler is None:
+        jobs.fail(job["id"], name, f"Nieznany typ zadania: {job['kind']}", retryable=False)
+        return
+
+    # Keep the lease alive while the job runs; a long video upload takes minutes
+    done = threading.Event()
+
+    def heartbeat():
+        while not done.wait(JOB_HEARTBEAT):
+            jobs.heartbeat(job["id"], name)
+            jobs.worker_seen(name, os.getpid(), job["id"])
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        # Pick up a new login from the UI; jobs queued without a creator go to the active one
+        core.load_tokens()
+        job["creator_uuid"] = job["creator_uuid"] or core.state.creator_uuid
+        result = handler(core, job, lambda progress: jobs.save_progress(job["id"], progress))
+        jobs.complete(job["id"], name, result)
+    except JobError as e:
+        jobs.fail(job["id"], name, str(e), e.retryable)
+    except JobWaiting as e:
+        jobs.release(job["id"], name, e.delay)
+    except KeyboardInterrupt:
+        jobs.release(job["id"], name)
+        raise
+    except Exception as e:
+        jobs.fail(job["id"], name, f"Blad: {str(e)}")
+    finally:
+        done.set()
+
+
+def run_worker(name: str, kinds: list[str] = None, metrics_port: int = 0):
+    """Claim and run jobs until interrupted."""
+    import core  # loads the saved tokens, the local stores and OPENAI_API_KEY
+
+    def interrupt(signum, frame):
+        # One shot: a second signal must not break the job hand-back below
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        raise KeyboardInterrupt
+
+    # Ctrl+C or kill (service manager, the parent process): hand the current job back and exit
+    signal.signal(signal.SIGINT, interrupt)
+    signal.signal(signal.SIGTERM, interrupt)
+
+    core.state.tokens.start()
+    metrics.serve(metrics_port)
+    jobs = JobQueue(core.JOB_QUEUE_FILE)
+    idle = JOB_IDLE_SLEEP[0]
+    try:
+        while True:
+            jobs.worker_seen(name, os.getpid())
+            job = jobs.claim(name, kinds)
+            if job is None:
+                time.sleep(idle)
+                idle = min(idle * 2, JOB_IDLE_SLEEP[1])
+                continue
+            idle = JOB_IDLE_SLEEP[0]
+            jobs.worker_seen(name, os.getpid(), job["id"])
+            run_job(core, jobs, name, job)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        jobs.worker_gone(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run job queue workers")
+    parser.add_argument("--processes", type=int, default=JOB_WORKERS)
+    parser.add_argument("--kinds", default="", help="comma separated job kinds, default: all")
+    args = parser.parse_args()
+
+    kinds = [k for k in args.kinds.split(",") if k] or None
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    processes = [
+        multiprocessing.Process(target=run_worker, name=f"worker-{i}",
+                                args=(f"{prefix}-{i}", kinds, metrics.METRICS_PORT + 1 + i if metrics.METRICS_PORT else 0))
+        for i in range(max(1, args.processes))
+    ]
+    for process in processes:
+        process.start()
+    print(f"Uruchomiono {len(processes)} workerow, Ctrl+C konczy")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Children hand their jobs back on SIGTERM as on Ctrl+C
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=30)
+
+
+if __name__ == "__main__":
+    main()